@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+from typing import Any, Iterator, NamedTuple
+
+from censtats.self_ident.constants import (
+    DEF_DELTA,
+    DEF_IDENT_THR,
+    DEF_KMER_SIZE,
+    DEF_MODIMIZER,
+    DEF_WINDOW,
+)
+from censtats.self_ident.estimate_identity import (
+    SelfSketches,
+    pack_sketch_arrays,
+    partition_offsets,
+    select_modimizers,
+    sketch_containment_matrix,
+    sketch_parameters,
+)
+from censtats.self_ident.io import write_2D_ident_bed
+from censtats.self_ident.read_fasta import encode_seq, fetch_seq, generate_kmer_hashes
+
+from .synthetic import add_hor_array_args, hor_array
+
+
+class StageTiming(NamedTuple):
+    stage: str
+    seconds: float
+    bp_per_s: float
+    peak_rss_mb: float
+
+
+def peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of this process in MB.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS and KB otherwise.
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+class Stages:
+    """
+    Record the fastest run of each stage over repeats.
+    """
+
+    def __init__(self, seq_len: int) -> None:
+        self.seq_len = seq_len
+        self.seconds: dict[str, float] = {}
+        self.peak_rss: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.seconds[stage] = min(elapsed, self.seconds.get(stage, elapsed))
+        self.peak_rss[stage] = peak_rss_mb()
+
+    def timings(self) -> list[StageTiming]:
+        timings = [
+            StageTiming(
+                stage,
+                seconds,
+                self.seq_len / seconds if seconds else float("inf"),
+                self.peak_rss[stage],
+            )
+            for stage, seconds in self.seconds.items()
+        ]
+        total = sum(self.seconds.values())
+        timings.append(
+            StageTiming(
+                "total",
+                total,
+                self.seq_len / total if total else float("inf"),
+                max(self.peak_rss.values()),
+            )
+        )
+        return timings
+
+
+def benchmark_self_ident(
+    seq: str,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    max_band: int | None = None,
+    threads: int = 1,
+    repeats: int = 1,
+) -> list[StageTiming]:
+    """
+    Time each stage of the self-identity of `seq`. Same stages as `self_ident_2D`.
+
+    # Args
+    * seq
+            * Sequence.
+    * repeats
+            * Number of times to run each stage. The fastest run is reported.
+    * See `self_ident_matrix` for other args.
+
+    # Returns
+    * Timing of each stage and the total.
+    """
+    stages = Stages(len(seq))
+    sparsity, sketch_size = sketch_parameters(window, modimizer)
+    for _ in range(repeats):
+        with stages.time("hashing"):
+            kmers = generate_kmer_hashes(encode_seq(seq), kmer_size)
+
+        with stages.time("partitioning"):
+            no_neighbors = partition_offsets(window, 0, len(kmers), kmer_size)
+            neighbors = partition_offsets(window, delta, len(kmers), kmer_size)
+
+        with stages.time("modimizers"):
+            (sketches, sketches_neighbors), vocab = pack_sketch_arrays(
+                *(
+                    select_modimizers(
+                        kmers, *offsets, sparsity, False, kmer_size, sketch_size
+                    )
+                    for offsets in (no_neighbors, neighbors)
+                )
+            )
+        del kmers
+
+        with stages.time("containment"):
+            mtx = sketch_containment_matrix(
+                SelfSketches(sketches, sketches_neighbors, vocab),
+                kmer_size,
+                ident_thr,
+                False,
+                max_band=max_band,
+                threads=threads,
+            )
+
+        # Write to disk like the CLI rather than /dev/null.
+        with tempfile.TemporaryFile() as fh, stages.time("bed"):
+            write_2D_ident_bed(
+                fh, mtx, window, ident_thr, "seq", "seq", banded=bool(max_band)
+            )
+        del mtx
+
+    return stages.timings()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark each stage of self-ident on a synthetic HOR array or a fasta record."
+    )
+    add_hor_array_args(ap)
+    ap.add_argument(
+        "-i",
+        "--infile",
+        default=None,
+        type=str,
+        help="Benchmark a fasta record instead of a synthetic HOR array.",
+    )
+    ap.add_argument(
+        "--name", default=None, type=str, help="Record of --infile. Defaults to first."
+    )
+    ap.add_argument("-w", "--window", default=DEF_WINDOW, type=int, help="Window size.")
+    ap.add_argument(
+        "-k", "--kmer_size", default=DEF_KMER_SIZE, type=int, help="K-mer size."
+    )
+    ap.add_argument("-d", "--delta", default=DEF_DELTA, type=float, help="Delta.")
+    ap.add_argument(
+        "-m", "--modimizer", default=DEF_MODIMIZER, type=int, help="Modimizer size."
+    )
+    ap.add_argument(
+        "-t",
+        "--ident_thr",
+        default=DEF_IDENT_THR,
+        type=float,
+        help="Identity threshold.",
+    )
+    ap.add_argument(
+        "--max_band", default=None, type=int, help="Only calculate this band."
+    )
+    ap.add_argument("-p", "--threads", default=1, type=int, help="Number of threads.")
+    ap.add_argument(
+        "-r",
+        "--repeats",
+        default=3,
+        type=int,
+        help="Number of runs. The fastest of each stage is reported.",
+    )
+    ap.add_argument(
+        "-j",
+        "--json",
+        default=None,
+        type=str,
+        help="Also write parameters and timings to this json file.",
+    )
+    args = ap.parse_args()
+
+    params: dict[str, Any] = {
+        "window": args.window,
+        "delta": args.delta,
+        "kmer_size": args.kmer_size,
+        "ident_thr": args.ident_thr,
+        "modimizer": args.modimizer,
+        "max_band": args.max_band,
+        "threads": args.threads,
+    }
+    if args.infile:
+        name = args.name
+        if name is None:
+            with open(args.infile, "rt") as fh:
+                name = fh.readline()[1:].split()[0]
+        seq = fetch_seq(args.infile, name)
+        source: dict[str, Any] = {"infile": os.path.abspath(args.infile), "name": name}
+    else:
+        source = {
+            "length": args.length,
+            "monomer_size": args.monomer_size,
+            "hor_size": args.hor_size,
+            "monomer_divergence": args.monomer_divergence,
+            "divergence": args.divergence,
+            "flank": args.flank,
+            "seed": args.seed,
+        }
+        seq = hor_array(**source)
+
+    timings = benchmark_self_ident(seq, repeats=args.repeats, **params)
+
+    print(f"{'stage':<14}{'seconds':>10}{'bp/s':>16}{'peak RSS (MB)':>16}")
+    for timing in timings:
+        print(
+            f"{timing.stage:<14}{timing.seconds:>10.3f}{timing.bp_per_s:>16,.0f}{timing.peak_rss_mb:>16,.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "wt") as fh:
+            json.dump(
+                {
+                    "seq_len": len(seq),
+                    "source": source,
+                    "params": params,
+                    "timings": [timing._asdict() for timing in timings],
+                },
+                fh,
+                indent=2,
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
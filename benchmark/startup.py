@@ -0,0 +1,128 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import NamedTuple
+
+# Modules only needed once a subcommand runs.
+HEAVY_MODULES = ("numpy", "polars", "matplotlib", "pyfaidx", "mmh3")
+COMMANDS = (
+    (),
+    ("length",),
+    ("nonredundant",),
+    ("entropy",),
+    ("self-ident",),
+    ("self-ident-export",),
+    ("pairwise-ident",),
+)
+
+
+class StartupTiming(NamedTuple):
+    command: str
+    min_seconds: float
+    median_seconds: float
+
+
+def loaded_heavy_modules() -> list[str]:
+    """
+    Get heavy modules loaded by importing `censtats.main` in a new interpreter.
+    """
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, json, censtats.main; print(json.dumps(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    modules = json.loads(proc.stdout)
+    return [module for module in HEAVY_MODULES if module in modules]
+
+
+def benchmark_startup(repeats: int) -> list[StartupTiming]:
+    """
+    Time `censtats <command> -h` in a new interpreter for each subcommand.
+
+    # Args
+    * repeats
+            * Number of runs of each command.
+
+    # Returns
+    * Fastest and median time of each command.
+    """
+    timings = []
+    for command in COMMANDS:
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-m", "censtats.main", *command, "-h"],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            seconds.append(time.perf_counter() - start)
+        timings.append(
+            StartupTiming(
+                " ".join(["censtats", *command, "-h"]),
+                min(seconds),
+                statistics.median(seconds),
+            )
+        )
+    return timings
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark startup time of censtats and each subcommand."
+    )
+    ap.add_argument(
+        "-r", "--repeats", default=5, type=int, help="Number of runs of each command."
+    )
+    ap.add_argument(
+        "-j",
+        "--json",
+        default=None,
+        type=str,
+        help="Also write timings and loaded heavy modules to this json file.",
+    )
+    ap.add_argument(
+        "--check",
+        action="store_true",
+        help=f"Fail if importing censtats.main loads any of {', '.join(HEAVY_MODULES)}.",
+    )
+    args = ap.parse_args()
+
+    heavy_modules = loaded_heavy_modules()
+    timings = benchmark_startup(args.repeats)
+
+    print(f"{'command':<36}{'min (s)':>10}{'median (s)':>12}")
+    for timing in timings:
+        print(
+            f"{timing.command:<36}{timing.min_seconds:>10.3f}{timing.median_seconds:>12.3f}"
+        )
+    print(f"Heavy modules loaded on startup: {', '.join(heavy_modules) or 'none'}")
+
+    if args.json:
+        with open(args.json, "wt") as fh:
+            json.dump(
+                {
+                    "repeats": args.repeats,
+                    "heavy_modules": heavy_modules,
+                    "timings": [timing._asdict() for timing in timings],
+                },
+                fh,
+                indent=2,
+            )
+
+    if args.check and heavy_modules:
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
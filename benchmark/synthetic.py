@@ -0,0 +1,126 @@
+import argparse
+
+import numpy as np
+
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+def mutate(seq: np.ndarray, rate: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Substitute each base of an encoded sequence with a different base at `rate`.
+    """
+    seq = seq.copy()
+    is_mutated = rng.random(len(seq)) < rate
+    # Shift by 1-3 so the base always changes.
+    seq[is_mutated] = (
+        seq[is_mutated] + rng.integers(1, 4, is_mutated.sum(), dtype=np.uint8)
+    ) % 4
+    return seq
+
+
+def hor_array(
+    length: int,
+    *,
+    monomer_size: int = 171,
+    hor_size: int = 12,
+    monomer_divergence: float = 0.2,
+    divergence: float = 0.02,
+    flank: int = 0,
+    seed: int = 0,
+) -> str:
+    """
+    Generate a synthetic higher-order repeat (HOR) array.
+
+    The HOR unit is `hor_size` monomers diverged from a single ancestral monomer.
+    The array is tandem copies of the HOR unit, each base diverged from it at `divergence`.
+
+    # Args
+    * length
+            * Length of the array in bp.
+    * monomer_size
+            * Monomer length in bp.
+    * hor_size
+            * Number of monomers in the HOR unit.
+    * monomer_divergence
+            * Fraction of bases differing between each monomer of the HOR unit and the ancestral monomer.
+    * divergence
+            * Fraction of bases differing between each copy of the HOR unit.
+    * flank
+            * Length of random unique sequence on each side of the array.
+    * seed
+            * Random seed.
+
+    # Returns
+    * Sequence of length `length + 2 * flank`.
+    """
+    rng = np.random.default_rng(seed)
+    monomer = rng.integers(0, 4, monomer_size, dtype=np.uint8)
+    hor = np.concatenate(
+        [mutate(monomer, monomer_divergence, rng) for _ in range(hor_size)]
+    )
+    n_copies = -(-length // len(hor))
+    array = mutate(np.tile(hor, n_copies)[:length], divergence, rng)
+    seq = np.concatenate(
+        [
+            rng.integers(0, 4, flank, dtype=np.uint8),
+            array,
+            rng.integers(0, 4, flank, dtype=np.uint8),
+        ]
+    )
+    return BASES[seq].tobytes().decode("ascii")
+
+
+def add_hor_array_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "-l", "--length", default=1_000_000, type=int, help="HOR array length in bp."
+    )
+    ap.add_argument(
+        "--monomer_size", default=171, type=int, help="Monomer length in bp."
+    )
+    ap.add_argument(
+        "--hor_size", default=12, type=int, help="Number of monomers per HOR unit."
+    )
+    ap.add_argument(
+        "--monomer_divergence",
+        default=0.2,
+        type=float,
+        help="Fraction of bases differing between monomers of the HOR unit.",
+    )
+    ap.add_argument(
+        "--divergence",
+        default=0.02,
+        type=float,
+        help="Fraction of bases differing between copies of the HOR unit.",
+    )
+    ap.add_argument(
+        "--flank",
+        default=0,
+        type=int,
+        help="Length of unique sequence on each side of the array in bp.",
+    )
+    ap.add_argument("--seed", default=0, type=int, help="Random seed.")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Generate a synthetic HOR array fasta.")
+    add_hor_array_args(ap)
+    ap.add_argument("-o", "--outfile", required=True, type=str, help="Output fasta.")
+    ap.add_argument("-n", "--name", default="hor", type=str, help="Record name.")
+    args = ap.parse_args()
+
+    seq = hor_array(
+        args.length,
+        monomer_size=args.monomer_size,
+        hor_size=args.hor_size,
+        monomer_divergence=args.monomer_divergence,
+        divergence=args.divergence,
+        flank=args.flank,
+        seed=args.seed,
+    )
+    with open(args.outfile, "wt") as fh:
+        fh.write(f">{args.name}\n{seq}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
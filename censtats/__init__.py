@@ -1,3 +1,10 @@
-from . import length
+from typing import TYPE_CHECKING
 
-__all__ = ["length"]
+from .lazy import lazy_attrs
+
+if TYPE_CHECKING:
+    from . import length, self_ident
+
+__all__ = ["length", "self_ident"]
+
+__getattr__ = lazy_attrs(__name__, {"length": ".length", "self_ident": ".self_ident"})
@@ -1,46 +1,198 @@
-from collections import deque
-from typing import Callable, Iterable
+from typing import NamedTuple
 
-from intervaltree import Interval
+import numpy as np
+import polars as pl
 
 
-def fn_cmp_def(_itv_1: Interval, _itv_2: Interval) -> bool:
-    return True
+class MergedIntervals(NamedTuple):
+    starts: np.ndarray
+    ends: np.ndarray
+    # Number of intervals merged.
+    counts: np.ndarray
+    # Summed length of intervals merged.
+    lengths: np.ndarray
+    # Index of first interval merged. Use to take other columns of merged intervals.
+    firsts: np.ndarray
 
 
-def fn_merge_itv_def(itv_1: Interval, itv_2: Interval) -> Interval:
-    return Interval(begin=itv_1.begin, end=itv_2.end, data=None)
+def merge_segment_ids(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    dst: int = 1,
+    *,
+    values: np.ndarray | None = None,
+    blocked: np.ndarray | None = None,
+    cummax_end: bool = False,
+) -> np.ndarray:
+    """
+    Assign merged segment ids to intervals sorted by start then end.
+
+    Adjacent intervals are merged if the gap between them is at most `dst` and all predicates pass.
+
+    # Args
+    * starts
+            * Interval starts.
+    * ends
+            * Interval ends.
+    * dst
+            * Maximum gap in bp between an interval and the end of the segment before it.
+    * values
+            * Only merge adjacent intervals with equal values.
+    * blocked
+            * Don't merge across the gap between interval `i` and `i + 1` if `blocked[i]`. One less than intervals.
+    * cummax_end
+            * Measure gaps from the furthest end so far rather than the end of the previous interval.
+            * Otherwise, an interval nested in the one before it can block a merge.
+
+    # Returns
+    * Segment id of each interval starting from 0.
+    """
+    n = len(starts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    prev_ends = np.maximum.accumulate(ends)[:-1] if cummax_end else ends[:-1]
+    merge = starts[1:] - prev_ends <= dst
+    if values is not None:
+        merge &= values[1:] == values[:-1]
+    if blocked is not None:
+        merge &= ~blocked
+
+    segment_ids = np.zeros(n, dtype=np.int64)
+    np.cumsum(~merge, out=segment_ids[1:])
+    return segment_ids
+
+
+def merge_intervals(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    dst: int = 1,
+    *,
+    values: np.ndarray | None = None,
+    blocked: np.ndarray | None = None,
+    cummax_end: bool = False,
+) -> MergedIntervals:
+    """
+    Merge intervals sorted by start then end in a single pass. See `merge_segment_ids` for args.
+
+    A merged interval spans from its first start to its last end or its furthest end if `cummax_end`.
+
+    # Returns
+    * Merged intervals with the number, summed length, and index of the first of intervals merged.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    n = len(starts)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return MergedIntervals(empty, empty, empty, empty, empty)
 
+    segment_ids = merge_segment_ids(
+        starts, ends, dst, values=values, blocked=blocked, cummax_end=cummax_end
+    )
+    firsts = np.flatnonzero(np.diff(segment_ids, prepend=-1))
+    lasts = np.append(firsts[1:], n) - 1
+    return MergedIntervals(
+        starts[firsts],
+        np.maximum.reduceat(ends, firsts) if cummax_end else ends[lasts],
+        np.diff(np.append(firsts, n)),
+        np.add.reduceat(ends - starts, firsts),
+        firsts,
+    )
 
-def merge_itvs(
-    itvs: Iterable[Interval],
+
+def merge_intervals_frame(
+    df: pl.LazyFrame,
     dst: int = 1,
-    fn_cmp: Callable[[Interval, Interval], bool] | None = None,
-    fn_merge_itv: Callable[[Interval, Interval], Interval] | None = None,
-) -> list[Interval]:
-    if not fn_cmp:
-        fn_cmp = fn_cmp_def
-    if not fn_merge_itv:
-        fn_merge_itv = fn_merge_itv_def
-
-    final_itvs = []
-    sorted_itvs = deque(sorted(itvs))
-    while sorted_itvs:
-        try:
-            itv_1 = sorted_itvs.popleft()
-        except IndexError:
-            break
-        try:
-            itv_2 = sorted_itvs.popleft()
-        except IndexError:
-            final_itvs.append(itv_1)
-            break
-        dst_between = itv_2.begin - itv_1.end
-        passes_cmp = fn_cmp(itv_1, itv_2)
-        if dst_between <= dst and passes_cmp:
-            sorted_itvs.appendleft(fn_merge_itv(itv_1, itv_2))
-        else:
-            final_itvs.append(itv_1)
-            sorted_itvs.appendleft(itv_2)
-
-    return final_itvs
+    *,
+    by: list[str],
+    start: str = "chrom_st",
+    end: str = "chrom_end",
+    blocked: str | None = None,
+) -> pl.LazyFrame:
+    """
+    Merge intervals sorted by `by`, start, then end in a single pass. Same merges as `merge_intervals` within each group of `by`.
+
+    # Args
+    * df
+            * Intervals.
+    * dst
+            * Maximum gap in bp between an interval and the end of the segment before it.
+    * by
+            * Only merge intervals within the same group of these columns.
+    * start
+            * Start column.
+    * end
+            * End column.
+    * blocked
+            * Boolean column. Don't merge an interval with the one before it if true.
+
+    # Returns
+    * Merged intervals with columns `by`, `start`, `end`, `count` (intervals merged), and `length` (summed length of intervals merged).
+    """
+    merge = (pl.col(start) - pl.col(end).shift(1).over(by) <= dst).fill_null(False)
+    if blocked:
+        merge &= ~pl.col(blocked).fill_null(False)
+
+    return (
+        # Groups always start a new segment so segment ids don't need to be by group.
+        df.with_columns(segment=(~merge).cum_sum())
+        .group_by(*by, "segment", maintain_order=True)
+        .agg(
+            pl.col(start).first(),
+            pl.col(end).last(),
+            count=pl.len(),
+            length=(pl.col(end) - pl.col(start)).sum(),
+        )
+        .drop("segment")
+    )
+
+
+def overlapping_pairs(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    other_starts: np.ndarray,
+    other_ends: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find all pairs of overlapping half-open intervals in a single sorted sweep.
+
+    # Args
+    * starts
+            * Interval starts.
+    * ends
+            * Interval ends.
+    * other_starts
+            * Other interval starts. Must be sorted.
+    * other_ends
+            * Other interval ends.
+
+    # Returns
+    * Index of interval and index of other interval of each overlapping pair.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    other_starts = np.asarray(other_starts, dtype=np.int64)
+    other_ends = np.asarray(other_ends, dtype=np.int64)
+    if len(starts) == 0 or len(other_starts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    # Other intervals before lo end at or before start even if nested in a longer interval.
+    lo = np.searchsorted(np.maximum.accumulate(other_ends), starts, side="right")
+    # Other intervals from hi start at or after end.
+    hi = np.searchsorted(other_starts, ends, side="left")
+    n_candidates = np.maximum(hi - lo, 0)
+
+    idxs = np.repeat(np.arange(len(starts)), n_candidates)
+    offsets = np.arange(len(idxs)) - np.repeat(
+        np.cumsum(n_candidates) - n_candidates, n_candidates
+    )
+    other_idxs = np.repeat(lo, n_candidates) + offsets
+
+    overlaps = (other_starts[other_idxs] < ends[idxs]) & (
+        other_ends[other_idxs] > starts[idxs]
+    )
+    return idxs[overlaps], other_idxs[overlaps]
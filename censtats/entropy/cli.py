@@ -1,27 +1,26 @@
 import os
 import math
 import argparse
-import polars as pl
-import matplotlib.pyplot as plt
 from typing import Generator, TextIO, TYPE_CHECKING, Any
 from collections import Counter
 # from concurrent.futures import ProcessPoolExecutor
 
-from matplotlib.colors import LinearSegmentedColormap
 from intervaltree import Interval, IntervalTree
 from loguru import logger
 
 from .constants import DEF_FILTER_RP, DEF_BED9_COLS, DEF_WINDOW_SIZE
-from ..common import merge_itvs
+from .. import profiling
 
 if TYPE_CHECKING:
+    import polars as pl
+
     SubArgumentParser = argparse._SubParsersAction[argparse.ArgumentParser]
 else:
     SubArgumentParser = Any
 
 
 def get_shannon_index_itvs(
-    df: pl.DataFrame,
+    df: "pl.DataFrame",
     window_size: int = DEF_WINDOW_SIZE,
     filter_repeats: set[str] | None = None,
 ) -> Generator[Interval, None, None]:
@@ -41,6 +40,8 @@ def get_shannon_index_itvs(
     # Returns
     Generator of `Interval`s with shannon index in `data` attribute.
     """
+    import polars as pl
+
     if not filter_repeats:
         filter_repeats = DEF_FILTER_RP
 
@@ -96,13 +97,13 @@ def get_shannon_index_itvs(
 
 
 def calculate_single_windowed_shannon_index(
-    df_group: tuple[tuple[object, ...], pl.DataFrame],
+    df_group: tuple[tuple[object, ...], "pl.DataFrame"],
     outdir: str | None,
     window: int,
     ignore_repeats: list[str],
     *,
     omit_plot: bool,
-) -> pl.DataFrame | None:
+) -> "pl.DataFrame | None":
     """
     Calculate windowed shannon index for a chrom `DataFrame` group.
 
@@ -121,16 +122,28 @@ def calculate_single_windowed_shannon_index(
     # Returns
     `DataFrame` if no `outdir`.
     """
+    import numpy as np
+    import polars as pl
+    from matplotlib.colors import LinearSegmentedColormap
+
+    from ..common import merge_intervals
+
     grp, df = df_group
     chrom = grp[0]
     logger.info(f"Calculating Shannon index for {chrom}")
-    itvs = list(get_shannon_index_itvs(df, window, filter_repeats=set(ignore_repeats)))
-    merged_itvs = merge_itvs(
-        itvs,
+    with profiling.stage("shannon_index") as stage:
+        itvs = list(
+            get_shannon_index_itvs(df, window, filter_repeats=set(ignore_repeats))
+        )
+        stage.rows = len(itvs)
+    itvs.sort()
+    sh_idxs = np.array([itv.data for itv in itvs], dtype=np.float64)
+    # Merge if index equal.
+    merged_itvs = merge_intervals(
+        np.array([itv.begin for itv in itvs], dtype=np.int64),
+        np.array([itv.end for itv in itvs], dtype=np.int64),
         dst=1,
-        # Merge if index equal.
-        fn_cmp=lambda x, y: x.data == y.data,
-        fn_merge_itv=lambda x, y: Interval(x.begin, y.end, x.data),
+        values=sh_idxs,
     )
     # Scale colors based on index
     cmap = LinearSegmentedColormap.from_list("", ["red", "orange", "green"])
@@ -138,17 +151,21 @@ def calculate_single_windowed_shannon_index(
         [
             (
                 chrom,
-                i.begin,
-                i.end,
+                st,
+                end,
                 "shannon_index",
-                i.data,
+                sh_idx,
                 "+",
-                i.begin,
-                i.end,
+                st,
+                end,
                 # Convert scaled color to rgb
-                ",".join(str(round(clr * 255)) for clr in cmap(i.data)[0:-1]),
+                ",".join(str(round(clr * 255)) for clr in cmap(sh_idx)[0:-1]),
+            )
+            for st, end, sh_idx in zip(
+                merged_itvs.starts.tolist(),
+                merged_itvs.ends.tolist(),
+                sh_idxs[merged_itvs.firsts].tolist(),
             )
-            for i in merged_itvs
         ],
         schema=DEF_BED9_COLS,
         orient="row",
@@ -157,34 +174,38 @@ def calculate_single_windowed_shannon_index(
         return df_entropy
 
     if not omit_plot:
-        logger.info(f"Generating plot for {chrom}")
-        plt.clf()
-        _, ax = plt.subplots(figsize=(20, 10))
-
-        # Draw repeat colors
-        for r in df.iter_rows(named=True):
-            if r["name"] == "ALR/Alpha" and not r.get("rgb"):
-                color = "red"
-            else:
-                color = r.get("rgb")
-            ax.axvspan(
-                xmin=r["chromStart"], xmax=r["chromEnd"], facecolor=color, alpha=0.3
-            )
-
-        # Plot original values.
-        if itvs:
-            begin, entropy = zip(*[(itv.begin, itv.data) for itv in itvs])
-            ax.plot(begin, entropy, color="black")
-            ax.fill_between(begin, entropy, color="black")
-
-        ax.margins(x=0, y=0)
-
-        plt.title(f"{chrom} ({window=:,}bp)")
-        plt.xlabel("Position")
-        plt.ylabel("Shannon index")
-        plt.minorticks_on()
-        plt.savefig(os.path.join(outdir, f"{chrom}.png"), bbox_inches="tight")
-        plt.close()
+        with profiling.stage("plot"):
+            # Only load pyplot if plotting.
+            import matplotlib.pyplot as plt
+
+            logger.info(f"Generating plot for {chrom}")
+            plt.clf()
+            _, ax = plt.subplots(figsize=(20, 10))
+
+            # Draw repeat colors
+            for r in df.iter_rows(named=True):
+                if r["name"] == "ALR/Alpha" and not r.get("rgb"):
+                    color = "red"
+                else:
+                    color = r.get("rgb")
+                ax.axvspan(
+                    xmin=r["chromStart"], xmax=r["chromEnd"], facecolor=color, alpha=0.3
+                )
+
+            # Plot original values.
+            if itvs:
+                begin, entropy = zip(*[(itv.begin, itv.data) for itv in itvs])
+                ax.plot(begin, entropy, color="black")
+                ax.fill_between(begin, entropy, color="black")
+
+            ax.margins(x=0, y=0)
+
+            plt.title(f"{chrom} ({window=:,}bp)")
+            plt.xlabel("Position")
+            plt.ylabel("Shannon index")
+            plt.minorticks_on()
+            plt.savefig(os.path.join(outdir, f"{chrom}.png"), bbox_inches="tight")
+            plt.close()
 
     df_entropy.write_csv(
         os.path.join(outdir, f"{chrom}.bed"), separator="\t", include_header=False
@@ -201,7 +222,12 @@ def calculate_windowed_shannon_index(
     *,
     omit_plot: bool,
 ) -> int:
-    df_all = pl.read_csv(infile, separator="\t", has_header=False)
+    # Imported here so registering the subcommand doesn't load polars.
+    import polars as pl
+
+    with profiling.stage("read") as stage:
+        df_all = pl.read_csv(infile, separator="\t", has_header=False)
+        stage.rows = df_all.height
     n_cols = df_all.shape[1]
     df_all = df_all.rename(
         dict(zip([f"column_{c}" for c in range(1, n_cols)], DEF_BED9_COLS[:n_cols]))
@@ -209,7 +235,12 @@ def calculate_windowed_shannon_index(
     os.makedirs(outdir, exist_ok=True)
 
     df_grps = df_all.partition_by(["chrom"], as_dict=True, maintain_order=True).items()
-    for grp in df_grps:
+    for grp in profiling.iter_stage(
+        "entropy",
+        df_grps,
+        contig_of=lambda grp: grp[0][0],
+        rows_of=lambda grp: grp[1].height,
+    ):
         calculate_single_windowed_shannon_index(
             grp, outdir, window_size, ignore_repeats, omit_plot=omit_plot
         )
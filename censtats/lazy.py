@@ -0,0 +1,39 @@
+"""
+Import package attributes on first access so importing a package or registering a subcommand stays cheap.
+"""
+
+import sys
+import importlib
+from typing import Any, Callable
+
+
+def lazy_attrs(package: str, attrs: dict[str, str]) -> Callable[[str], Any]:
+    """
+    Create a module `__getattr__` (PEP 562) that imports attributes from submodules on first access.
+
+    # Args
+    * package
+            * Name of package or module. Usually `__name__`.
+    * attrs
+            * Module of each attribute. Relative to `package` if it starts with `.`.
+            * An attribute with the same name as its relative module is the module itself.
+
+    # Returns
+    * Module `__getattr__`.
+    """
+
+    def __getattr__(name: str) -> Any:
+        try:
+            module_name = attrs[name]
+        except KeyError:
+            raise AttributeError(
+                f"module {package!r} has no attribute {name!r}"
+            ) from None
+
+        module = importlib.import_module(module_name, package)
+        value = module if module_name == f".{name}" else getattr(module, name)
+        # Later lookups don't call __getattr__.
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
@@ -1,7 +1,24 @@
 """
 Module to calculate HOR array length.
 """
-from .estimate_length import hor_array_length
-from .io import read_rm, read_stv
 
-__all__ = ["hor_array_length", "read_rm", "read_stv"]
+from typing import TYPE_CHECKING
+
+from ..lazy import lazy_attrs
+
+if TYPE_CHECKING:
+    from .estimate_length import hor_array_length
+    from .io import read_rm, read_stv, scan_rm, scan_stv
+
+__all__ = ["hor_array_length", "read_rm", "read_stv", "scan_rm", "scan_stv"]
+
+__getattr__ = lazy_attrs(
+    __name__,
+    {
+        "hor_array_length": ".estimate_length",
+        "read_rm": ".io",
+        "read_stv": ".io",
+        "scan_rm": ".io",
+        "scan_stv": ".io",
+    },
+)
@@ -3,7 +3,7 @@ import argparse
 
 from typing import TYPE_CHECKING, Any, TextIO
 
-from .estimate_length import hor_array_length
+from .. import profiling
 from .constants import (
     DEF_MIN_BLK_HOR_UNITS,
     DEF_MIN_ARR_HOR_UNITS,
@@ -11,13 +11,13 @@ from .constants import (
     DEF_MIN_ARR_PROP,
     DEF_BP_MERGE_UNITS,
     DEF_BP_MERGE_BLKS,
+    DEF_MERGE_RBLACKLIST,
     DEF_INPUT_BED_COLS,
     DEF_INPUT_RM_COLS,
     DEF_INPUT_RM_COL_IDX,
     DEF_OUTPUT_BED_COLS,
     DEF_OUTPUT_BED_COLS_STRAND,
 )
-from .io import format_and_output_lengths, read_stv, read_rm
 
 if TYPE_CHECKING:
     SubArgumentParser = argparse._SubParsersAction[argparse.ArgumentParser]
@@ -39,7 +39,7 @@ def add_hor_length_cli(parser: SubArgumentParser) -> None:
     ap.add_argument(
         "-r",
         "--input_rm",
-        help=f"Input tab-delimited RepeatMasker file with no header. Prevents joining across. Expects columns: {DEF_INPUT_RM_COLS} at indices {DEF_INPUT_RM_COL_IDX}.",
+        help=f"Input tab-delimited RepeatMasker file with no header. Prevents joining across gaps mostly covered by {sorted(DEF_MERGE_RBLACKLIST)}. Ties in coverage go to the repeat that starts first. Expects columns: {DEF_INPUT_RM_COLS} at indices {DEF_INPUT_RM_COL_IDX}.",
         type=argparse.FileType("rb"),
         default=None,
     )
@@ -154,8 +154,19 @@ def calculate_hor_length(
     ### Returns
     0 if successful.
     """
-    df_stv = read_stv(infile)
-    df_rm = read_rm(rmfile) if rmfile else None
+    # Imported here so registering the subcommand doesn't load polars.
+    from .estimate_length import hor_array_length
+    from .io import format_and_output_lengths, read_stv, read_rm
+
+    with profiling.stage("read") as stage:
+        df_stv = read_stv(infile)
+        # Only repeats on contigs with HOR units can block a merge.
+        df_rm = (
+            read_rm(rmfile, contigs=df_stv.get_column("chrom").unique())
+            if rmfile
+            else None
+        )
+        stage.rows = df_stv.height + (df_rm.height if df_rm is not None else 0)
 
     df_all_len, df_all_strand_len = hor_array_length(
         df_stv=df_stv,
@@ -170,10 +181,12 @@ def calculate_hor_length(
         allow_nonlive=allow_nonlive,
     )
 
-    if output_strand:
-        format_and_output_lengths(
-            df_all_strand_len, output_strand, DEF_OUTPUT_BED_COLS_STRAND
-        )
+    with profiling.stage("write") as stage:
+        if output_strand:
+            format_and_output_lengths(
+                df_all_strand_len, output_strand, DEF_OUTPUT_BED_COLS_STRAND
+            )
 
-    format_and_output_lengths(df_all_len, output, DEF_OUTPUT_BED_COLS)
+        format_and_output_lengths(df_all_len, output, DEF_OUTPUT_BED_COLS)
+        stage.rows = df_all_len.height + df_all_strand_len.height
     return 0
@@ -1,8 +1,6 @@
-from collections import Counter
-import polars as pl
-import intervaltree as it
+from typing import TypeVar
 
-from typing import Any, Callable, NamedTuple
+import polars as pl
 
 from .constants import (
     DEF_BP_MERGE_BLKS,
@@ -15,56 +13,187 @@ from .constants import (
     DEF_OUTPUT_BED_COLS,
     DEF_OUTPUT_BED_COLS_STRAND,
 )
-from ..common import merge_itvs
+from .. import profiling
+from ..common import merge_intervals_frame, overlapping_pairs
+
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
+
 
+def blocked_gaps(df_gaps: pl.DataFrame, df_rm: pl.DataFrame) -> pl.DataFrame:
+    """
+    Check which gaps between HOR units shouldn't be merged because the repeat covering most of them is in `DEF_MERGE_RBLACKLIST`.
 
-class MergeHORData(NamedTuple):
-    name: str
-    hor_count: int
-    hor_len: int
+    All gaps are checked against all RepeatMasker annotations in a single sorted sweep.
+    Ties in coverage go to the repeat that starts first, then by name.
+
+    # Args
+    * df_gaps
+            * Gaps with columns `chrom`, `gap_st`, and `gap_end`.
+    * df_rm
+            * RepeatMasker annotations with columns `contig`, `start`, `end`, and `type`.
+
+    # Returns
+    * `df_gaps` with boolean column `blocked`.
+    """
+    # Span of gaps on each contig.
+    df_bounds = df_gaps.group_by("chrom").agg(
+        bound_st=pl.col("gap_st").min(), bound_end=pl.col("gap_end").max()
+    )
+    df_rm = (
+        df_rm.lazy()
+        # Only annotations on contigs with gaps and near them. Everything else can't overlap a gap.
+        .join(df_bounds.lazy(), left_on="contig", right_on="chrom")
+        .filter(
+            (pl.col("start") < pl.col("bound_end"))
+            & (pl.col("end") > pl.col("bound_st"))
+            & (pl.col("end") > pl.col("start"))
+        )
+        # Identical annotations only count once.
+        .unique(subset=["contig", "start", "end", "type"])
+        .select(pl.col("contig").alias("chrom"), "start", "end", "type")
+        .collect()
+    )
+    # Shift coordinates of each contig past the end of the one before it so all contigs are swept at once.
+    df_offsets = (
+        pl.concat(
+            [
+                df_gaps.select("chrom", pl.col("gap_end").cast(pl.Int64).alias("end")),
+                df_rm.select("chrom", pl.col("end").cast(pl.Int64)),
+            ]
+        )
+        .group_by("chrom")
+        .agg(pl.col("end").max() + 1)
+        .select("chrom", offset=pl.col("end").cum_sum() - pl.col("end"))
+    )
+    gap_pos = df_gaps.join(df_offsets, on="chrom", how="left", maintain_order="left")
+    gap_st = (gap_pos["gap_st"] + gap_pos["offset"]).to_numpy()
+    gap_end = (gap_pos["gap_end"] + gap_pos["offset"]).to_numpy()
+    df_rm = (
+        df_rm.join(df_offsets, on="chrom")
+        .select(
+            "type",
+            start=pl.col("start") + pl.col("offset"),
+            end=pl.col("end") + pl.col("offset"),
+        )
+        .sort("start")
+    )
+
+    idxs, rm_idxs = overlapping_pairs(
+        gap_st, gap_end, df_rm["start"].to_numpy(), df_rm["end"].to_numpy()
+    )
+    df_most_common = (
+        df_rm[rm_idxs]
+        .with_columns(
+            gap_idx=pl.Series(idxs, dtype=pl.UInt32),
+            overlap=pl.min_horizontal(pl.col("end"), pl.Series(gap_end[idxs]))
+            - pl.max_horizontal(pl.col("start"), pl.Series(gap_st[idxs])),
+        )
+        .group_by("gap_idx", "type")
+        .agg(pl.col("overlap").sum(), pl.col("start").min())
+        .sort(
+            "gap_idx",
+            "overlap",
+            "start",
+            "type",
+            descending=[False, True, False, False],
+        )
+        .group_by("gap_idx", maintain_order=True)
+        .first()
+        .select("gap_idx", blocked=pl.col("type").is_in(list(DEF_MERGE_RBLACKLIST)))
+    )
+    return (
+        df_gaps.with_row_index("gap_idx")
+        .join(df_most_common, on="gap_idx", how="left", maintain_order="left")
+        .with_columns(pl.col("blocked").fill_null(False))
+        .drop("gap_idx")
+    )
 
 
-def bed_to_itree(df: pl.DataFrame, fn_mdata: Callable[[int, int], Any] | None = None):
-    return it.IntervalTree(
-        it.Interval(st, end, fn_mdata(st, end) if fn_mdata else None)
-        for st, end in df.select("chrom_st", "chrom_end").iter_rows()
+def hor_unit_gaps(df: pl.LazyFrame, by: list[str]) -> pl.LazyFrame:
+    """
+    Get unique HOR units sorted by position within each group of `by` with the gap before each as `gap_st` and `gap_end`.
+    """
+    return (
+        df.unique(subset=[*by, "chrom_st", "chrom_end"])
+        .sort(*by, "chrom_st", "chrom_end")
+        .with_columns(
+            gap_st=pl.col("chrom_end").shift(1).over(by), gap_end=pl.col("chrom_st")
+        )
     )
 
 
-def merge_hor_unit_itvs(i1: it.Interval, i2: it.Interval) -> it.Interval:
-    i1_data: MergeHORData = i1.data
-    i2_data: MergeHORData = i2.data
-    # Keep count of number of intervals merged and merged length.
-    new_data = MergeHORData(
-        i1_data.name, i1_data.hor_count + 1, i1_data.hor_len + i2_data.hor_len
+def merge_hor_units(
+    df: pl.LazyFrame, dst: int, df_blocked: pl.LazyFrame | None, by: list[str]
+) -> pl.LazyFrame:
+    """
+    Merge HOR units within `dst` bp of each other unless the gap between them is blocked.
+
+    # Args
+    * df
+            * HOR units from `hor_unit_gaps`.
+    * dst
+            * Maximum distance in bp between HOR units.
+    * df_blocked
+            * Gaps from `blocked_gaps`.
+    * by
+            * Only merge HOR units within the same group of these columns.
+
+    # Returns
+    * Merged HOR units with columns `by`, `chrom_st`, `chrom_end`, `name` (length), `score` (HOR units merged), and `prop` (proportion of length that is HOR units).
+    """
+    if df_blocked is not None:
+        df = df.join(
+            df_blocked,
+            on=["chrom", "gap_st", "gap_end"],
+            how="left",
+            maintain_order="left",
+        )
+
+    return (
+        merge_intervals_frame(
+            df, dst, by=by, blocked="blocked" if df_blocked is not None else None
+        )
+        .with_columns(name=pl.col("chrom_end") - pl.col("chrom_st"))
+        .with_columns(
+            score=pl.col("count").cast(pl.Int64),
+            prop=pl.col("length") / pl.col("name"),
+        )
     )
-    return it.Interval(i1.begin, i2.end, new_data)
 
 
-def group_by_dst(df: pl.DataFrame, dst: int, group_name: str) -> pl.DataFrame:
-    try:
-        df = df.drop("index")
-    except pl.exceptions.ColumnNotFoundError:
-        pass
+def group_by_dst(
+    df: FrameT, dst: int, group_name: str, by: str | None = None
+) -> FrameT:
+    def over(expr: pl.Expr) -> pl.Expr:
+        # Separately for each group of by. ex. chrom
+        return expr.over(by) if by else expr
+
     return (
-        df.with_columns(
+        df.drop("index", strict=False)
+        .with_columns(
             # c1  st1 (end1)
             # c1 (st2) end2
-            dst_behind=(pl.col("chrom_st") - pl.col("chrom_end").shift(1)).fill_null(0),
-            dst_ahead=(pl.col("chrom_st").shift(-1) - pl.col("chrom_end")).fill_null(0),
+            dst_behind=over(
+                pl.col("chrom_st") - pl.col("chrom_end").shift(1)
+            ).fill_null(0),
+            dst_ahead=over(
+                pl.col("chrom_st").shift(-1) - pl.col("chrom_end")
+            ).fill_null(0),
         )
         .with_row_index()
         .with_columns(
             **{
                 # Group HOR units based on distance.
-                group_name: pl.when(pl.col("dst_behind").le(dst))
-                # We assign 0 if within merge dst.
-                .then(pl.lit(0))
-                # Otherwise, give unique index.
-                .otherwise(pl.col("index") + 1)
-                # Then create run-length ID to group on.
-                # Contiguous rows within distance will be grouped together.
-                .rle_id()
+                group_name: over(
+                    pl.when(pl.col("dst_behind").le(dst))
+                    # We assign 0 if within merge dst.
+                    .then(pl.lit(0))
+                    # Otherwise, give unique index.
+                    .otherwise(pl.col("index") + 1)
+                    # Then create run-length ID to group on.
+                    # Contiguous rows within distance will be grouped together.
+                    .rle_id()
+                )
             },
         )
         .with_columns(
@@ -72,13 +201,15 @@ def group_by_dst(df: pl.DataFrame, dst: int, group_name: str) -> pl.DataFrame:
             # B:64617 A:52416 G:1
             # B:52416 A:1357  G:2 <- This should be group 3.
             # B:1357  A:1358  G:3
-            pl.when(pl.col("dst_behind").le(dst) & pl.col("dst_ahead").le(dst))
-            .then(pl.col(group_name))
-            .when(pl.col("dst_behind").le(dst))
-            .then(pl.col(group_name).shift(1))
-            .when(pl.col("dst_ahead").le(dst))
-            .then(pl.col(group_name).shift(-1))
-            .otherwise(pl.col(group_name))
+            over(
+                pl.when(pl.col("dst_behind").le(dst) & pl.col("dst_ahead").le(dst))
+                .then(pl.col(group_name))
+                .when(pl.col("dst_behind").le(dst))
+                .then(pl.col(group_name).shift(1))
+                .when(pl.col("dst_ahead").le(dst))
+                .then(pl.col(group_name).shift(-1))
+                .otherwise(pl.col(group_name))
+            )
         )
     )
 
@@ -96,150 +227,113 @@ def hor_array_length(
     output_strand: bool = True,
     allow_nonlive: bool = False,
 ) -> tuple[pl.DataFrame, pl.DataFrame]:
-    dfs: list[pl.DataFrame] = []
-    dfs_strand: list[pl.DataFrame] = []
-    for ctg_name, df_chr in df_stv.sort(by=["chrom", "chrom_st"]).group_by(
-        ["chrom"], maintain_order=True
-    ):
-        ctg_name = ctg_name[0]
-        if not allow_nonlive:
-            df_chr = df_chr.filter(pl.col("name").str.contains("L"))
-
-        df_live_hor = group_by_dst(
-            df_chr,
-            bp_merge_units,
-            "live_group",
-        ).filter(
-            # Filter any live group with fewer than required number of HOR units.
-            pl.col("live_group").count().over("live_group") >= min_blk_hor_units
-        )
-        itvs_live_hor = bed_to_itree(
-            df_live_hor, lambda st, end: MergeHORData(ctg_name, 1, end - st)
-        )
-
-        # Filter to chrom
-        if isinstance(df_rm, pl.DataFrame):
-            itvs_chr_rm = it.IntervalTree(
-                it.Interval(st, end, rtype)
-                for st, end, rtype in df_rm.filter(pl.col("contig") == ctg_name)
-                .select("start", "end", "type")
-                .iter_rows()
+    # All contigs are processed at once. Groups and merges are by chrom.
+    df_units = df_stv.lazy().sort(by=["chrom", "chrom_st"])
+    if not allow_nonlive:
+        df_units = df_units.filter(pl.col("name").str.contains("L"))
+
+    df_live_hor = group_by_dst(
+        df_units,
+        bp_merge_units,
+        "live_group",
+        by="chrom",
+    ).filter(
+        # Filter any live group with fewer than required number of HOR units.
+        pl.col("live_group").count().over("chrom", "live_group") >= min_blk_hor_units
+    )
+    df_arr_units = hor_unit_gaps(
+        df_live_hor.select("chrom", "chrom_st", "chrom_end"), ["chrom"]
+    )
+
+    if output_strand:
+        # Group HOR units by strand into blocks
+        # Requiring at least the min_blk_hor_units per strand block.
+        df_strand_hor = (
+            group_by_dst(
+                df_live_hor.with_columns(
+                    strand_group=pl.col("strand").rle_id().over("chrom")
+                ).filter(
+                    pl.col("strand_group").count().over("chrom", "strand_group")
+                    >= min_blk_hor_units
+                ),
+                # Allow grouping by merge_blks as this is final group check before splitting by strand_group
+                bp_merge_blks,
+                "live_group",
+                by="chrom",
             )
-        else:
-            itvs_chr_rm = None
-
-        # Then check what's between our intervals before merging.
-        def check_correct_merge(itv_1: it.Interval, itv_2: it.Interval) -> bool:
-            # If no repeatmasker tracks, no second check.
-            if not itvs_chr_rm:
-                return True
-            itv_between = it.Interval(itv_1.end, itv_2.begin)
-            # Prevent costly itree lookup if only small interval.
-            if itv_between.length() <= 1:
-                return True
-
-            rm_ovl = itvs_chr_rm.overlap(itv_between)
-
-            if not rm_ovl:
-                return True
-            repeat_count: Counter[str] = Counter()
-            for ovl in rm_ovl:
-                repeat_count[ovl.data] += ovl.overlap_size(itv_between)
-            # Should never KeyError as we return early if rm_ovl is empty.
-            most_common_repeat, _ = repeat_count.most_common(1)[0]
-
-            # Only merge if most common repeat is allowed.
-            return most_common_repeat not in DEF_MERGE_RBLACKLIST
-
-        merged_itvs = merge_itvs(
-            itvs_live_hor.iter(),
-            dst=bp_merge_blks,
-            fn_cmp=check_correct_merge,
-            fn_merge_itv=merge_hor_unit_itvs,
-        )
-        if output_strand:
-            # Group HOR units by strand into blocks
-            # Requiring at least the min_blk_hor_units per strand block.
-            df_live_hor = (
-                group_by_dst(
-                    df_live_hor.with_columns(
-                        strand_group=pl.col("strand").rle_id()
-                    ).filter(
-                        pl.col("strand_group").count().over("strand_group")
-                        >= min_blk_hor_units
-                    ),
-                    # Allow grouping by merge_blks as this is final group check before splitting by strand_group
-                    bp_merge_blks,
-                    "live_group",
-                )
-                # Take both strand and distance into consideration.
-                .with_columns(
-                    strand_group=pl.col("strand").rle_id() + pl.col("live_group")
-                )
+            # Take both strand and distance into consideration.
+            .with_columns(
+                strand_group=pl.col("strand").rle_id().over("chrom")
+                + pl.col("live_group")
             )
-            for _, df_strand_group in df_live_hor.group_by(["strand_group"]):
-                strand = df_strand_group.get_column("strand")[0]
-                itvs_strand = bed_to_itree(
-                    df_strand_group, lambda st, end: MergeHORData(strand, 1, end - st)
-                )
-                merged_strand_itvs = merge_itvs(
-                    itvs_strand.iter(),
-                    dst=bp_merge_blks,
-                    fn_cmp=check_correct_merge,
-                    fn_merge_itv=merge_hor_unit_itvs,
+            # Strand of first HOR unit of group.
+            .with_columns(
+                pl.col("strand").first().over("chrom", "strand_group"),
+            )
+        )
+        df_strand_units = hor_unit_gaps(
+            df_strand_hor.select(
+                "chrom", "strand_group", "strand", "chrom_st", "chrom_end"
+            ),
+            ["chrom", "strand_group"],
+        )
+    else:
+        df_strand_units = None
+
+    # Then check what's between HOR units before merging.
+    df_blocked = None
+    if isinstance(df_rm, pl.DataFrame):
+        with profiling.stage("repeats") as stage:
+            df_gaps = (
+                pl.concat(
+                    [
+                        df.select("chrom", "gap_st", "gap_end")
+                        for df in (df_arr_units, df_strand_units)
+                        if df is not None
+                    ]
                 )
-                df_strand = pl.DataFrame(
-                    (
-                        (
-                            ctg_name,
-                            itv.begin,
-                            itv.end,
-                            itv.length(),
-                            itv.data[1],
-                            itv.data[2] / itv.length(),
-                            strand,
-                        )
-                        for itv in merged_strand_itvs
-                    ),
-                    orient="row",
-                    schema=DEF_OUTPUT_BED_COLS_STRAND,
-                ).filter(
-                    (pl.col("score") >= min_arr_hor_units)
-                    & (pl.col("prop") >= min_arr_prop)
-                    & (pl.col("name") >= min_arr_len)
+                # Only check what's between HOR units that would otherwise be merged.
+                # Prevent costly lookup if only small interval.
+                .filter(
+                    (pl.col("gap_end") - pl.col("gap_st") > 1)
+                    & (pl.col("gap_end") - pl.col("gap_st") <= bp_merge_blks)
                 )
-                dfs_strand.append(df_strand)
-
-        df = (
-            pl.DataFrame(
-                (
-                    (
-                        ctg_name,
-                        itv.begin,
-                        itv.end,
-                        itv.length(),
-                        itv.data[1],
-                        itv.data[2] / itv.length(),
-                    )
-                    for itv in merged_itvs
-                ),
-                orient="row",
-                schema=DEF_OUTPUT_BED_COLS,
+                .unique()
+                .collect()
             )
+            df_blocked = blocked_gaps(df_gaps, df_rm).lazy()
+            stage.rows = df_gaps.height
+
+    def filter_arrays(df: pl.LazyFrame) -> pl.LazyFrame:
+        return df.filter(
             # Require that array has at least n merged HOR units.
-            .filter(
-                (pl.col("score") >= min_arr_hor_units)
-                & (pl.col("prop") >= min_arr_prop)
-                & (pl.col("name") >= min_arr_len)
-            )
+            (pl.col("score") >= min_arr_hor_units)
+            & (pl.col("prop") >= min_arr_prop)
+            & (pl.col("name") >= min_arr_len)
         )
 
-        dfs.append(df)
+    with profiling.stage("length") as stage:
+        df_arrs = filter_arrays(
+            merge_hor_units(df_arr_units, bp_merge_blks, df_blocked, ["chrom"])
+        ).select(DEF_OUTPUT_BED_COLS)
+        if df_strand_units is not None:
+            df_strand_arrs = filter_arrays(
+                merge_hor_units(
+                    df_strand_units,
+                    bp_merge_blks,
+                    df_blocked,
+                    ["chrom", "strand_group", "strand"],
+                )
+            ).select(DEF_OUTPUT_BED_COLS_STRAND)
+        else:
+            df_strand_arrs = pl.LazyFrame(schema=DEF_OUTPUT_BED_COLS_STRAND)
+
+        df_all, df_all_strand = pl.collect_all(
+            [
+                df_arrs.sort(by=["chrom", "chrom_st"]),
+                df_strand_arrs.sort(by=["chrom", "chrom_st"]),
+            ]
+        )
+        stage.rows = df_stv.height
 
-    df_all = pl.concat(dfs).sort(by=["chrom", "chrom_st"])
-    df_all_strand = (
-        pl.concat(dfs_strand)
-        if output_strand
-        else pl.DataFrame(schema=DEF_OUTPUT_BED_COLS_STRAND)
-    ).sort(by=["chrom", "chrom_st"])
     return df_all, df_all_strand
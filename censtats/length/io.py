@@ -1,6 +1,6 @@
 import polars as pl
 
-from typing import TextIO
+from typing import BinaryIO, Iterable, TextIO
 from censtats.length.constants import (
     DEF_INPUT_BED_COLS,
     DEF_INPUT_RM_COLS,
@@ -8,20 +8,37 @@ from censtats.length.constants import (
 )
 
 
-def read_rm(infile: TextIO | str) -> pl.DataFrame:
+def scan_rm(
+    infile: TextIO | BinaryIO | str, contigs: Iterable[str] | None = None
+) -> pl.LazyFrame:
     """
-    Read a tab-delimited RepeatMasker output file and adjust relative coordinates to absolute coordinates.
+    Lazily read a tab-delimited RepeatMasker output file and adjust relative coordinates to absolute coordinates.
+
+    Only the needed columns are parsed. Compressed files (gzip, zstd) are decompressed by polars.
+
+    # Args
+    * infile
+            * RepeatMasker output file.
+    * contigs
+            * Only read annotations on these contigs. Matched before contig coordinates are parsed.
+
+    # Returns
+    * RepeatMasker annotations with columns `DEF_INPUT_RM_COLS`, `ctg_name`, `ctg_st`, and `ctg_end`.
     """
+    lf = pl.scan_csv(
+        infile,
+        separator="\t",
+        has_header=False,
+        truncate_ragged_lines=True,
+    ).select(
+        pl.nth(idx).alias(col)
+        for idx, col in zip(DEF_INPUT_RM_COL_IDX, DEF_INPUT_RM_COLS)
+    )
+    if contigs is not None:
+        lf = lf.filter(pl.col("contig").is_in(list(contigs)))
+
     return (
-        pl.read_csv(
-            infile,
-            separator="\t",
-            has_header=False,
-            columns=DEF_INPUT_RM_COL_IDX,
-            new_columns=DEF_INPUT_RM_COLS,
-            truncate_ragged_lines=True,
-        )
-        .with_columns(
+        lf.with_columns(
             ctg_name=pl.col("contig").str.extract(r"^(.*?):|^(.*?)$"),
             ctg_st=pl.col("contig").str.extract(r":(\d+)-").cast(pl.Int64).fill_null(0),
             ctg_end=pl.col("contig")
@@ -36,19 +53,31 @@ def read_rm(infile: TextIO | str) -> pl.DataFrame:
     )
 
 
-def read_stv(infile: TextIO | str) -> pl.DataFrame:
+def read_rm(
+    infile: TextIO | BinaryIO | str, contigs: Iterable[str] | None = None
+) -> pl.DataFrame:
     """
-    Read an HOR Stv bed.
+    Read a tab-delimited RepeatMasker output file and adjust relative coordinates to absolute coordinates. See `scan_rm`.
     """
-    return pl.read_csv(
-        infile,
-        separator="\t",
-        columns=[0, 1, 2, 3, 4, 5],
-        new_columns=DEF_INPUT_BED_COLS,
-        has_header=False,
+    return scan_rm(infile, contigs).collect()
+
+
+def scan_stv(infile: TextIO | BinaryIO | str) -> pl.LazyFrame:
+    """
+    Lazily read an HOR Stv bed. Compressed files (gzip, zstd) are decompressed by polars.
+    """
+    return pl.scan_csv(infile, separator="\t", has_header=False).select(
+        pl.nth(idx).alias(col) for idx, col in enumerate(DEF_INPUT_BED_COLS)
     )
 
 
+def read_stv(infile: TextIO | BinaryIO | str) -> pl.DataFrame:
+    """
+    Read an HOR Stv bed.
+    """
+    return scan_stv(infile).collect()
+
+
 def format_and_output_lengths(
     df: pl.DataFrame,
     output: TextIO | str,
@@ -1,10 +1,22 @@
+import sys
+import json
+import time
 import argparse
 from typing import Any, TYPE_CHECKING
 
+from . import profiling
+
 from .length.cli import add_hor_length_cli, calculate_hor_length
 from .nonredundant.cli import add_nonredundant_cli, get_nonredundant_cens
 from .entropy.cli import add_entropy_cli, calculate_windowed_shannon_index
-from .self_ident.cli import add_self_ident_cli, get_self_seq_ident
+from .self_ident.cli import (
+    add_pairwise_ident_cli,
+    add_self_ident_cli,
+    add_self_ident_export_cli,
+    export_self_seq_ident,
+    get_pairwise_seq_ident,
+    get_self_seq_ident,
+)
 
 
 if TYPE_CHECKING:
@@ -15,14 +27,51 @@ else:
 
 def main() -> int:
     ap = argparse.ArgumentParser(description="Centromere statistics toolkit.")
+    ap.add_argument(
+        "--profile",
+        action="store_true",
+        help="Log the duration, rows processed, and peak memory of each stage.",
+    )
+    ap.add_argument(
+        "--stats_json",
+        "--stats-json",
+        default=None,
+        type=str,
+        help="Write the duration, rows processed, and peak memory of each stage and contig to this json file.",
+    )
     sub_ap = ap.add_subparsers(dest="cmd")
     add_hor_length_cli(sub_ap)
     add_nonredundant_cli(sub_ap)
     add_entropy_cli(sub_ap)
     add_self_ident_cli(sub_ap)
+    add_self_ident_export_cli(sub_ap)
+    add_pairwise_ident_cli(sub_ap)
 
     args = ap.parse_args()
 
+    if not args.profile and not args.stats_json:
+        return run_command(args)
+
+    profiling.enable()
+    start = time.perf_counter()
+    exit_code = 1
+    try:
+        # Some commands don't return an exit code.
+        exit_code = run_command(args) or 0
+    finally:
+        profile = profiling.report(
+            args.cmd, sys.argv[1:], time.perf_counter() - start, exit_code
+        )
+        if args.profile:
+            profiling.log_report(profile)
+        if args.stats_json:
+            with open(args.stats_json, "wt") as fh:
+                json.dump(profile, fh, indent=2)
+
+    return exit_code
+
+
+def run_command(args: argparse.Namespace) -> int:
     if args.cmd == "length":
         return calculate_hor_length(
             infile=args.input_stv,
@@ -71,6 +120,40 @@ def main() -> int:
             args.processes,
             args.dim,
             args.round_ndigits,
+            args.max_band,
+            args.cache_dir,
+            args.cache_size,
+            args.save_matrix,
+            args.legacy_modimizers,
+            args.regions,
+        )
+    elif args.cmd == "self-ident-export":
+        return export_self_seq_ident(
+            args.infiles,
+            args.outdir,
+            args.ident_thr,
+            args.n_bins,
+            args.ignore_bands,
+            args.dim,
+            args.round_ndigits,
+        )
+    elif args.cmd == "pairwise-ident":
+        return get_pairwise_seq_ident(
+            args.query,
+            args.reference,
+            args.outdir,
+            args.window,
+            args.delta,
+            args.kmer_size,
+            args.ident_thr,
+            args.modimizer,
+            args.processes,
+            args.round_ndigits,
+            args.query_regions,
+            args.reference_regions,
+            args.cache_dir,
+            args.cache_size,
+            args.legacy_modimizers,
         )
     else:
         raise ValueError(f"Unknown command: {args.cmd}")
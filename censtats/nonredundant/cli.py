@@ -2,20 +2,22 @@ import sys
 import argparse
 from typing import Any, TextIO, TYPE_CHECKING
 
-import polars as pl
 from loguru import logger
 
+from .. import profiling
 from .constants import BP_DIFF, IO_COLS, Side, select_exprs
 
 
 if TYPE_CHECKING:
+    import polars as pl
+
     SubArgumentParser = argparse._SubParsersAction[argparse.ArgumentParser]
     RowVals = tuple[Any, ...]
 else:
     SubArgumentParser = Any
 
 
-def read_as_hor_length_tsv(file: str | TextIO) -> pl.DataFrame:
+def read_as_hor_length_tsv(file: str | TextIO) -> "pl.DataFrame":
     """
     Read AS-HOR array length TSV file. Groups by ctg and gets aggregated length before formatting.
     * Expects columns: `["ctg", "start", "end", "length"]`
@@ -26,6 +28,8 @@ def read_as_hor_length_tsv(file: str | TextIO) -> pl.DataFrame:
     * `HG01114_rc-chr1_h2tg000002l#1-130810013:121319346-129631944`
     * `HG01573_rc-chr1_haplotype1-0000024:121168122-126852171`
     """
+    import polars as pl
+
     return (
         pl.read_csv(
             file,
@@ -63,11 +67,16 @@ def get_nonredundant_cens(
     *,
     bp_diff: int = BP_DIFF,
 ):
+    # Imported here so registering the subcommand doesn't load polars.
+    import polars as pl
+
     # Read AS-HOR length dataframe.
     # Calculate cumulative AS-HOR array length per centromere
     # Parse haplotype, chr, sample, and ctg_num_coord.
-    df_left_og_fmt = read_as_hor_length_tsv(infile_left)
-    df_right_og_fmt = read_as_hor_length_tsv(infile_right)
+    with profiling.stage("read") as stage:
+        df_left_og_fmt = read_as_hor_length_tsv(infile_left)
+        df_right_og_fmt = read_as_hor_length_tsv(infile_right)
+        stage.rows = df_left_og_fmt.height + df_right_og_fmt.height
 
     df_merged_og_fmt = pl.concat(
         [
@@ -80,42 +89,44 @@ def get_nonredundant_cens(
     shared_cens: set[tuple[RowVals, RowVals]] = set()
     covered_cens: set[str] = set()
 
-    # Haplotype information is unreliable so have to do row-by-row comparison.
-    # Full outer join makes things very difficult.
-    for _, df_grp in df_merged_og_fmt.group_by(["sample", "chr"]):
-        df_grp = df_grp.filter(~pl.col("og_ctg").is_in(covered_cens))
-        for row_1 in df_grp.iter_rows(named=True):
-            row_1_vals = tuple(row_1.values())
-            for row_2 in df_grp.iter_rows(named=True):
-                row_2_vals = tuple(row_2.values())
-                if (
-                    row_1["og_ctg"] == row_2["og_ctg"]
-                    or row_2["og_ctg"] in covered_cens
-                ):
-                    continue
+    with profiling.stage("compare") as stage:
+        stage.rows = df_merged_og_fmt.height
+        # Haplotype information is unreliable so have to do row-by-row comparison.
+        # Full outer join makes things very difficult.
+        for _, df_grp in df_merged_og_fmt.group_by(["sample", "chr"]):
+            df_grp = df_grp.filter(~pl.col("og_ctg").is_in(covered_cens))
+            for row_1 in df_grp.iter_rows(named=True):
+                row_1_vals = tuple(row_1.values())
+                for row_2 in df_grp.iter_rows(named=True):
+                    row_2_vals = tuple(row_2.values())
+                    if (
+                        row_1["og_ctg"] == row_2["og_ctg"]
+                        or row_2["og_ctg"] in covered_cens
+                    ):
+                        continue
 
-                abs_bp_diff = abs(row_1["length"] - row_2["length"])
-                # Get potential duplicates.
-                # Very rare for AS-HOR array length to be exactly identical.
-                if abs_bp_diff == 0 and row_1["rtype"] == row_2["rtype"]:
-                    dupe_cens[row_1["rtype"]].add(row_1_vals)
-                    dupe_cens[row_1["rtype"]].add(row_2_vals)
+                    abs_bp_diff = abs(row_1["length"] - row_2["length"])
+                    # Get potential duplicates.
+                    # Very rare for AS-HOR array length to be exactly identical.
+                    if abs_bp_diff == 0 and row_1["rtype"] == row_2["rtype"]:
+                        dupe_cens[row_1["rtype"]].add(row_1_vals)
+                        dupe_cens[row_1["rtype"]].add(row_2_vals)
 
-                if abs_bp_diff > bp_diff:
-                    continue
+                    if abs_bp_diff > bp_diff:
+                        continue
+
+                    if row_1["og_ctg"] in covered_cens:
+                        continue
+
+                    covered_cens.add(row_1["og_ctg"])
+                    covered_cens.add(row_2["og_ctg"])
+                    shared_cens.add((row_1_vals, row_2_vals))
 
                 if row_1["og_ctg"] in covered_cens:
                     continue
 
+                cens[row_1["rtype"]].add(row_1_vals)
                 covered_cens.add(row_1["og_ctg"])
-                covered_cens.add(row_2["og_ctg"])
-                shared_cens.add((row_1_vals, row_2_vals))
-
-            if row_1["og_ctg"] in covered_cens:
-                continue
-
-            cens[row_1["rtype"]].add(row_1_vals)
-            covered_cens.add(row_1["og_ctg"])
 
     del covered_cens
 
@@ -166,15 +177,17 @@ def get_nonredundant_cens(
     logger.info(f"{df_right.shape[0]} unique centromeres in right file.")
     logger.info(f"{df_shared.shape[0]} centromeres shared by both files.")
 
-    df_left.write_csv(outfile_left, include_header=False, separator="\t")
-    df_right.write_csv(outfile_right, include_header=False, separator="\t")
-    df_shared.write_csv(outfile_both, include_header=False, separator="\t")
-    df_left_potential_dupes.write_csv(
-        outfile_dupe_left, include_header=False, separator="\t"
-    )
-    df_right_potential_dupes.write_csv(
-        outfile_dupe_right, include_header=False, separator="\t"
-    )
+    with profiling.stage("write") as stage:
+        df_left.write_csv(outfile_left, include_header=False, separator="\t")
+        df_right.write_csv(outfile_right, include_header=False, separator="\t")
+        df_shared.write_csv(outfile_both, include_header=False, separator="\t")
+        df_left_potential_dupes.write_csv(
+            outfile_dupe_left, include_header=False, separator="\t"
+        )
+        df_right_potential_dupes.write_csv(
+            outfile_dupe_right, include_header=False, separator="\t"
+        )
+        stage.rows = df_left.height + df_right.height + df_shared.height
 
 
 def add_nonredundant_cli(parser: SubArgumentParser) -> None:
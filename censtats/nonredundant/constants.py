@@ -1,5 +1,8 @@
 from enum import StrEnum, auto
-import polars as pl
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import polars as pl
 
 
 class Side(StrEnum):
@@ -11,7 +14,9 @@ BP_DIFF = 1000
 IO_COLS = ["ctg", "start", "end", "length"]
 
 
-def select_exprs(side: Side = Side.Left) -> dict[str, pl.Expr]:
+def select_exprs(side: Side = Side.Left) -> dict[str, "pl.Expr"]:
+    import polars as pl
+
     suffix = "_right" if side == Side.Right else ""
     return {
         f"ctg{suffix}": pl.col(f"sample{suffix}")
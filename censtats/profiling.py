@@ -0,0 +1,239 @@
+"""
+Record the duration, rows processed, and peak memory of each stage of a command.
+
+Recording is disabled unless `enable` is called so stages cost nothing by default.
+Stages can be nested, e.g. a stage per contig with a stage per step within it, so their durations can overlap.
+"""
+
+import sys
+import math
+import time
+import resource
+import contextlib
+import contextvars
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+# Records of this process. `None` if disabled.
+_RECORDS: list[dict[str, Any]] | None = None
+# Contig of stages started in this context.
+_CONTIG: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "contig", default=None
+)
+
+
+class StageRecord:
+    """
+    Stage being recorded. Set `rows` to the number of rows, bases, or windows processed.
+    """
+
+    __slots__ = ("rows",)
+
+    def __init__(self) -> None:
+        self.rows: int | None = None
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """
+    Get the peak resident set size in MB of this process or, with `RUSAGE_CHILDREN`, its largest finished child.
+    """
+    max_rss = resource.getrusage(who).ru_maxrss
+    # Bytes on macOS and KB otherwise.
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def enable() -> None:
+    """
+    Start recording stages in this process.
+    """
+    global _RECORDS
+    _RECORDS = []
+
+
+def is_enabled() -> bool:
+    return _RECORDS is not None
+
+
+def records() -> list[dict[str, Any]]:
+    """
+    Get records of this process and those added from other processes.
+    """
+    return list(_RECORDS) if _RECORDS is not None else []
+
+
+def add_records(other_records: list[dict[str, Any]]) -> None:
+    """
+    Add records from another process. See `run_profiled`.
+    """
+    if _RECORDS is not None:
+        _RECORDS.extend(other_records)
+
+
+@contextlib.contextmanager
+def contig(name: str) -> Iterator[None]:
+    """
+    Attribute stages started within this context to contig `name`.
+    """
+    token = _CONTIG.set(name)
+    try:
+        yield
+    finally:
+        _CONTIG.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[StageRecord]:
+    """
+    Record the duration and peak memory of the code within this context as stage `name`.
+
+    # Args
+    * name
+            * Stage name.
+
+    # Returns
+    * Record to set rows processed.
+    """
+    record = StageRecord()
+    if _RECORDS is None:
+        yield record
+        return
+
+    # Wall-clock start to compare stages of different processes.
+    start_time = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        # Appending is atomic so stages can end in different threads.
+        _RECORDS.append(
+            {
+                "stage": name,
+                "contig": _CONTIG.get(),
+                "start": start_time,
+                "seconds": time.perf_counter() - start,
+                "rows": record.rows,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+
+
+def iter_stage(
+    name: str,
+    items: Iterable[T],
+    *,
+    contig_of: Callable[[T], str] | None = None,
+    rows_of: Callable[[T], int] | None = None,
+) -> Iterator[T]:
+    """
+    Record each iteration of a loop over `items` as stage `name`.
+
+    # Args
+    * name
+            * Stage name.
+    * items
+            * Items to loop over.
+    * contig_of
+            * Get the contig of an item. Stages started in the loop are attributed to it.
+    * rows_of
+            * Get the number of rows processed of an item.
+
+    # Returns
+    * Items of `items`.
+    """
+    for item in items:
+        with (
+            contig(contig_of(item)) if contig_of else contextlib.nullcontext(),
+            stage(name) as record,
+        ):
+            record.rows = rows_of(item) if rows_of else None
+            yield item
+
+
+def run_profiled(
+    fn: Callable[..., Any], contig_name: str, *args: Any, **kwargs: Any
+) -> tuple[Any, list[dict[str, Any]]]:
+    """
+    Call `fn` in a worker process with recording enabled and stages attributed to `contig_name`.
+
+    # Returns
+    * Result of `fn` and its records to pass to `add_records` in the parent process.
+    """
+    enable()
+    with contig(contig_name):
+        result = fn(*args, **kwargs)
+    return result, records()
+
+
+def summarize_stages(stage_records: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Total the durations and rows and get the peak memory of records by stage.
+    """
+    summary: dict[str, Any] = {}
+    for record in stage_records:
+        totals = summary.setdefault(
+            record["stage"], {"n": 0, "seconds": 0.0, "rows": 0, "peak_rss_mb": 0.0}
+        )
+        totals["n"] += 1
+        totals["seconds"] += record["seconds"]
+        totals["rows"] += record["rows"] or 0
+        totals["peak_rss_mb"] = max(totals["peak_rss_mb"], record["peak_rss_mb"])
+    return summary
+
+
+def summarize_contigs(stage_records: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Get the duration from the first stage start to the last stage end and the peak memory of records by contig.
+
+    Stages can be nested so durations aren't totaled.
+    """
+    spans: dict[str, list[float]] = {}
+    for record in stage_records:
+        if record["contig"] is None:
+            continue
+        span = spans.setdefault(record["contig"], [math.inf, -math.inf, 0.0])
+        span[0] = min(span[0], record["start"])
+        span[1] = max(span[1], record["start"] + record["seconds"])
+        span[2] = max(span[2], record["peak_rss_mb"])
+    return {
+        contig: {"seconds": end - start, "peak_rss_mb": peak_rss}
+        for contig, (start, end, peak_rss) in spans.items()
+    }
+
+
+def report(
+    command: str, argv: list[str], wall_seconds: float, exit_code: int
+) -> dict[str, Any]:
+    """
+    Create a report of all records.
+
+    # Returns
+    * Report with the command, its total duration and peak memory, each stage, and stages summarized by name and contig.
+    """
+    stage_records = records()
+    return {
+        "command": command,
+        "argv": argv,
+        "exit_code": exit_code,
+        "wall_seconds": wall_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "stages": stage_records,
+        "by_stage": summarize_stages(stage_records),
+        "by_contig": summarize_contigs(stage_records),
+    }
+
+
+def log_report(profile: dict[str, Any]) -> None:
+    """
+    Log the total duration, rows, and peak memory of each stage.
+    """
+    for name, totals in profile["by_stage"].items():
+        logger.info(
+            f"Stage {name} ran {totals['n']} times in {totals['seconds']:.2f}s over {totals['rows']:,} rows with a peak RSS of {totals['peak_rss_mb']:,.1f} MB."
+        )
+    logger.info(
+        f"Finished {profile['command']} in {profile['wall_seconds']:.2f}s with a peak RSS of {max(profile['peak_rss_mb'], profile['peak_rss_children_mb']):,.1f} MB."
+    )
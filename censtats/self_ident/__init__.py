@@ -0,0 +1,47 @@
+"""
+Module to calculate self sequence identity.
+"""
+
+from typing import TYPE_CHECKING
+
+from ..lazy import lazy_attrs
+
+if TYPE_CHECKING:
+    from .estimate_identity import finalize_containment_matrix
+    from .self_identity import (
+        convert_2D_to_1D_ident,
+        pairwise_ident_2D,
+        pairwise_ident_matrix,
+        pairwise_sketches_ident_matrix,
+        self_ident_1D,
+        self_ident_2D,
+        self_ident_matrix,
+        self_ident_sketches,
+    )
+
+__all__ = [
+    "convert_2D_to_1D_ident",
+    "finalize_containment_matrix",
+    "pairwise_ident_2D",
+    "pairwise_ident_matrix",
+    "pairwise_sketches_ident_matrix",
+    "self_ident_1D",
+    "self_ident_2D",
+    "self_ident_matrix",
+    "self_ident_sketches",
+]
+
+__getattr__ = lazy_attrs(
+    __name__,
+    {
+        "convert_2D_to_1D_ident": ".self_identity",
+        "finalize_containment_matrix": ".estimate_identity",
+        "pairwise_ident_2D": ".self_identity",
+        "pairwise_ident_matrix": ".self_identity",
+        "pairwise_sketches_ident_matrix": ".self_identity",
+        "self_ident_1D": ".self_identity",
+        "self_ident_2D": ".self_identity",
+        "self_ident_matrix": ".self_identity",
+        "self_ident_sketches": ".self_identity",
+    },
+)
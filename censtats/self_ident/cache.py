@@ -0,0 +1,118 @@
+import os
+import hashlib
+
+import numpy as np
+from loguru import logger
+
+from .estimate_identity import PackedSketches, SelfSketches
+
+
+def sketch_cache_key(
+    seq: np.ndarray,
+    kmer_size: int,
+    window: int,
+    delta: float,
+    modimizer: int,
+    ambiguous: bool,
+    legacy_modimizers: bool = False,
+) -> str:
+    """
+    Get a cache key from the sequence's digest and all parameters that affect its sketches.
+
+    # Args
+    * seq
+            * Upper-case encoded sequence from `encode_seq`.
+    """
+    digest = hashlib.sha256(seq.tobytes()).hexdigest()
+    return f"{digest}_k{kmer_size}_w{window}_d{delta}_m{modimizer}_a{int(ambiguous)}_l{int(legacy_modimizers)}"
+
+
+def read_cached_sketches(cache_dir: str, key: str) -> SelfSketches | None:
+    """
+    Read sketches from the cache. Returns `None` if not cached.
+    """
+    path = os.path.join(cache_dir, f"{key}.npz")
+    try:
+        with np.load(path) as data:
+            sketches = SelfSketches(
+                PackedSketches(data["ids"], data["offsets"]),
+                PackedSketches(data["neighbors_ids"], data["neighbors_offsets"]),
+                data["vocab"],
+            )
+        # Mark as recently used.
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception as err:
+        logger.warning(f"Ignoring unreadable cached sketches {path}: {err}")
+        return None
+
+    return sketches
+
+
+def write_cached_sketches(
+    cache_dir: str, key: str, sketches: SelfSketches, max_size: int
+) -> None:
+    """
+    Write sketches to the cache and evict least recently used entries until the cache is at most `max_size` bytes.
+    Sketches larger than `max_size` on their own are not cached.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.npz")
+    # Write to a temporary file first so other processes never read a partial file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(
+            fh,
+            ids=sketches.sketches.ids,
+            offsets=sketches.sketches.offsets,
+            neighbors_ids=sketches.sketches_neighbors.ids,
+            neighbors_offsets=sketches.sketches_neighbors.offsets,
+            vocab=sketches.vocab,
+        )
+    size = os.path.getsize(tmp_path)
+    if size > max_size:
+        os.remove(tmp_path)
+        logger.warning(
+            f"Not caching sketches {path} of {size} bytes larger than the cache size of {max_size} bytes."
+        )
+        return
+    os.replace(tmp_path, path)
+    evict_cached_sketches(cache_dir, max_size, keep=path)
+
+
+def evict_cached_sketches(
+    cache_dir: str, max_size: int, keep: str | None = None
+) -> None:
+    """
+    Remove least recently used sketches until the cache is at most `max_size` bytes.
+
+    # Args
+    * cache_dir
+            * Cache directory.
+    * max_size
+            * Maximum size of the cache in bytes.
+    * keep
+            * Path of sketches to never remove, e.g. those just written.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".npz"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
@@ -1,69 +1,113 @@
 import os
-import pyfaidx
+import json
+import math
+import time
 import argparse
 
 from loguru import logger
-from typing import TYPE_CHECKING, Any, Generator
+from typing import TYPE_CHECKING, Any, Callable
 from enum import StrEnum
-from statistics import mean
-from collections import defaultdict
-from concurrent.futures import ProcessPoolExecutor
-
-from .estimate_identity import convertMatrixToBed, createSelfMatrix
-from .read_fasta import generateKmersFromFasta
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 
+from .. import profiling
+from .constants import (
+    DEF_CACHE_SIZE_MB,
+    DEF_DELTA,
+    DEF_IDENT_THR,
+    DEF_IGNORE_BANDS,
+    DEF_KMER_SIZE,
+    DEF_MODIMIZER,
+    DEF_N_BINS,
+    DEF_WINDOW,
+)
+from ..lazy import lazy_attrs
 
+# numpy, pyfaidx, and the identity modules are imported within functions so registering subcommands is cheap.
 if TYPE_CHECKING:
+    import numpy as np
+
+    from .estimate_identity import SelfSketches
+    from .io import Region
+
     SubArgumentParser = argparse._SubParsersAction[argparse.ArgumentParser]
 else:
     SubArgumentParser = Any
 
+# Previously imported at module level so keep them importable from here.
+__getattr__ = lazy_attrs(
+    __name__,
+    {
+        "finalize_containment_matrix": "censtats.self_ident.estimate_identity",
+        "fetch_seq": "censtats.self_ident.read_fasta",
+        "Region": "censtats.self_ident.io",
+        "read_regions": "censtats.self_ident.io",
+        "write_1D_ident_bed": "censtats.self_ident.io",
+        "write_2D_ident_bed": "censtats.self_ident.io",
+        "convert_2D_to_1D_ident": "censtats.self_ident.self_identity",
+        "pairwise_ident_matrix": "censtats.self_ident.self_identity",
+        "self_ident_matrix": "censtats.self_ident.self_identity",
+    },
+)
+
 
 class Dim(StrEnum):
     ONE = "1D"
     TWO = "2D"
 
 
-def convert_2D_to_1D_ident(
-    bed: list[tuple[str, int, int, str, int, int, float]],
+def write_self_ident(
+    mtx: "np.ndarray",
+    outfile: str,
+    seq_id: str,
     window: int,
+    ident_thr: float,
     n_bins: int,
     ignore_bands: int,
-) -> Generator[tuple[int, int, float], None, None]:
-    # Use dictionary to avoid sparse mtx.
-    aln_mtx: defaultdict[int, dict[int, float]] = defaultdict(dict)
-    for line in bed:
-        q_ctg, q_st, q_end, r_ctg, r_st, r_end, perID = line
-        # Convert position to indices.
-        x = q_st // window
-        y = r_st // window
-        aln_mtx[x][y] = perID
-
-    st_idxs = list(aln_mtx.keys())
-    for st_idx in st_idxs:
-        st = st_idx * window + 1
-        end = st + window - 1
-        band_end_idx = st_idx + n_bins
-        # Within the alignment matrix with a n_bins of 5 and ignore_bands of 2:
-        # - '*' is the calculated aln band
-        # - '+' is self aln.
-        # 4 * * *   +
-        # 3 * *   +
-        # 2 *   +
-        # 1   +
-        # 0 +
-        #   0 1 2 3 4
-        mean_ident = mean(
-            aln_mtx[x].get(y, 0.0)
-            for x in range(st_idx, band_end_idx)
-            for y in range(x + ignore_bands, band_end_idx)
+    dim: Dim,
+    round_ndigits: int | None,
+    banded: bool,
+) -> int:
+    """
+    Write a self-identity matrix to `outfile` as a 1D or 2D bedfile.
+
+    # Returns
+    * Number of rows written.
+    """
+    from .io import write_1D_ident_bed, write_2D_ident_bed
+    from .self_identity import convert_2D_to_1D_ident
+
+    if dim == Dim.TWO:
+        logger.info(
+            f"Writing 2D self sequence identity array for {seq_id} to {outfile}"
+        )
+        with open(outfile, "wb") as fh:
+            return write_2D_ident_bed(
+                fh,
+                mtx,
+                window,
+                ident_thr,
+                seq_id,
+                seq_id,
+                banded=banded,
+                round_ndigits=round_ndigits,
+            )
+    else:
+        logger.info(f"Converting 2D self sequence identity matrix to 1D for {seq_id}.")
+        idxs, ident = convert_2D_to_1D_ident(
+            mtx, ident_thr, n_bins, ignore_bands, banded=banded
         )
-        yield st, end, mean_ident
+        logger.info(
+            f"Writing 1D self sequence identity array for {seq_id} to {outfile}"
+        )
+        with open(outfile, "wb") as fh:
+            return write_1D_ident_bed(
+                fh, idxs, ident, window, seq_id, round_ndigits=round_ndigits
+            )
 
 
 def get_single_self_seq_ident(
     seq_id: str,
-    seq: str,
+    infile: str,
     outdir: str,
     window: int,
     delta: float,
@@ -74,34 +118,97 @@ def get_single_self_seq_ident(
     ignore_bands: int,
     dim: Dim,
     round_ndigits: int | None,
-) -> None:
+    max_band: int | None = None,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+    save_matrix: bool = False,
+    legacy_modimizers: bool = False,
+    region: "Region | None" = None,
+    threads: int = 1,
+) -> float:
+    """
+    Generate self sequence identity for a single sequence and write it to `{outdir}/{seq_id}.bed`.
+
+    If `region`, only the sequence within it is used rather than the full record named `seq_id`.
+
+    If `save_matrix`, also write the raw containment matrix to `{outdir}/{seq_id}.npy` and its parameters to `{outdir}/{seq_id}.json`.
+
+    # Returns
+    * Elapsed time in seconds.
+    """
+    import numpy as np
+
+    from .estimate_identity import finalize_containment_matrix
+    from .read_fasta import fetch_seq
+    from .self_identity import self_ident_matrix
+
+    start = time.perf_counter()
     logger.info(f"Generating self sequence identity for {seq_id}.")
-    kmers = [kmer_hash for kmer_hash in generateKmersFromFasta(seq, kmer_size)]
-    mtx = createSelfMatrix(kmers, window, delta, kmer_size, ident_thr, False, modimizer)
-    bed = convertMatrixToBed(mtx, window, ident_thr, seq_id, seq_id, True)
+    # Read sequence in worker to avoid passing it from the parent process.
+    with profiling.stage("fetch") as stage:
+        if region:
+            seq = fetch_seq(infile, region.chrom, region.st, region.end)
+        else:
+            seq = fetch_seq(infile, seq_id)
+        stage.rows = len(seq)
+
+    # 1D identity only uses cells within n_bins of the diagonal.
+    # A saved matrix is kept to --max_band so it can be re-exported with any n_bins.
+    band = max_band if save_matrix or dim == Dim.TWO else n_bins
+    mtx = self_ident_matrix(
+        seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        ident_thr=ident_thr,
+        modimizer=modimizer,
+        max_band=band,
+        threads=threads,
+        legacy_modimizers=legacy_modimizers,
+        raw=save_matrix,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+    )
+    del seq
     outfile = os.path.join(outdir, f"{seq_id}.bed")
+    if save_matrix:
+        matrix_file = os.path.join(outdir, f"{seq_id}.npy")
+        logger.info(f"Saving raw containment matrix for {seq_id} to {matrix_file}")
+        with profiling.stage("save_matrix") as stage:
+            np.save(matrix_file, mtx)
+            with open(os.path.join(outdir, f"{seq_id}.json"), "wt") as fh:
+                json.dump({"name": seq_id, "window": window, "banded": bool(band)}, fh)
+            stage.rows = mtx.shape[-2]
 
-    if dim == Dim.TWO:
-        logger.info(
-            f"Writing 2D self sequence identity array for {seq_id} to {outfile}"
-        )
-        with open(outfile, "wt") as fh:
-            for qname, qst, qend, rname, rst, rend, ident in bed:
-                ident = round(ident, round_ndigits) if round_ndigits else ident
-                fh.write(f"{qname}\t{qst}\t{qend}\t{rname}\t{rst}\t{rend}\t{ident}\n")
-    else:
-        logger.info(f"Converting 2D self sequence identity matrix to 1D for {seq_id}.")
-        logger.info(
-            f"Writing 1D self sequence identity array for {seq_id} to {outfile}"
+        with profiling.stage("finalize") as stage:
+            mtx = finalize_containment_matrix(mtx, ident_thr)
+            stage.rows = mtx.shape[0]
+
+    with profiling.stage("write") as stage:
+        stage.rows = write_self_ident(
+            mtx,
+            outfile,
+            seq_id,
+            window,
+            ident_thr,
+            n_bins,
+            ignore_bands,
+            dim,
+            round_ndigits,
+            bool(band),
         )
-        with open(outfile, "wt") as fh:
-            for st, end, ident in convert_2D_to_1D_ident(
-                bed, window, n_bins, ignore_bands
-            ):
-                ident = round(ident, round_ndigits) if round_ndigits else ident
-                fh.write(f"{seq_id}\t{st}\t{end}\t{ident}\n")
 
-    return None
+    return time.perf_counter() - start
+
+
+def estimate_self_ident_cost(seq_len: int, window: int, band: int | None) -> int:
+    """
+    Estimate the relative cost of self sequence identity as the number of matrix cells calculated.
+    """
+    n_windows = math.ceil(seq_len / window)
+    if band:
+        return n_windows * min(band, n_windows)
+    return n_windows * n_windows
 
 
 def add_self_ident_cli(parser: SubArgumentParser) -> None:
@@ -123,6 +230,14 @@ def add_self_ident_cli(parser: SubArgumentParser) -> None:
         required=True,
         help="Output directory for self-identity alignment bedfile by contig.",
     )
+    ap.add_argument(
+        "-r",
+        "--regions",
+        nargs="+",
+        default=None,
+        type=str,
+        help="Only calculate self-identity within regions. Either bedfiles or chrom:st-end strings with 0-based, half-open coordinates. Outputs are named chrom:st-end.",
+    )
     ap.add_argument(
         "-x",
         "--dim",
@@ -132,24 +247,34 @@ def add_self_ident_cli(parser: SubArgumentParser) -> None:
         type=Dim,
     )
     ap.add_argument(
-        "-p", "--processes", default=4, type=int, help="Number of processes."
+        "-p",
+        "--processes",
+        default=4,
+        type=int,
+        help="Number of processes. If fewer sequences than processes, the remainder are used as threads within each sequence.",
+    )
+    ap.add_argument(
+        "-t",
+        "--ident_thr",
+        default=DEF_IDENT_THR,
+        type=float,
+        help="Identity threshold.",
     )
+    ap.add_argument("-w", "--window", default=DEF_WINDOW, type=int, help="Window size.")
     ap.add_argument(
-        "-t", "--ident_thr", default=0.86, type=float, help="Identity threshold."
+        "-k", "--kmer_size", default=DEF_KMER_SIZE, type=int, help="K-mer size."
     )
-    ap.add_argument("-w", "--window", default=5000, type=int, help="Window size.")
-    ap.add_argument("-k", "--kmer_size", default=21, type=int, help="K-mer size.")
     ap.add_argument(
         "-d",
         "--delta",
-        default=0.5,
+        default=DEF_DELTA,
         type=float,
         help="Fraction of neighboring partition to include in identity estimation. Must be between 0 and 1, use > 0.5 is not recommended.",
     )
     ap.add_argument(
         "-m",
         "--modimizer",
-        default=1000,
+        default=DEF_MODIMIZER,
         type=int,
         help="Modimizer sketch size. A lower value will reduce the number of modimizers, but will increase performance. Must be less than --window.",
     )
@@ -157,13 +282,100 @@ def add_self_ident_cli(parser: SubArgumentParser) -> None:
     ap.add_argument(
         "-b",
         "--n_bins",
-        default=5,
+        default=DEF_N_BINS,
         type=int,
         help="Number of bins to calculate average sequence identity over. Only applicable if mode is 1D.",
     )
     ap.add_argument(
         "--ignore_bands",
-        default=2,
+        default=DEF_IGNORE_BANDS,
+        type=int,
+        help="Number of bands ignored along self-identity diagonal. Only applicable if mode is 1D.",
+    )
+    # 2D params
+    ap.add_argument(
+        "--max_band",
+        default=None,
+        type=int,
+        help="Only calculate identity within this number of windows of the diagonal. Only applicable if mode is 2D or with --save_matrix. Mode 1D uses --n_bins.",
+    )
+    ap.add_argument(
+        "--round_ndigits",
+        default=None,
+        type=int,
+        help="Round identity to specified ndigits.",
+    )
+    ap.add_argument(
+        "--cache_dir",
+        default=None,
+        type=str,
+        help="Directory to cache sketches by sequence and --kmer_size, --window, --delta, and --modimizer. Reruns with only different thresholds reuse them.",
+    )
+    ap.add_argument(
+        "--cache_size",
+        default=DEF_CACHE_SIZE_MB,
+        type=int,
+        help="Maximum size of --cache_dir in MB. Least recently used sketches are removed first.",
+    )
+    ap.add_argument(
+        "--save_matrix",
+        action="store_true",
+        help="Save the threshold-independent containment matrix by contig to {outdir}/{contig}.npy. Export again with self-ident-export.",
+    )
+    ap.add_argument(
+        "--legacy_modimizers",
+        action="store_true",
+        help="Keep the sparse sketch of windows with fewer than half the expected modimizers like ModDotPlot, rather than selecting them again at a lower sparsity. Reproduces output of previous versions.",
+    )
+    return None
+
+
+def add_self_ident_export_cli(parser: SubArgumentParser) -> None:
+    ap = parser.add_parser(
+        "self-ident-export",
+        description="Export 1D or 2D average self nucleotide identity from matrices saved by self-ident --save_matrix.",
+    )
+    ap.add_argument(
+        "-i",
+        "--infiles",
+        nargs="+",
+        required=True,
+        type=str,
+        help="Input matrices. Parameters are read from the json file of the same name.",
+    )
+    ap.add_argument(
+        "-o",
+        "--outdir",
+        type=str,
+        required=True,
+        help="Output directory for self-identity alignment bedfile by contig.",
+    )
+    ap.add_argument(
+        "-x",
+        "--dim",
+        choices=[Dim.ONE, Dim.TWO],
+        help="Dimensionality of self-identity returned.",
+        default=Dim.ONE,
+        type=Dim,
+    )
+    ap.add_argument(
+        "-t",
+        "--ident_thr",
+        default=DEF_IDENT_THR,
+        type=float,
+        help="Identity threshold.",
+    )
+    # 1D params
+    ap.add_argument(
+        "-b",
+        "--n_bins",
+        default=DEF_N_BINS,
+        type=int,
+        help="Number of bins to calculate average sequence identity over. Only applicable if mode is 1D. Must not exceed the saved --max_band.",
+    )
+    ap.add_argument(
+        "--ignore_bands",
+        default=DEF_IGNORE_BANDS,
         type=int,
         help="Number of bands ignored along self-identity diagonal. Only applicable if mode is 1D.",
     )
@@ -176,6 +388,108 @@ def add_self_ident_cli(parser: SubArgumentParser) -> None:
     return None
 
 
+def get_seq_regions(infile: str, regions: list[str] | None) -> dict[str, "Region"]:
+    """
+    Get regions by name from `regions` or every record of `infile` if not provided.
+    """
+    import pyfaidx
+
+    from .io import Region, read_regions
+
+    # Only read names and lengths. Also builds the index before workers open the fasta.
+    with pyfaidx.Fasta(infile) as fa:
+        rec_lens = {name: len(rec) for name, rec in fa.items()}
+
+    if not regions:
+        return {
+            name: Region(name, 0, rec_len, name) for name, rec_len in rec_lens.items()
+        }
+
+    seq_regions = {}
+    for region in read_regions(regions):
+        if region.chrom not in rec_lens:
+            raise ValueError(f"Region {region.name} not in {infile}.")
+        if not 0 <= region.st < region.end <= rec_lens[region.chrom]:
+            raise ValueError(
+                f"Invalid region {region.name}. Must be within {region.chrom} (0-{rec_lens[region.chrom]})."
+            )
+        if region.name in seq_regions:
+            raise ValueError(f"Duplicate region name {region.name}.")
+        seq_regions[region.name] = region
+    return seq_regions
+
+
+def run_ident_jobs(
+    fn: Callable[..., float],
+    jobs: dict[str, tuple[Any, ...]],
+    job_lens: dict[str, int],
+    job_costs: dict[str, int],
+    processes: int,
+    desc: str,
+) -> int:
+    """
+    Run jobs in a process pool and log their progress.
+
+    # Args
+    * fn
+            * Function returning its elapsed time. Must take a `threads` keyword argument.
+    * jobs
+            * Arguments of `fn` by job name.
+    * job_lens
+            * Sequence length of each job in bp.
+    * job_costs
+            * Relative cost of each job.
+    * processes
+            * Number of processes.
+    * desc
+            * Description of output for logging.
+
+    # Returns
+    * Exit code. 1 if any job failed.
+    """
+    # Start the most expensive jobs first so a long sequence doesn't finish last.
+    names = sorted(jobs, key=lambda name: job_costs[name], reverse=True)
+    # Split remaining processes between jobs as threads so few long sequences use all cores.
+    n_jobs = max(len(names), 1)
+    threads = max(1, processes // n_jobs)
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=min(processes, n_jobs)) as pool:
+        futures: dict[Future[Any], str]
+        if profiling.is_enabled():
+            # Return records of each worker with its result.
+            futures = {
+                pool.submit(
+                    profiling.run_profiled, fn, name, *jobs[name], threads=threads
+                ): name
+                for name in names
+            }
+        else:
+            futures = {
+                pool.submit(fn, *jobs[name], threads=threads): name for name in names
+            }
+        for i, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                if profiling.is_enabled():
+                    elapsed, records = future.result()
+                    profiling.add_records(records)
+                else:
+                    elapsed = future.result()
+            except Exception:
+                n_failed += 1
+                logger.exception(f"Failed to generate {desc} for {name}.")
+                continue
+            logger.info(
+                f"Finished {name} ({job_lens[name]:,} bp) in {elapsed:.2f}s. [{i}/{len(futures)}]"
+            )
+
+    if n_failed:
+        logger.error(f"Failed to generate {desc} for {n_failed} sequences.")
+        return 1
+
+    return 0
+
+
 def get_self_seq_ident(
     infile: str,
     outdir: str,
@@ -189,30 +503,434 @@ def get_self_seq_ident(
     processes: int,
     dim: Dim,
     round_ndigits: int | None,
-):
+    max_band: int | None = None,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+    save_matrix: bool = False,
+    legacy_modimizers: bool = False,
+    regions: list[str] | None = None,
+) -> int:
+    if max_band is not None and max_band < 1:
+        raise ValueError(f"Invalid max_band: {max_band}. Must be at least 1.")
+    if save_matrix and dim == Dim.ONE and max_band and max_band < n_bins:
+        raise ValueError(
+            f"Invalid max_band: {max_band}. Must be at least n_bins ({n_bins}) with save_matrix."
+        )
+
+    os.makedirs(outdir, exist_ok=True)
+
+    seq_regions = get_seq_regions(infile, regions)
+    seq_lens = {name: region.end - region.st for name, region in seq_regions.items()}
+    band = max_band if save_matrix or dim == Dim.TWO else n_bins
+    jobs = {
+        seq_id: (
+            seq_id,
+            infile,
+            outdir,
+            window,
+            delta,
+            kmer_size,
+            ident_thr,
+            modimizer,
+            n_bins,
+            ignore_bands,
+            dim,
+            round_ndigits,
+            max_band,
+            cache_dir,
+            cache_size,
+            save_matrix,
+            legacy_modimizers,
+            seq_regions[seq_id],
+        )
+        for seq_id in seq_regions
+    }
+    return run_ident_jobs(
+        get_single_self_seq_ident,
+        jobs,
+        seq_lens,
+        {
+            seq_id: estimate_self_ident_cost(seq_len, window, band)
+            for seq_id, seq_len in seq_lens.items()
+        },
+        processes,
+        "self sequence identity",
+    )
+
+
+def export_self_seq_ident(
+    infiles: list[str],
+    outdir: str,
+    ident_thr: float,
+    n_bins: int,
+    ignore_bands: int,
+    dim: Dim,
+    round_ndigits: int | None,
+) -> int:
+    import numpy as np
+
+    from .estimate_identity import finalize_containment_matrix
+
+    os.makedirs(outdir, exist_ok=True)
+
+    # Matrices are saved as {seq_id}.npy.
+    for infile in profiling.iter_stage(
+        "export",
+        infiles,
+        contig_of=lambda infile: os.path.splitext(os.path.basename(infile))[0],
+    ):
+        with open(f"{os.path.splitext(infile)[0]}.json", "rt") as fh:
+            params = json.load(fh)
+
+        seq_id = params["name"]
+        # Only rows needed for the current block are read.
+        raw_mtx = np.load(infile, mmap_mode="r")
+        band = raw_mtx.shape[-1] if params["banded"] else None
+        if dim == Dim.ONE and band and band < n_bins:
+            raise ValueError(
+                f"Saved matrix for {seq_id} has a band of {band}. Must be at least n_bins ({n_bins})."
+            )
+
+        logger.info(f"Exporting self sequence identity for {seq_id} from {infile}.")
+        with profiling.stage("finalize") as stage:
+            mtx = finalize_containment_matrix(raw_mtx, ident_thr)
+            stage.rows = mtx.shape[0]
+        del raw_mtx
+        with profiling.stage("write") as stage:
+            stage.rows = write_self_ident(
+                mtx,
+                os.path.join(outdir, f"{seq_id}.bed"),
+                seq_id,
+                params["window"],
+                ident_thr,
+                n_bins,
+                ignore_bands,
+                dim,
+                round_ndigits,
+                bool(band),
+            )
+
+    return 0
+
+
+def get_region_sketches(
+    region: "Region",
+    infile: str,
+    window: int,
+    delta: float,
+    kmer_size: int,
+    modimizer: int,
+    legacy_modimizers: bool = False,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+) -> "SelfSketches":
+    """
+    Create modimizer sketches of each window of a region.
+    """
+    from .read_fasta import fetch_seq
+    from .self_identity import self_ident_sketches
+
+    with profiling.stage("fetch") as stage:
+        seq = fetch_seq(infile, region.chrom, region.st, region.end)
+        stage.rows = len(seq)
+    return self_ident_sketches(
+        seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        modimizer=modimizer,
+        legacy_modimizers=legacy_modimizers,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+    )
+
+
+def sketch_seq_regions(
+    regions: dict[str, tuple["Region", str]],
+    processes: int,
+    *args: Any,
+) -> dict[str, "SelfSketches"]:
+    """
+    Sketch regions in a process pool. Regions that fail are logged and omitted.
+
+    # Args
+    * regions
+            * Region and its fasta by name.
+    * processes
+            * Number of processes.
+    * args
+            * Other arguments of `get_region_sketches`.
+
+    # Returns
+    * Sketches by name.
+    """
+    sketches = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(processes, len(regions)))) as pool:
+        futures: dict[Future[Any], str]
+        if profiling.is_enabled():
+            futures = {
+                pool.submit(
+                    profiling.run_profiled,
+                    get_region_sketches,
+                    name,
+                    region,
+                    infile,
+                    *args,
+                ): name
+                for name, (region, infile) in regions.items()
+            }
+        else:
+            futures = {
+                pool.submit(get_region_sketches, region, infile, *args): name
+                for name, (region, infile) in regions.items()
+            }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                if profiling.is_enabled():
+                    sketches[name], records = future.result()
+                    profiling.add_records(records)
+                else:
+                    sketches[name] = future.result()
+            except Exception:
+                logger.exception(f"Failed to sketch {name}.")
+
+    return sketches
+
+
+def get_single_pairwise_seq_ident(
+    query_name: str,
+    reference_name: str,
+    query_sketches: "SelfSketches",
+    reference_sketches: "SelfSketches",
+    outfile: str,
+    window: int,
+    kmer_size: int,
+    ident_thr: float,
+    round_ndigits: int | None,
+    threads: int = 1,
+) -> float:
+    """
+    Generate sequence identity between two sketched sequences and write it to `outfile`.
+
+    # Returns
+    * Elapsed time in seconds.
+    """
+    from .io import write_2D_ident_bed
+    from .self_identity import pairwise_sketches_ident_matrix
+
+    start = time.perf_counter()
+    logger.info(f"Generating sequence identity for {query_name} and {reference_name}.")
+    mtx = pairwise_sketches_ident_matrix(
+        query_sketches,
+        reference_sketches,
+        kmer_size=kmer_size,
+        ident_thr=ident_thr,
+        threads=threads,
+    )
+    logger.info(f"Writing 2D sequence identity array to {outfile}")
+    with open(outfile, "wb") as fh, profiling.stage("write") as stage:
+        stage.rows = write_2D_ident_bed(
+            fh,
+            mtx,
+            window,
+            ident_thr,
+            query_name,
+            reference_name,
+            self_identity=False,
+            round_ndigits=round_ndigits,
+        )
+
+    return time.perf_counter() - start
+
+
+def add_pairwise_ident_cli(parser: SubArgumentParser) -> None:
+    ap = parser.add_parser(
+        "pairwise-ident",
+        description="Approximate 2D average nucleotide identity between every pair of query and reference sequences via a k-mer-based containment index. Uses ModDotPlot's library.",
+    )
+    ap.add_argument(
+        "-q",
+        "--query",
+        required=True,
+        type=str,
+        help="Query fasta.",
+    )
+    ap.add_argument(
+        "-r",
+        "--reference",
+        required=True,
+        type=str,
+        help="Reference fasta.",
+    )
+    ap.add_argument(
+        "-o",
+        "--outdir",
+        type=str,
+        required=True,
+        help="Output directory for alignment bedfiles by query and reference as {query}_{reference}.bed.",
+    )
+    ap.add_argument(
+        "--query_regions",
+        nargs="+",
+        default=None,
+        type=str,
+        help="Only use regions of the query. Either bedfiles or chrom:st-end strings with 0-based, half-open coordinates.",
+    )
+    ap.add_argument(
+        "--reference_regions",
+        nargs="+",
+        default=None,
+        type=str,
+        help="Only use regions of the reference. Either bedfiles or chrom:st-end strings with 0-based, half-open coordinates.",
+    )
+    ap.add_argument(
+        "-p",
+        "--processes",
+        default=4,
+        type=int,
+        help="Number of processes. If fewer pairs than processes, the remainder are used as threads within each pair.",
+    )
+    ap.add_argument(
+        "-t",
+        "--ident_thr",
+        default=DEF_IDENT_THR,
+        type=float,
+        help="Identity threshold.",
+    )
+    ap.add_argument("-w", "--window", default=DEF_WINDOW, type=int, help="Window size.")
+    ap.add_argument(
+        "-k", "--kmer_size", default=DEF_KMER_SIZE, type=int, help="K-mer size."
+    )
+    ap.add_argument(
+        "-d",
+        "--delta",
+        default=DEF_DELTA,
+        type=float,
+        help="Fraction of neighboring partition to include in identity estimation. Must be between 0 and 1, use > 0.5 is not recommended.",
+    )
+    ap.add_argument(
+        "-m",
+        "--modimizer",
+        default=DEF_MODIMIZER,
+        type=int,
+        help="Modimizer sketch size. A lower value will reduce the number of modimizers, but will increase performance. Must be less than --window.",
+    )
+    ap.add_argument(
+        "--round_ndigits",
+        default=None,
+        type=int,
+        help="Round identity to specified ndigits.",
+    )
+    ap.add_argument(
+        "--cache_dir",
+        default=None,
+        type=str,
+        help="Directory to cache sketches by sequence and --kmer_size, --window, --delta, and --modimizer. Shared with self-ident.",
+    )
+    ap.add_argument(
+        "--cache_size",
+        default=DEF_CACHE_SIZE_MB,
+        type=int,
+        help="Maximum size of --cache_dir in MB. Least recently used sketches are removed first.",
+    )
+    ap.add_argument(
+        "--legacy_modimizers",
+        action="store_true",
+        help="Keep the sparse sketch of windows with fewer than half the expected modimizers like ModDotPlot.",
+    )
+    return None
+
+
+def get_pairwise_seq_ident(
+    query_infile: str,
+    reference_infile: str,
+    outdir: str,
+    window: int,
+    delta: float,
+    kmer_size: int,
+    ident_thr: float,
+    modimizer: int,
+    processes: int,
+    round_ndigits: int | None,
+    query_regions: list[str] | None = None,
+    reference_regions: list[str] | None = None,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+    legacy_modimizers: bool = False,
+) -> int:
     os.makedirs(outdir, exist_ok=True)
 
-    seq = pyfaidx.Fasta(infile)
-    with ProcessPoolExecutor(max_workers=processes) as pool:
-        _ = pool.map(
-            get_single_self_seq_ident,
-            *zip(
-                *[
-                    (
-                        sec_rec.name,
-                        str(sec_rec),
-                        outdir,
-                        window,
-                        delta,
-                        kmer_size,
-                        ident_thr,
-                        modimizer,
-                        n_bins,
-                        ignore_bands,
-                        dim,
-                        round_ndigits,
-                    )
-                    for sec_rec in seq
-                ]
-            ),
+    query_seqs = get_seq_regions(query_infile, query_regions)
+    reference_seqs = get_seq_regions(reference_infile, reference_regions)
+
+    # Sketch each region once and share its sketches between all of its pairs.
+    def region_key(region: "Region", infile: str) -> str:
+        return f"{os.path.abspath(infile)}:{region.chrom}:{region.st}-{region.end}"
+
+    regions = {
+        region_key(region, infile): (region, infile)
+        for seqs, infile in (
+            (query_seqs, query_infile),
+            (reference_seqs, reference_infile),
         )
+        for region in seqs.values()
+    }
+    logger.info(f"Sketching {len(regions)} sequences.")
+    sketches = sketch_seq_regions(
+        regions,
+        processes,
+        window,
+        delta,
+        kmer_size,
+        modimizer,
+        legacy_modimizers,
+        cache_dir,
+        cache_size,
+    )
+
+    jobs: dict[str, tuple[Any, ...]] = {}
+    job_lens: dict[str, int] = {}
+    job_costs: dict[str, int] = {}
+    n_unsketched = 0
+    for query in query_seqs.values():
+        query_sketches = sketches.get(region_key(query, query_infile))
+        for reference in reference_seqs.values():
+            reference_sketches = sketches.get(region_key(reference, reference_infile))
+            if query_sketches is None or reference_sketches is None:
+                n_unsketched += 1
+                continue
+
+            name = f"{query.name}_{reference.name}"
+            jobs[name] = (
+                query.name,
+                reference.name,
+                query_sketches,
+                reference_sketches,
+                os.path.join(outdir, f"{name}.bed"),
+                window,
+                kmer_size,
+                ident_thr,
+                round_ndigits,
+            )
+            query_len = query.end - query.st
+            reference_len = reference.end - reference.st
+            job_lens[name] = query_len + reference_len
+            job_costs[name] = math.ceil(query_len / window) * math.ceil(
+                reference_len / window
+            )
+
+    if n_unsketched:
+        logger.error(
+            f"Failed to generate sequence identity for {n_unsketched} pairs with unsketched sequences."
+        )
+
+    exit_code = run_ident_jobs(
+        get_single_pairwise_seq_ident,
+        jobs,
+        job_lens,
+        job_costs,
+        processes,
+        "sequence identity",
+    )
+    return 1 if n_unsketched else exit_code
@@ -0,0 +1,16 @@
+DEF_WINDOW = 5000
+DEF_KMER_SIZE = 21
+DEF_DELTA = 0.5
+DEF_MODIMIZER = 1000
+DEF_IDENT_THR = 0.86
+DEF_N_BINS = 5
+DEF_IGNORE_BANDS = 2
+
+# Number of k-mers hashed at once.
+DEF_KMER_CHUNK_SIZE = 1_000_000
+# Number of self-containment matrix rows calculated at once.
+DEF_CONTAINMENT_BLOCK_SIZE = 256
+# Number of matrix cells converted to bed rows at once.
+DEF_BED_CHUNK_SIZE = 1_000_000
+# Maximum size of the sketch cache in MB.
+DEF_CACHE_SIZE_MB = 1024
@@ -1,38 +1,53 @@
 # ModDotPlot
 # https://github.com/marbl/ModDotPlot/commit/50ecda4eff91acd00584090afd380d4a355be7aa
 import math
+import functools
 import numpy as np
 import mmh3
 
+from typing import Iterable, Iterator, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import DEF_CONTAINMENT_BLOCK_SIZE
+
 
 def removeAmbiguousBases(mod_list: set[int], k: int) -> set[int]:
-    # Ambiguous IUPAC codes
-    bases_to_remove = ["R", "Y", "M", "K", "S", "W", "H", "B", "V", "D", "N"]
-    kmers_to_remove = set()
-    for i in range(len(bases_to_remove)):
-        result_string = str(bases_to_remove[i]) * k
-        kmers_to_remove.add(mmh3.hash(result_string))
     mod_set = set(mod_list)
     # Remove homopolymers of ambiguous nucleotides
-    mod_set.difference_update(kmers_to_remove)
+    mod_set.difference_update(ambiguous_homopolymer_hashes(k).tolist())
     return mod_set
 
 
+@functools.cache
+def ambiguous_homopolymer_hashes(k: int) -> np.ndarray:
+    """
+    Get the hashes of homopolymers of ambiguous IUPAC codes of length `k`.
+    """
+    # Ambiguous IUPAC codes
+    bases_to_remove = ["R", "Y", "M", "K", "S", "W", "H", "B", "V", "D", "N"]
+    hashes = np.array(sorted({mmh3.hash(base * k) for base in bases_to_remove}))
+    hashes.flags.writeable = False
+    return hashes
+
+
 def createSelfMatrix(
-    sequence: list[int],
+    sequence: np.ndarray,
     window_size: int,
     delta: float,
     k: int,
     identity: float,
     ambiguous: bool,
     modimizer: int,
+    max_band: int | None = None,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
 ) -> np.ndarray:
     """
     Create self-identity matrix.
 
     Args:
     * sequence
-            * Sequence as list of mmh3 kmers.
+            * Sequence as array of mmh3 kmers.
     * window_size
             * Window size.
     * delta
@@ -47,98 +62,346 @@ def createSelfMatrix(
             * Modimizer sketch size.
             * A lower value will reduce the number of modimizers, but will increase performance.
             * Must be less than window size.
+    * max_band
+            * Only calculate cells within this number of windows of the diagonal.
+            * If provided, returns the banded matrix from `selfContainmentMatrix`.
+    * threads
+            * Number of threads used to calculate the self-containment matrix.
+    * legacy_modimizers
+            * Keep the sparse sketches of windows with too few modimizers like ModDotPlot.
 
     Returns
     * 2D ndarray of identity values.
     """
-    sequence_length = len(sequence)
+    sketches = create_self_sketches(
+        sequence,
+        window_size,
+        delta,
+        k,
+        ambiguous,
+        modimizer,
+        legacy_modimizers=legacy_modimizers,
+    )
+    matrix = sketch_containment_matrix(
+        sketches,
+        k,
+        identity,
+        ambiguous,
+        max_band=max_band,
+        threads=threads,
+    )
+    return matrix
+
+
+def sketch_parameters(window_size: int, modimizer: int) -> tuple[int, int]:
+    """
+    Get the sparsity of modimizers and the expected sketch size of each window.
+
+    # Returns
+    * Keep hashes divisible by the sparsity, a power of two.
+    * Expected number of modimizers per window.
+    """
     seq_sparsity = round(window_size / modimizer)
     if seq_sparsity <= modimizer:
         seq_sparsity = 2 ** int(math.log2(seq_sparsity))
     else:
         seq_sparsity = 2 ** (int(math.log2(seq_sparsity - 1)) + 1)
-    sketch_size = round(window_size / seq_sparsity)
+    return seq_sparsity, round(window_size / seq_sparsity)
+
+
+def create_self_sketches(
+    sequence: np.ndarray,
+    window_size: int,
+    delta: float,
+    k: int,
+    ambiguous: bool,
+    modimizer: int,
+    legacy_modimizers: bool = False,
+) -> "SelfSketches":
+    """
+    Create modimizer sketches of each window with and without neighboring windows.
 
-    no_neighbors = partitionOverlaps(sequence, window_size, 0, sequence_length, k)
+    Args:
+    * sequence
+            * Sequence as array of mmh3 kmers.
+    * window_size
+            * Window size.
+    * delta
+            * Fraction of neighboring partition to include in identity estimation.
+    * k
+            * kmer length
+    * ambiguous
+            * Preserve diagonal when handling strings of ambiguous homopolymers (eg. long runs of N's).
+    * modimizer
+            * Modimizer sketch size.
+    * legacy_modimizers
+            * Keep the sparse sketches of windows with too few modimizers like ModDotPlot.
+
+    Returns
+    * Packed sketches.
+    """
+    sequence_length = len(sequence)
+    seq_sparsity, sketch_size = sketch_parameters(window_size, modimizer)
+
+    # Partitions are views into the k-mer hashes so they're only stored once.
+    no_neighbors = partition_offsets(window_size, 0, sequence_length, k)
     if delta > 0:
-        neighbors = partitionOverlaps(sequence, window_size, delta, sequence_length, k)
+        neighbors = partition_offsets(window_size, delta, sequence_length, k)
     else:
         neighbors = no_neighbors
 
-    neighbors_mods = convertToModimizers(
-        neighbors, seq_sparsity, ambiguous, k, sketch_size
+    for _, ends in (no_neighbors, neighbors):
+        # Test that last value was added on correctly
+        assert sequence[ends[-1] - 1] == sequence[-1]
+
+    neighbors_mods = select_modimizers(
+        sequence,
+        *neighbors,
+        seq_sparsity,
+        ambiguous,
+        k,
+        sketch_size,
+        legacy=legacy_modimizers,
     )
-    no_neighbors_mods = convertToModimizers(
-        no_neighbors, seq_sparsity, ambiguous, k, sketch_size
+    no_neighbors_mods = select_modimizers(
+        sequence,
+        *no_neighbors,
+        seq_sparsity,
+        ambiguous,
+        k,
+        sketch_size,
+        legacy=legacy_modimizers,
     )
-    matrix = selfContainmentMatrix(
-        no_neighbors_mods, neighbors_mods, k, identity, ambiguous
+    (sketches, sketches_neighbors), vocab = pack_sketch_arrays(
+        no_neighbors_mods, neighbors_mods
     )
-    return matrix
+    return SelfSketches(sketches, sketches_neighbors, vocab)
 
 
 def partitionOverlaps(
-    lst: list[int], win: int, delta: float, seq_len: int, k: int
-) -> list[list[int]]:
-    kmer_list = []
+    lst: np.ndarray, win: int, delta: float, seq_len: int, k: int
+) -> list[np.ndarray]:
+    starts, ends = partition_offsets(win, delta, seq_len, k)
+    kmer_list = list(iter_partitions(lst, starts, ends))
+
+    # Test that last value was added on correctly
+    assert kmer_list[-1][-1] == lst[-1]
+    return kmer_list
+
+
+def partition_offsets(
+    win: int, delta: float, seq_len: int, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the window partitions of `partitionOverlaps` as offsets into the k-mer array.
+
+    # Args
+    * win
+            * Window size.
+    * delta
+            * Fraction of neighboring partition to include.
+    * seq_len
+            * Number of k-mers.
+    * k
+            * K-mer size.
+
+    # Returns
+    * Start and end offsets of each partition.
+    """
     kmer_to_genomic_coordinate_offset = win - k + 1
     delta_offset = win * delta
 
-    # set the first window to contain win - k + 1 kmers.
-    starting_end_index = int(round(kmer_to_genomic_coordinate_offset + delta_offset))
-    kmer_list.append(lst[0:starting_end_index])
-    counter = win - k + 1
-
-    # set normal windows
-    while counter <= (seq_len - win):
-        start_index = counter + 1
-        end_index = win + counter + 1
-        delta_start_index = int(round(start_index - delta_offset))
-        delta_end_index = int(round(end_index + delta_offset))
-        if delta_end_index > seq_len:
-            delta_end_index = seq_len
-        try:
-            kmer_list.append(lst[delta_start_index:delta_end_index])
-        except Exception as e:
-            print(e)
-            kmer_list.append(lst[delta_start_index:seq_len])
-        counter += win
-
-    # set the last window to get the remainder
+    # First window contains win - k + 1 kmers.
+    first_end = int(round(kmer_to_genomic_coordinate_offset + delta_offset))
+    # Normal windows.
+    counters = np.arange(kmer_to_genomic_coordinate_offset, seq_len - win + 1, win)
+    # np.rint rounds half to even like round.
+    starts = np.rint(counters + 1 - delta_offset).astype(np.int64)
+    ends = np.rint(counters + win + 1 + delta_offset).astype(np.int64)
+
+    # Last window gets the remainder.
+    counter = kmer_to_genomic_coordinate_offset + len(counters) * win
     if counter <= seq_len - 2:
-        final_start_index = int(round(counter + 1 - delta_offset))
-        kmer_list.append(lst[final_start_index:seq_len])
+        final_starts = [int(round(counter + 1 - delta_offset))]
+    else:
+        final_starts = []
 
-    # Test that last value was added on correctly
+    starts = np.concatenate([[0], starts, final_starts]).astype(np.int64)
+    ends = np.concatenate([[first_end], ends, [seq_len] * len(final_starts)]).astype(
+        np.int64
+    )
+    # Clip like slicing.
+    starts = np.where(starts < 0, np.maximum(starts + seq_len, 0), starts)
+    np.minimum(starts, seq_len, out=starts)
+    np.minimum(ends, seq_len, out=ends)
+    return starts, ends
 
-    assert kmer_list[-1][-1] == lst[-1]
-    return kmer_list
+
+def iter_partitions(
+    lst: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Iterator[np.ndarray]:
+    """
+    Iterate through partitions of `lst` as views without copying.
+    """
+    for st, end in zip(starts.tolist(), ends.tolist()):
+        yield lst[st:end]
 
 
 def populateModimizers(
-    partition: list[int], sparsity: int, ambiguous: bool, expectation: int, k: int
+    partition: np.ndarray,
+    sparsity: int,
+    ambiguous: bool,
+    expectation: int,
+    k: int,
+    legacy: bool = False,
 ) -> set[int]:
-    mod_set = set()
-    for kmer in partition:
-        if kmer % sparsity == 0:
-            mod_set.add(kmer)
+    mod_set = set(partition[partition % sparsity == 0].tolist())
     if not ambiguous:
         mod_set = removeAmbiguousBases(mod_set, k)
+    if legacy:
+        # ModDotPlot discards the denser sketch so don't create it.
+        return mod_set
     if (len(mod_set) < round(expectation / 2)) and (sparsity > 1):
-        populateModimizers(partition, sparsity // 2, ambiguous, expectation, k)
+        return populateModimizers(partition, sparsity // 2, ambiguous, expectation, k)
     return mod_set
 
 
 def convertToModimizers(
-    kmer_list: list[list[int]], sparsity: int, ambiguous: bool, k: int, expectation: int
+    kmer_list: Iterable[np.ndarray],
+    sparsity: int,
+    ambiguous: bool,
+    k: int,
+    expectation: int,
+    legacy: bool = False,
 ) -> list[set[int]]:
     mod_total = []
     for partition in kmer_list:
-        mod_set = populateModimizers(partition, sparsity, ambiguous, expectation, k)
+        mod_set = populateModimizers(
+            partition, sparsity, ambiguous, expectation, k, legacy
+        )
         mod_total.append(mod_set)
     return mod_total
 
 
+def concat_ranges(
+    starts: np.ndarray, ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate the ranges `[starts[i], ends[i])`.
+
+    # Returns
+    * Index of the range of each element and the concatenated ranges.
+    """
+    counts = ends - starts
+    range_ids = np.repeat(np.arange(len(counts)), counts)
+    range_offsets = np.cumsum(counts) - counts
+    idxs = np.arange(counts.sum()) + np.repeat(starts - range_offsets, counts)
+    return range_ids, idxs
+
+
+def unique_by_group(
+    group_ids: np.ndarray, values: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get the sorted unique `int32` values within each group.
+
+    # Returns
+    * Group ids and values sorted by group and then value.
+    """
+    # Offset values to sort signed values as unsigned in the lower 32 bits.
+    keys = (group_ids.astype(np.int64) << 32) | (values.astype(np.int64) + 2**31)
+    keys.sort()
+    is_first = np.ones(len(keys), dtype=bool)
+    is_first[1:] = keys[1:] != keys[:-1]
+    keys = keys[is_first]
+    return keys >> 32, (keys & 0xFFFFFFFF) - 2**31
+
+
+def select_modimizers(
+    hashes: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    sparsity: int,
+    ambiguous: bool,
+    k: int,
+    expectation: int,
+    legacy: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Select modimizers of each partition. Vectorized version of `convertToModimizers`.
+
+    # Args
+    * hashes
+            * K-mer hashes.
+    * starts
+            * Start offset of each partition in `hashes`.
+    * ends
+            * End offset of each partition in `hashes`.
+    * sparsity
+            * Keep hashes divisible by this value.
+    * ambiguous
+            * Keep homopolymers of ambiguous bases.
+    * k
+            * K-mer size.
+    * expectation
+            * Expected number of modimizers per partition.
+            * Partitions with less than half are selected again at half the sparsity.
+    * legacy
+            * Keep the sparse modimizers of partitions below the expectation like ModDotPlot.
+
+    # Returns
+    * Sorted unique modimizers of each partition concatenated and their offsets.
+    """
+    n_partitions = len(starts)
+    min_modimizers = round(expectation / 2)
+    to_remove = None if ambiguous else ambiguous_homopolymer_hashes(k)
+
+    def is_modimizer(values: np.ndarray, sparsity: int) -> np.ndarray:
+        mask = values % sparsity == 0
+        if to_remove is not None:
+            idxs = np.flatnonzero(mask)
+            mask[idxs] = ~np.isin(values[idxs], to_remove)
+        return mask
+
+    # Filter all hashes once and only look up the positions in each overlapping partition.
+    positions = np.flatnonzero(is_modimizer(hashes, sparsity))
+    partition_ids, idxs = concat_ranges(
+        np.searchsorted(positions, starts), np.searchsorted(positions, ends)
+    )
+    partition_ids, values = unique_by_group(partition_ids, hashes[positions[idxs]])
+
+    partitions = np.arange(n_partitions)
+    selected_ids, selected_values = [], []
+    while not legacy and sparsity > 1:
+        n_modimizers = np.bincount(partition_ids, minlength=len(partitions))
+        is_sparse = n_modimizers < min_modimizers
+        if not is_sparse.any():
+            break
+
+        is_selected = ~is_sparse[partition_ids]
+        selected_ids.append(partitions[partition_ids[is_selected]])
+        selected_values.append(values[is_selected])
+
+        # Densify sparse partitions.
+        partitions = partitions[is_sparse]
+        sparsity //= 2
+        partition_ids, idxs = concat_ranges(starts[partitions], ends[partitions])
+        values = hashes[idxs]
+        is_selected = is_modimizer(values, sparsity)
+        partition_ids, values = unique_by_group(
+            partition_ids[is_selected], values[is_selected]
+        )
+
+    selected_ids.append(partitions[partition_ids])
+    selected_values.append(values)
+    partition_ids = np.concatenate(selected_ids)
+    # Stable so values stay sorted within each partition.
+    order = np.argsort(partition_ids, kind="stable")
+    offsets = np.zeros(n_partitions + 1, dtype=np.int64)
+    np.cumsum(np.bincount(partition_ids, minlength=n_partitions), out=offsets[1:])
+    return np.concatenate(selected_values)[order], offsets
+
+
 def convertMatrixToBed(
     matrix: np.ndarray,
     window_size: int,
@@ -197,6 +460,72 @@ def binomial_distance(containment_value: float, kmer_value: int) -> float:
     return math.pow(containment_value, 1.0 / kmer_value)
 
 
+def binomial_distances(containment_values: np.ndarray, kmer_value: int) -> np.ndarray:
+    """
+    Calculate the binomial distance for an array of containment values.
+
+    `binomial_distance` is only applied to unique values so results are identical to it.
+
+    Args:
+        containment_values (np.ndarray): The containment values.
+        kmer_value (int): The k-mer value.
+
+    Returns:
+        np.ndarray: The binomial distances.
+    """
+    uniq, inverse = np.unique(containment_values, return_inverse=True)
+    distances = np.array([binomial_distance(c, kmer_value) for c in uniq.tolist()])
+    return distances[inverse].reshape(containment_values.shape)
+
+
+def containment_threshold(identity: float, k: int) -> float:
+    """
+    Get the containment value with a binomial distance of `identity / 100`.
+
+    Containment can be compared to it instead of converting each value with `binomial_distance`.
+    """
+    return max(identity / 100, 0.0) ** k
+
+
+def passes_identity(
+    containment_values: np.ndarray, identity: float, k: int, threshold: float
+) -> np.ndarray:
+    """
+    Check if the binomial distance of each containment value is at least `identity / 100`.
+
+    Identical to comparing `binomial_distances` but only values within rounding error of `threshold` are converted.
+
+    # Args
+    * containment_values
+            * Containment values.
+    * identity
+            * Identity cutoff threshold.
+    * k
+            * K-mer size.
+    * threshold
+            * Threshold from `containment_threshold`.
+
+    # Returns
+    * Boolean mask of values passing `identity`.
+    """
+    passes = containment_values >= threshold
+    # Binomial distance is monotonic so only values this close to the threshold can round to either side.
+    near = np.abs(containment_values - threshold) <= threshold * 1e-9
+    if near.any():
+        passes[near] = binomial_distances(containment_values[near], k) >= identity / 100
+    return passes
+
+
+def nonzero_binomial_distances(containment_values: np.ndarray, k: int) -> None:
+    """
+    Convert the nonzero containment values of an array to binomial distances in place.
+    """
+    is_nonzero = containment_values != 0
+    containment_values[is_nonzero] = binomial_distances(
+        containment_values[is_nonzero], k
+    )
+
+
 def containment_neighbors(
     set1: set[int],
     set2: set[int],
@@ -249,12 +578,320 @@ def containment_neighbors(
         return max(containment_a_b_prime, containment_a_prime_b)
 
 
+class PackedSketches(NamedTuple):
+    """
+    Sketches of all windows packed into a single array.
+    """
+
+    # Sorted hash ids of each sketch. Ids index into a vocabulary shared by all sketches being compared.
+    ids: np.ndarray
+    # Sketch i is ids[offsets[i] : offsets[i + 1]].
+    offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+
+class SelfSketches(NamedTuple):
+    """
+    Sketches of each window of a sequence without and with neighboring windows.
+    """
+
+    sketches: PackedSketches
+    sketches_neighbors: PackedSketches
+    # Hash of each id.
+    vocab: np.ndarray
+
+
+def pack_sketches(
+    *sketch_lists: list[set[int]],
+) -> tuple[list[PackedSketches], np.ndarray]:
+    """
+    Pack lists of sketches into sorted `uint32` id arrays over a shared vocabulary.
+
+    # Args
+    * sketch_lists
+            * Lists of sketches as sets of hashes.
+
+    # Returns
+    * Packed sketches for each list and the shared vocabulary of sorted hashes.
+    """
+    sketch_arrays = []
+    for sketches in sketch_lists:
+        lengths = np.array([len(s) for s in sketches], dtype=np.int64)
+        offsets = np.zeros(len(sketches) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        hashes = np.concatenate(
+            [
+                np.empty(0, dtype=np.int64),
+                *(
+                    np.sort(np.fromiter(s, dtype=np.int64, count=len(s)))
+                    for s in sketches
+                ),
+            ]
+        )
+        sketch_arrays.append((hashes, offsets))
+
+    return pack_sketch_arrays(*sketch_arrays)
+
+
+def pack_sketch_arrays(
+    *sketch_arrays: tuple[np.ndarray, np.ndarray],
+) -> tuple[list[PackedSketches], np.ndarray]:
+    """
+    Pack concatenated sketches into `uint32` id arrays over a shared vocabulary.
+
+    # Args
+    * sketch_arrays
+            * Concatenated sketches and their offsets. Hashes must be sorted within each sketch.
+
+    # Returns
+    * Packed sketches for each list and the shared vocabulary of sorted hashes.
+    """
+    all_hashes = np.concatenate(
+        [np.empty(0, dtype=np.int64), *(hashes for hashes, _ in sketch_arrays)]
+    )
+    vocab, inverse = np.unique(all_hashes, return_inverse=True)
+    # Hashes map to ids in sorted order so ids stay sorted within each sketch.
+    inverse = inverse.astype(np.uint32)
+
+    packed = []
+    st = 0
+    for hashes, offsets in sketch_arrays:
+        packed.append(PackedSketches(inverse[st : st + len(hashes)], offsets))
+        st += len(hashes)
+
+    return packed, vocab
+
+
+class InvertedIndex(NamedTuple):
+    """
+    Windows containing each hash id of packed sketches.
+    """
+
+    # Windows of id i are windows[offsets[i] : offsets[i + 1]].
+    windows: np.ndarray
+    offsets: np.ndarray
+
+
+def build_inverted_index(sketches: PackedSketches, n_vocab: int) -> InvertedIndex:
+    """
+    Build an inverted index from hash id to the windows of `sketches` containing it.
+    """
+    window_ids = np.repeat(np.arange(len(sketches)), sketches.lengths())
+    order = np.argsort(sketches.ids, kind="stable")
+    offsets = np.zeros(n_vocab + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sketches.ids, minlength=n_vocab), out=offsets[1:])
+    return InvertedIndex(window_ids[order], offsets)
+
+
+def count_shared_indexed(
+    sketch: np.ndarray, index: InvertedIndex, st: int, end: int
+) -> np.ndarray:
+    """
+    Count ids shared between `sketch` and each of the windows `st` to `end` of `index`.
+
+    Only windows sharing an id with `sketch` are visited.
+
+    # Returns
+    * Intersection size with each window in `st:end`.
+    """
+    _, idxs = concat_ranges(index.offsets[sketch], index.offsets[sketch + 1])
+    windows = index.windows[idxs]
+    windows = windows[(windows >= st) & (windows < end)]
+    return np.bincount(windows - st, minlength=end - st)
+
+
+def index_pays_off(
+    sketches: PackedSketches,
+    sketches_neighbors: PackedSketches,
+    n_vocab: int,
+    band: int,
+) -> bool:
+    """
+    Check if counting shared ids with inverted indices visits fewer ids than scanning each band.
+
+    Windows sharing an id are visited once per pair so the indexed cost is the number of co-occurring pairs.
+    """
+    counts = np.bincount(sketches.ids, minlength=n_vocab)
+    counts_neighbors = np.bincount(sketches_neighbors.ids, minlength=n_vocab)
+    # Each row visits all windows sharing an id in both directions, including those below the diagonal.
+    n_visited = 2 * int(np.dot(counts, counts_neighbors))
+    # Each row scans the ids of the windows after it in the band in both directions.
+    n_scanned = min(band, len(sketches) // 2 + 1) * (
+        len(sketches.ids) + len(sketches_neighbors.ids)
+    )
+    # Visiting an indexed window costs about twice scanning an id.
+    return 2 * n_visited < n_scanned
+
+
+def count_shared(
+    sketch: np.ndarray, others: PackedSketches, st: int, end: int, mark: np.ndarray
+) -> np.ndarray:
+    """
+    Count ids shared between `sketch` and each of the sketches `others[st:end]`.
+
+    # Args
+    * sketch
+            * Sketch ids.
+    * others
+            * Packed sketches to intersect with.
+    * st
+            * First sketch in `others`.
+    * end
+            * End of sketches in `others`. Exclusive.
+    * mark
+            * Zeroed boolean lookup table over the vocabulary. Restored before returning.
+
+    # Returns
+    * Intersection size with each sketch in `others[st:end]`.
+    """
+    bounds = others.offsets[st : end + 1]
+    mark[sketch] = True
+    hits = mark[others.ids[bounds[0] : bounds[-1]]]
+    mark[sketch] = False
+
+    cum_hits = np.zeros(len(hits) + 1, dtype=np.int64)
+    np.cumsum(hits, out=cum_hits[1:])
+    bounds = bounds - bounds[0]
+    return cum_hits[bounds[1:]] - cum_hits[bounds[:-1]]
+
+
+def containment_rows(
+    sketches: PackedSketches,
+    sketches_neighbors: PackedSketches,
+    n_vocab: int,
+    rows: range,
+    k: int,
+    identity: float,
+    ambiguous: bool,
+    band: int,
+    raw: bool = False,
+    indices: tuple[InvertedIndex, InvertedIndex] | None = None,
+) -> np.ndarray:
+    """
+    Calculate banded rows of the upper triangle of the self-containment matrix.
+
+    Vectorized version of `containment_neighbors` over all columns of a row at once.
+
+    # Args
+    * sketches
+            * Packed sketches without neighbors.
+    * sketches_neighbors
+            * Packed sketches with neighbors.
+    * n_vocab
+            * Number of unique ids in `sketches` and `sketches_neighbors`.
+    * rows
+            * Rows to calculate.
+    * k
+            * K-mer size.
+    * identity
+            * Identity cutoff threshold.
+    * ambiguous
+            * Preserve diagonal when handling strings of ambiguous homopolymers.
+    * band
+            * Number of cells to calculate from the diagonal.
+    * raw
+            * Return the binomial distances of both containment directions without applying `identity`.
+    * indices
+            * Inverted indices of `sketches` and `sketches_neighbors` from `build_inverted_index`.
+            * If provided, only windows sharing an id with window `rows[i]` are visited.
+
+    # Returns
+    * 2D ndarray with shape `(len(rows), band)` of identity values.
+    * Cell `[i, d]` is the identity between window `rows[i]` and window `rows[i] + d`.
+    * If `raw`, 3D ndarray with shape `(2, len(rows), band)`.
+        * `[0, i, d]` is the binomial distance of the containment of window `rows[i]` in window `rows[i] + d`'s neighborhood.
+        * `[1, i, d]` is the reverse.
+    """
+    n = len(sketches)
+    lens = sketches.lengths()
+    mark = np.zeros(n_vocab, dtype=bool)
+    # Containment until converted to binomial distances once for the whole block.
+    block = np.zeros((2, len(rows), band) if raw else (len(rows), band))
+    diags = np.empty(len(rows))
+    threshold = containment_threshold(identity, k)
+
+    index, index_neighbors = indices if indices else (None, None)
+
+    def shared(
+        sketch: np.ndarray,
+        others: PackedSketches,
+        others_index: InvertedIndex | None,
+        st: int,
+        end: int,
+    ) -> np.ndarray:
+        if others_index:
+            return count_shared_indexed(sketch, others_index, st, end)
+        return count_shared(sketch, others, st, end, mark)
+
+    for i, w in enumerate(rows):
+        diags[i] = 0.0 if lens[w] == 0 and not ambiguous else 100.0
+
+        # Exclusive end of columns in band.
+        end = min(w + band, n)
+        if w + 1 >= end:
+            continue
+
+        sketch_w = sketches.ids[sketches.offsets[w] : sketches.offsets[w + 1]]
+        sketch_neighbors_w = sketches_neighbors.ids[
+            sketches_neighbors.offsets[w] : sketches_neighbors.offsets[w + 1]
+        ]
+        # Containment of window w in neighborhood of windows r.
+        if lens[w] != 0:
+            containment_a_b_prime = (
+                shared(sketch_w, sketches_neighbors, index_neighbors, w + 1, end)
+                / lens[w]
+            )
+        else:
+            containment_a_b_prime = np.zeros(end - w - 1)
+
+        if raw:
+            block[0, i, 1 : end - w] = containment_a_b_prime
+        else:
+            passes = passes_identity(containment_a_b_prime, identity, k, threshold)
+            if not passes.any():
+                continue
+
+        # Containment of windows r in neighborhood of window w.
+        lens_r = lens[w + 1 : end]
+        shared_a_prime_b = shared(sketch_neighbors_w, sketches, index, w + 1, end)
+        containment_a_prime_b = np.divide(
+            shared_a_prime_b,
+            lens_r,
+            out=np.zeros(len(lens_r)),
+            where=lens_r != 0,
+        )
+        if raw:
+            block[1, i, 1 : end - w] = containment_a_prime_b
+            continue
+
+        block[i, 1 : end - w] = np.where(
+            passes, np.maximum(containment_a_b_prime, containment_a_prime_b), 0.0
+        )
+
+    nonzero_binomial_distances(block, k)
+    if raw:
+        block[:, :, 0] = diags / 100
+    else:
+        block *= 100.0
+        block[:, 0] = diags
+
+    return block
+
+
 def selfContainmentMatrix(
     mod_set: list[set],
     mod_set_neighbors: list[set],
     k: int,
     identity: float,
     ambiguous: bool,
+    max_band: int | None = None,
+    block_size: int = DEF_CONTAINMENT_BLOCK_SIZE,
+    threads: int = 1,
 ) -> np.ndarray:
     """
     Create a self-containment matrix based on containment similarity calculations.
@@ -266,31 +903,301 @@ def selfContainmentMatrix(
             * A list of sets representing neighbors for each element.
     * k
             * A parameter for containment similarity calculation.
+    * max_band
+            * Only calculate cells within this number of windows of the diagonal.
+    * block_size
+            * Number of rows to calculate at once.
+    * threads
+            * Number of threads used to calculate blocks.
+
+    Returns:
+        np.ndarray: A NumPy array representing the self-containment matrix.
+            See `sketch_containment_matrix`.
+    """
+    (sketches, sketches_neighbors), vocab = pack_sketches(mod_set, mod_set_neighbors)
+    return sketch_containment_matrix(
+        SelfSketches(sketches, sketches_neighbors, vocab),
+        k,
+        identity,
+        ambiguous,
+        max_band=max_band,
+        block_size=block_size,
+        threads=threads,
+    )
+
+
+def sketch_containment_matrix(
+    self_sketches: SelfSketches,
+    k: int,
+    identity: float,
+    ambiguous: bool,
+    max_band: int | None = None,
+    block_size: int = DEF_CONTAINMENT_BLOCK_SIZE,
+    threads: int = 1,
+    raw: bool = False,
+    use_index: bool | None = None,
+) -> np.ndarray:
+    """
+    Create a self-containment matrix from packed sketches.
+
+    Rows are calculated in blocks of `block_size`.
+    With multiple `threads`, blocks are calculated in parallel against the same read-only sketches.
+
+    Args:
+    * self_sketches
+            * Packed sketches from `create_self_sketches`.
+    * k
+            * K-mer size.
+    * identity
+            * Identity cutoff threshold.
+    * ambiguous
+            * Preserve diagonal when handling strings of ambiguous homopolymers.
+    * max_band
+            * Only calculate cells within this number of windows of the diagonal.
+            * Memory is `O(n * max_band)` rather than `O(n^2)`.
+    * block_size
+            * Number of rows to calculate at once.
+    * threads
+            * Number of threads used to calculate blocks.
+    * raw
+            * Return a raw containment matrix independent of `identity`. See `finalize_containment_matrix`.
+    * use_index
+            * Count shared hashes with inverted indices so only windows sharing a hash are visited.
+            * Faster for mostly unique sequence. By default, used if fewer window pairs share a hash than cells are scanned.
 
     Returns:
         np.ndarray: A NumPy array representing the self-containment matrix.
+            If `max_band`, a banded array with shape `(n, max_band)` where cell `[x, d]` is cell `[x, x + d]` of the full matrix.
+            If `raw`, the binomial distance of the containment of window `x` in window `y`'s neighborhood for cell `[x, y]`.
+            If `raw` and `max_band`, an array with shape `(2, n, max_band)` with cells `[x, x + d]` and `[x + d, x]`.
     """
-    n = len(mod_set)
-    containment_matrix = np.empty((n, n))
-
-    for w in range(n):
-        containment_matrix[w, w] = 100.0
-        if len(mod_set[w]) == 0 and not ambiguous:
-            containment_matrix[w, w] = 0
-
-        for r in range(w + 1, n):
-            c_hat = binomial_distance(
-                containment_neighbors(
-                    mod_set[w],
-                    mod_set[r],
-                    mod_set_neighbors[w],
-                    mod_set_neighbors[r],
-                    identity,
-                    k,
+    sketches, sketches_neighbors, vocab = self_sketches
+    n_vocab = len(vocab)
+    n = len(sketches)
+    band = max_band if max_band else n
+    if threads > 1:
+        # Use enough blocks to balance rows of unequal cost across threads.
+        block_size = max(1, min(block_size, math.ceil(n / (threads * 4))))
+    blocks = [range(st, min(st + block_size, n)) for st in range(0, n, block_size)]
+    if use_index is None:
+        use_index = index_pays_off(sketches, sketches_neighbors, n_vocab, band)
+    indices = (
+        (
+            build_inverted_index(sketches, n_vocab),
+            build_inverted_index(sketches_neighbors, n_vocab),
+        )
+        if use_index
+        else None
+    )
+
+    if max_band:
+        shape: tuple[int, ...] = (2, n, max_band) if raw else (n, max_band)
+    else:
+        shape = (n, n)
+    containment_matrix = np.empty(shape)
+
+    def calculate_block(rows: range) -> None:
+        block = containment_rows(
+            sketches,
+            sketches_neighbors,
+            n_vocab,
+            rows,
+            k,
+            identity,
+            ambiguous,
+            band,
+            raw=raw,
+            indices=indices,
+        )
+        # Blocks write to disjoint rows.
+        if max_band:
+            containment_matrix[..., rows.start : rows.stop, :] = block
+        elif raw:
+            # Also writes column below diagonal that no other row writes.
+            for i, w in enumerate(rows):
+                containment_matrix[w, w:] = block[0, i, : n - w]
+                containment_matrix[w:, w] = block[1, i, : n - w]
+        else:
+            for i, w in enumerate(rows):
+                containment_matrix[w, w:] = block[i, : n - w]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Consume to raise any exceptions.
+        for _ in pool.map(calculate_block, blocks):
+            pass
+
+    if max_band or raw:
+        return containment_matrix
+
+    # Mirror upper triangle.
+    for rows in blocks:
+        st, end = rows.start, rows.stop
+        containment_matrix[st:end, :st] = containment_matrix[:st, st:end].T
+        blk = containment_matrix[st:end, st:end]
+        lower = np.tril_indices(end - st, -1)
+        blk[lower] = blk.T[lower]
+
+    return containment_matrix
+
+
+def finalize_containment_matrix(
+    raw_matrix: np.ndarray,
+    identity: float,
+    block_size: int = DEF_CONTAINMENT_BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    Apply an identity threshold to a raw containment matrix from `sketch_containment_matrix`.
+
+    The result is identical to calling `sketch_containment_matrix` with `identity`.
+
+    Args:
+    * raw_matrix
+            * Raw containment matrix. Either dense with shape `(n, n)` or banded with shape `(2, n, band)`.
+    * identity
+            * Identity cutoff threshold.
+    * block_size
+            * Number of rows to finalize at once.
+
+    Returns:
+        np.ndarray: Self-containment matrix with shape `(n, n)` or banded with shape `(n, band)`.
+    """
+    min_identity = identity / 100
+    if raw_matrix.ndim == 3:
+        upper, lower = raw_matrix
+        matrix = np.where(upper >= min_identity, np.maximum(upper, lower), 0.0) * 100.0
+        matrix[:, 0] = upper[:, 0] * 100.0
+        return matrix
+
+    n = raw_matrix.shape[0]
+    matrix = np.empty((n, n))
+    for st in range(0, n, block_size):
+        end = min(st + block_size, n)
+        upper = raw_matrix[st:end]
+        lower = raw_matrix[:, st:end].T
+        matrix[st:end] = (
+            np.where(upper >= min_identity, np.maximum(upper, lower), 0.0) * 100.0
+        )
+        # Mirror upper triangle.
+        matrix[st:end, :st] = matrix[:st, st:end].T
+        blk = matrix[st:end, st:end]
+        tril = np.tril_indices(end - st, -1)
+        blk[tril] = blk.T[tril]
+
+    diag = np.arange(n)
+    matrix[diag, diag] = raw_matrix[diag, diag] * 100.0
+    return matrix
+
+
+def share_vocab(*self_sketches: SelfSketches) -> list[SelfSketches]:
+    """
+    Map the ids of sketches created separately to a shared vocabulary.
+    """
+    vocab = functools.reduce(np.union1d, (s.vocab for s in self_sketches))
+    shared = []
+    for sketches, sketches_neighbors, old_vocab in self_sketches:
+        # Sorted to sorted so ids stay sorted within each sketch.
+        new_ids = np.searchsorted(vocab, old_vocab).astype(np.uint32)
+        shared.append(
+            SelfSketches(
+                PackedSketches(new_ids[sketches.ids], sketches.offsets),
+                PackedSketches(
+                    new_ids[sketches_neighbors.ids], sketches_neighbors.offsets
                 ),
-                k,
+                vocab,
             )
-            containment_matrix[r, w] = c_hat * 100.0
-            containment_matrix[w, r] = c_hat * 100.0
+        )
+    return shared
+
+
+def pairwise_containment_matrix(
+    query: SelfSketches,
+    reference: SelfSketches,
+    k: int,
+    identity: float,
+    block_size: int = DEF_CONTAINMENT_BLOCK_SIZE,
+    threads: int = 1,
+) -> np.ndarray:
+    """
+    Create a containment matrix between the windows of two sequences.
+
+    Cell `[x, y]` is `containment_neighbors` of query window `x` and reference window `y`.
+    Shared hashes are counted with inverted indices of the reference so each query window only visits reference windows sharing a hash.
+
+    Args:
+    * query
+            * Packed sketches of the query from `create_self_sketches`.
+    * reference
+            * Packed sketches of the reference from `create_self_sketches`.
+    * k
+            * K-mer size.
+    * identity
+            * Identity cutoff threshold.
+    * block_size
+            * Number of rows to calculate at once.
+    * threads
+            * Number of threads used to calculate blocks.
+
+    Returns:
+        np.ndarray: Containment matrix with shape `(n_query, n_reference)`.
+    """
+    query, reference = share_vocab(query, reference)
+    n_vocab = len(query.vocab)
+    n_query, n_ref = len(query.sketches), len(reference.sketches)
+    index = build_inverted_index(reference.sketches, n_vocab)
+    index_neighbors = build_inverted_index(reference.sketches_neighbors, n_vocab)
+    lens_query = query.sketches.lengths()
+    lens_ref = reference.sketches.lengths()
+    threshold = containment_threshold(identity, k)
+
+    containment_matrix = np.zeros((n_query, n_ref))
+    if threads > 1:
+        block_size = max(1, min(block_size, math.ceil(n_query / (threads * 4))))
+    blocks = [
+        range(st, min(st + block_size, n_query)) for st in range(0, n_query, block_size)
+    ]
+
+    def calculate_block(rows: range) -> None:
+        for w in rows:
+            # Containment of query window w in neighborhood of reference windows.
+            if lens_query[w] != 0:
+                sketch_w = query.sketches.ids[
+                    query.sketches.offsets[w] : query.sketches.offsets[w + 1]
+                ]
+                containment_a_b_prime = (
+                    count_shared_indexed(sketch_w, index_neighbors, 0, n_ref)
+                    / lens_query[w]
+                )
+            else:
+                containment_a_b_prime = np.zeros(n_ref)
+
+            passes = passes_identity(containment_a_b_prime, identity, k, threshold)
+            if not passes.any():
+                continue
+
+            # Containment of reference windows in neighborhood of query window w.
+            sketch_neighbors_w = query.sketches_neighbors.ids[
+                query.sketches_neighbors.offsets[w] : query.sketches_neighbors.offsets[
+                    w + 1
+                ]
+            ]
+            containment_a_prime_b = np.divide(
+                count_shared_indexed(sketch_neighbors_w, index, 0, n_ref),
+                lens_ref,
+                out=np.zeros(n_ref),
+                where=lens_ref != 0,
+            )
+            containment_matrix[w] = np.where(
+                passes, np.maximum(containment_a_b_prime, containment_a_prime_b), 0.0
+            )
+
+        # Rows of block are only written by this thread.
+        block = containment_matrix[rows.start : rows.stop]
+        nonzero_binomial_distances(block, k)
+        block *= 100.0
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Consume to raise any exceptions.
+        for _ in pool.map(calculate_block, blocks):
+            pass
 
     return containment_matrix
@@ -0,0 +1,243 @@
+import os
+import re
+from typing import BinaryIO, Iterator, NamedTuple
+
+import numpy as np
+import polars as pl
+
+from .constants import DEF_BED_CHUNK_SIZE
+
+
+class Region(NamedTuple):
+    chrom: str
+    st: int
+    end: int
+    name: str
+
+
+RGX_REGION = re.compile(r"^(?P<chrom>.+):(?P<st>[\d,]+)-(?P<end>[\d,]+)$")
+
+
+def read_regions(regions: list[str]) -> list[Region]:
+    """
+    Read regions from bedfiles or `chrom:st-end` strings.
+
+    Coordinates are 0-based and half-open like bedfiles. Regions are named `chrom:st-end`.
+
+    # Args
+    * regions
+            * Paths to bedfiles with at least `chrom`, `chrom_st`, and `chrom_end` columns or `chrom:st-end` strings.
+
+    # Returns
+    * Regions in input order.
+    """
+    coords: list[tuple[str, int, int]] = []
+    for region in regions:
+        if os.path.isfile(region):
+            with open(region, "rt") as fh:
+                for line in fh:
+                    if not line.strip() or line.startswith(("#", "track", "browser")):
+                        continue
+                    chrom, chrom_st, chrom_end, *_ = line.rstrip("\n").split("\t")
+                    coords.append((chrom, int(chrom_st), int(chrom_end)))
+            continue
+
+        mtch = RGX_REGION.match(region)
+        if not mtch:
+            raise ValueError(
+                f"Invalid region: {region}. Must be a bedfile or chrom:st-end."
+            )
+        coords.append(
+            (
+                mtch.group("chrom"),
+                int(mtch.group("st").replace(",", "")),
+                int(mtch.group("end").replace(",", "")),
+            )
+        )
+
+    return [Region(chrom, st, end, f"{chrom}:{st}-{end}") for chrom, st, end in coords]
+
+
+def round_values(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Round values to `ndigits` decimal digits.
+
+    Same as `round()` for each value. `np.round` only differs on values close to a tie so those are rounded individually.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0**ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(v, ndigits) for v in values[near_tie].tolist()]
+    return rounded
+
+
+def iter_2D_ident_frames(
+    mtx: np.ndarray,
+    window: int,
+    ident_thr: float,
+    x_name: str,
+    y_name: str,
+    *,
+    self_identity: bool = True,
+    banded: bool = False,
+    round_ndigits: int | None = None,
+    chunk_size: int = DEF_BED_CHUNK_SIZE,
+) -> Iterator[pl.DataFrame]:
+    """
+    Convert an identity matrix to 2D bed rows. Same rows as `convertMatrixToBed`.
+
+    Rows of the matrix are thresholded and converted in chunks of at most `chunk_size` cells.
+
+    # Args
+    * mtx
+            * Identity matrix.
+    * window
+            * Window size.
+    * ident_thr
+            * Identity threshold.
+    * x_name
+            * Query name.
+    * y_name
+            * Reference name.
+    * self_identity
+            * Only output upper triangle of matrix.
+    * banded
+            * `mtx` is a banded self-identity matrix where cell `[x, d]` is cell `[x, x + d]`.
+    * round_ndigits
+            * Round identity to specified ndigits.
+    * chunk_size
+            * Number of cells to threshold at once.
+
+    # Returns
+    * Dataframes of bed rows. One per chunk.
+    """
+    n_rows, n_cols = mtx.shape
+    chunk_rows = max(1, chunk_size // max(n_cols, 1))
+    cols = np.arange(n_cols)
+    for st in range(0, n_rows, chunk_rows):
+        end = min(st + chunk_rows, n_rows)
+        rows = np.arange(st, end)[:, None]
+        mask = mtx[st:end] >= ident_thr / 100
+        if banded:
+            # Band extends past last window.
+            mask &= rows + cols < n_rows
+        elif self_identity:
+            mask &= cols >= rows
+
+        x, y = np.nonzero(mask)
+        ident = mtx[st:end][x, y]
+        x += st
+        if banded:
+            y += x
+
+        if round_ndigits:
+            ident = round_values(ident, round_ndigits)
+
+        yield pl.DataFrame(
+            {
+                "query_name": pl.repeat(x_name, len(x), eager=True),
+                "query_start": x * window + 1,
+                "query_end": (x + 1) * window,
+                "reference_name": pl.repeat(y_name, len(x), eager=True),
+                "reference_start": y * window + 1,
+                "reference_end": (y + 1) * window,
+                "perID_by_events": ident,
+            }
+        )
+
+
+def write_2D_ident_bed(
+    fh: BinaryIO,
+    mtx: np.ndarray,
+    window: int,
+    ident_thr: float,
+    x_name: str,
+    y_name: str,
+    *,
+    self_identity: bool = True,
+    banded: bool = False,
+    round_ndigits: int | None = None,
+    chunk_size: int = DEF_BED_CHUNK_SIZE,
+) -> int:
+    """
+    Write identity matrix as a 2D bedfile. See `iter_2D_ident_frames` for args.
+
+    # Returns
+    * Number of rows written.
+    """
+    n_written = 0
+    for df in iter_2D_ident_frames(
+        mtx,
+        window,
+        ident_thr,
+        x_name,
+        y_name,
+        self_identity=self_identity,
+        banded=banded,
+        round_ndigits=round_ndigits,
+        chunk_size=chunk_size,
+    ):
+        df.write_csv(fh, include_header=False, separator="\t")
+        n_written += df.height
+
+    return n_written
+
+
+def ident_1D_frame(
+    idxs: np.ndarray,
+    ident: np.ndarray,
+    window: int,
+    name: str,
+    *,
+    round_ndigits: int | None = None,
+) -> pl.DataFrame:
+    """
+    Convert 1D identity to bed rows.
+
+    # Args
+    * idxs
+            * Window indices.
+    * ident
+            * Identity of each window.
+    * window
+            * Window size.
+    * name
+            * Sequence name.
+    * round_ndigits
+            * Round identity to specified ndigits.
+
+    # Returns
+    * Dataframe of bed rows with columns `chrom`, `chrom_st`, `chrom_end`, and `ident`.
+    """
+    if round_ndigits:
+        ident = round_values(ident, round_ndigits)
+
+    return pl.DataFrame(
+        {
+            "chrom": pl.repeat(name, len(idxs), eager=True),
+            "chrom_st": idxs * window + 1,
+            "chrom_end": (idxs + 1) * window,
+            "ident": ident,
+        }
+    )
+
+
+def write_1D_ident_bed(
+    fh: BinaryIO,
+    idxs: np.ndarray,
+    ident: np.ndarray,
+    window: int,
+    name: str,
+    *,
+    round_ndigits: int | None = None,
+) -> int:
+    """
+    Write 1D identity as a bedfile. See `ident_1D_frame` for args.
+
+    # Returns
+    * Number of rows written.
+    """
+    df = ident_1D_frame(idxs, ident, window, name, round_ndigits=round_ndigits)
+    df.write_csv(fh, include_header=False, separator="\t")
+    return df.height
@@ -3,9 +3,22 @@
 from typing import Generator
 import pyfaidx
 import mmh3
+import numpy as np
+
+from .constants import DEF_KMER_CHUNK_SIZE
 
 tab_b = bytes.maketrans(b"ACTG", b"TGAC")
 
+# Lookup tables over byte values. Only ASCII letters are changed.
+UPPER_TABLE = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8)
+COMPLEMENT_TABLE = np.frombuffer(bytes(range(256)).translate(tab_b), dtype=np.uint8)
+
+# MurmurHash3_x86_32 constants.
+MMH3_C1 = np.uint32(0xCC9E2D51)
+MMH3_C2 = np.uint32(0x1B873593)
+MMH3_FMIX1 = np.uint32(0x85EBCA6B)
+MMH3_FMIX2 = np.uint32(0xC2B2AE35)
+
 
 def generateKmersFromFasta(seq: str, k: int) -> Generator[int, None, None]:
     n = len(seq)
@@ -20,6 +33,132 @@ def generateKmersFromFasta(seq: str, k: int) -> Generator[int, None, None]:
         yield fh if fh < rc else rc
 
 
+def encode_seq(seq: str | bytes | np.ndarray) -> np.ndarray:
+    """
+    Encode a sequence as an upper-case `uint8` array of ASCII codes.
+
+    # Args
+    * seq
+            * Sequence as a string, bytes, or `uint8` array.
+
+    # Returns
+    * `np.uint8` array of length `len(seq)`.
+    """
+    if isinstance(seq, str):
+        seq = seq.encode("ascii")
+    buf = np.frombuffer(seq, dtype=np.uint8) if isinstance(seq, bytes) else seq
+    return UPPER_TABLE[buf]
+
+
+def _rotl32(x: np.ndarray, r: int) -> np.ndarray:
+    return (x << np.uint32(r)) | (x >> np.uint32(32 - r))
+
+
+def mmh3_windows(buf: np.ndarray, k: int) -> np.ndarray:
+    """
+    Hash every length `k` window of `buf` with MurmurHash3_x86_32 and a seed of 0.
+
+    Equivalent to `[mmh3.hash(bytes(buf[i : i + k])) for i in range(len(buf) - k + 1)]`.
+
+    # Args
+    * buf
+            * `np.uint8` array of bytes.
+    * k
+            * Window length in bytes.
+
+    # Returns
+    * `np.int32` array of length `len(buf) - k + 1`.
+    """
+    n = len(buf) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.int32)
+
+    b = buf.astype(np.uint32)
+    h = np.zeros(n, dtype=np.uint32)
+    n_blocks = k // 4
+    if n_blocks:
+        # Little-endian 4-byte word starting at every position.
+        words = b[:-3] | (b[1:-2] << np.uint32(8)) | (b[2:-1] << np.uint32(16))
+        words |= b[3:] << np.uint32(24)
+        for i in range(n_blocks):
+            k1 = words[i * 4 : i * 4 + n] * MMH3_C1
+            k1 = _rotl32(k1, 15)
+            k1 *= MMH3_C2
+            h ^= k1
+            h = _rotl32(h, 13)
+            h *= np.uint32(5)
+            h += np.uint32(0xE6546B64)
+        del words
+
+    tail_start = n_blocks * 4
+    n_tail = k & 3
+    if n_tail:
+        k1 = np.zeros(n, dtype=np.uint32)
+        for i in reversed(range(n_tail)):
+            k1 ^= b[tail_start + i : tail_start + i + n] << np.uint32(8 * i)
+        k1 *= MMH3_C1
+        k1 = _rotl32(k1, 15)
+        k1 *= MMH3_C2
+        h ^= k1
+
+    # Finalization mix.
+    h ^= np.uint32(k)
+    h ^= h >> np.uint32(16)
+    h *= MMH3_FMIX1
+    h ^= h >> np.uint32(13)
+    h *= MMH3_FMIX2
+    h ^= h >> np.uint32(16)
+    return h.view(np.int32)
+
+
+def generate_kmer_hashes(
+    seq: str | bytes | np.ndarray,
+    k: int,
+    chunk_size: int = DEF_KMER_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    Generate canonical k-mer hashes for a sequence.
+
+    Vectorized version of `generateKmersFromFasta`. Values are identical to ModDotPlot's mmh3 hashes.
+    The sequence is encoded once and hashed in chunks of `chunk_size` k-mers to bound temporary memory.
+
+    # Args
+    * seq
+            * Sequence as a string, bytes, or `uint8` array.
+    * k
+            * K-mer size.
+    * chunk_size
+            * Number of k-mers to hash at once.
+
+    # Returns
+    * `np.int32` array of `len(seq) - k + 1` canonical k-mer hashes.
+    """
+    buf = encode_seq(seq)
+    n_kmers = max(len(buf) - k + 1, 0)
+    hashes = np.empty(n_kmers, dtype=np.int32)
+    for st in range(0, n_kmers, chunk_size):
+        end = min(st + chunk_size, n_kmers)
+        chunk = buf[st : end + k - 1]
+        fwd = mmh3_windows(chunk, k)
+        # Windows of the reverse complement are in reverse k-mer order.
+        rc = mmh3_windows(COMPLEMENT_TABLE[chunk[::-1]], k)[::-1]
+        np.minimum(fwd, rc, out=hashes[st:end])
+
+    return hashes
+
+
+def fetch_seq(
+    infile: str, name: str, start: int | None = None, end: int | None = None
+) -> str:
+    """
+    Fetch a single sequence from an indexed fasta without loading other records.
+
+    If `start` or `end` are given, only fetch that 0-based, half-open slice of the record.
+    """
+    with pyfaidx.Fasta(infile) as fa:
+        return str(fa[name][start:end])
+
+
 def readKmersFromFile(
     filename: str, ksize: int
 ) -> Generator[tuple[str, list[int]], None, None]:
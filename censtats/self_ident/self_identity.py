@@ -0,0 +1,462 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+import polars as pl
+
+from loguru import logger
+
+from .. import profiling
+from .cache import read_cached_sketches, sketch_cache_key, write_cached_sketches
+from .constants import (
+    DEF_CACHE_SIZE_MB,
+    DEF_DELTA,
+    DEF_IDENT_THR,
+    DEF_IGNORE_BANDS,
+    DEF_KMER_SIZE,
+    DEF_MODIMIZER,
+    DEF_N_BINS,
+    DEF_WINDOW,
+)
+from .estimate_identity import (
+    SelfSketches,
+    create_self_sketches,
+    pairwise_containment_matrix,
+    sketch_containment_matrix,
+)
+from .io import ident_1D_frame, iter_2D_ident_frames
+from .read_fasta import encode_seq, generate_kmer_hashes
+
+
+def exact_mean(values: list[float]) -> float:
+    """
+    Get the mean of `values` correctly rounded like `statistics.mean` on any platform.
+    """
+    # The exact sum as non-overlapping floats. Each fsum is correctly rounded so the remainder shrinks until 0.
+    terms: list[float] = []
+    while total := math.fsum([*values, *(-term for term in terms)]):
+        terms.append(total)
+    # Division of an exact sum is already correctly rounded.
+    if len(terms) <= 1:
+        return sum(terms) / len(values)
+    return float(sum(map(Fraction, terms), Fraction(0)) / len(values))
+
+
+def convert_2D_to_1D_ident(
+    mtx: np.ndarray,
+    ident_thr: float,
+    n_bins: int,
+    ignore_bands: int,
+    *,
+    banded: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a self-identity matrix to 1D by averaging identity within `n_bins` of the diagonal.
+
+    Cells below `ident_thr` count as 0. Windows with no cells above `ident_thr` are omitted.
+
+    # Args
+    * mtx
+            * Self-identity matrix.
+    * ident_thr
+            * Identity threshold.
+    * n_bins
+            * Number of bins to calculate average sequence identity over.
+    * ignore_bands
+            * Number of bands ignored along self-identity diagonal.
+    * banded
+            * `mtx` is a banded self-identity matrix where cell `[x, d]` is cell `[x, x + d]`.
+
+    # Returns
+    * Window indices and their average identity.
+    """
+    if n_bins <= ignore_bands:
+        raise ValueError(
+            f"n_bins ({n_bins}) must be greater than ignore_bands ({ignore_bands})."
+        )
+
+    n = mtx.shape[0]
+    if banded:
+        band = mtx[:, :n_bins]
+        valid = np.arange(n)[:, None] + np.arange(band.shape[1]) < n
+        has_ident = ((band >= ident_thr / 100) & valid).any(axis=1)
+    else:
+        rows = np.arange(n)
+        idx = np.minimum(rows[:, None] + np.arange(n_bins), n - 1)
+        band = mtx[rows[:, None], idx]
+        valid = rows[:, None] + np.arange(n_bins) < n
+        has_ident = np.triu(mtx >= ident_thr / 100).any(axis=1)
+
+    # Threshold and pad so windows extending past the last row are 0.
+    band_ident = np.zeros((n + n_bins, n_bins))
+    band_ident[:n, : band.shape[1]] = np.where(
+        (band >= ident_thr / 100) & valid, band, 0.0
+    )
+
+    # Within the alignment matrix with a n_bins of 5 and ignore_bands of 2:
+    # - '*' is the calculated aln band
+    # - '+' is self aln.
+    # 4 * * *   +
+    # 3 * *   +
+    # 2 *   +
+    # 1   +
+    # 0 +
+    #   0 1 2 3 4
+    # Cells of diagonal d in the n_bins - d windows starting at each window.
+    offsets = np.concatenate(
+        [np.arange(n_bins - d) for d in range(ignore_bands, n_bins)]
+    )
+    diags = np.concatenate(
+        [np.full(n_bins - d, d) for d in range(ignore_bands, n_bins)]
+    )
+    idxs = np.flatnonzero(has_ident)
+    cells = band_ident[idxs[:, None] + offsets, diags]
+    return idxs, np.array([exact_mean(row) for row in cells.tolist()], dtype=np.float64)
+
+
+def self_ident_sketches(
+    seq: str | bytes | np.ndarray,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    modimizer: int = DEF_MODIMIZER,
+    legacy_modimizers: bool = False,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+) -> SelfSketches:
+    """
+    Create modimizer sketches of each window of a sequence.
+
+    # Args
+    * seq
+            * Sequence as a string, bytes, or `uint8` array of ASCII bases.
+    * window
+            * Window size.
+    * delta
+            * Fraction of neighboring partition to include in identity estimation.
+    * kmer_size
+            * K-mer size.
+    * modimizer
+            * Modimizer sketch size. Must be less than `window`.
+    * legacy_modimizers
+            * Keep the sparse sketches of windows with too few modimizers like ModDotPlot.
+    * cache_dir
+            * Directory to cache sketches.
+    * cache_size
+            * Maximum size of `cache_dir` in MB.
+
+    # Returns
+    * Packed sketches.
+    """
+    seq = encode_seq(seq)
+    if cache_dir:
+        cache_key = sketch_cache_key(
+            seq, kmer_size, window, delta, modimizer, False, legacy_modimizers
+        )
+        sketches = read_cached_sketches(cache_dir, cache_key)
+        if sketches:
+            logger.info(f"Using cached sketches {cache_key}.")
+            return sketches
+
+    with profiling.stage("hashing") as stage:
+        kmers = generate_kmer_hashes(seq, kmer_size)
+        stage.rows = len(seq)
+    with profiling.stage("modimizers") as stage:
+        sketches = create_self_sketches(
+            kmers,
+            window,
+            delta,
+            kmer_size,
+            False,
+            modimizer,
+            legacy_modimizers=legacy_modimizers,
+        )
+        stage.rows = len(sketches.sketches)
+    del kmers
+    if cache_dir:
+        write_cached_sketches(cache_dir, cache_key, sketches, cache_size * 1024 * 1024)
+
+    return sketches
+
+
+def self_ident_matrix(
+    seq: str | bytes | np.ndarray,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    max_band: int | None = None,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
+    raw: bool = False,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+) -> np.ndarray:
+    """
+    Calculate the self-identity matrix of a sequence.
+
+    # Args
+    * seq
+            * Sequence as a string, bytes, or `uint8` array of ASCII bases.
+    * ident_thr
+            * Identity threshold.
+    * max_band
+            * Only calculate identity within this number of windows of the diagonal.
+    * threads
+            * Number of threads.
+    * raw
+            * Return the raw containment matrix. See `finalize_containment_matrix`.
+    * See `self_ident_sketches` for other args.
+
+    # Returns
+    * Identity matrix with shape `(n, n)` of `n` windows.
+    * If `max_band`, a banded matrix with shape `(n, max_band)` where cell `[x, d]` is cell `[x, x + d]`.
+    """
+    sketches = self_ident_sketches(
+        seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        modimizer=modimizer,
+        legacy_modimizers=legacy_modimizers,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+    )
+    with profiling.stage("containment") as stage:
+        stage.rows = len(sketches.sketches)
+        return sketch_containment_matrix(
+            sketches,
+            kmer_size,
+            ident_thr,
+            False,
+            max_band=max_band,
+            threads=threads,
+            raw=raw,
+        )
+
+
+def self_ident_1D(
+    seq: str | bytes | np.ndarray,
+    name: str,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    n_bins: int = DEF_N_BINS,
+    ignore_bands: int = DEF_IGNORE_BANDS,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
+    round_ndigits: int | None = None,
+) -> pl.DataFrame:
+    """
+    Calculate the 1D average self-identity of a sequence.
+
+    # Args
+    * name
+            * Sequence name.
+    * n_bins
+            * Number of bins to calculate average sequence identity over.
+    * ignore_bands
+            * Number of bands ignored along self-identity diagonal.
+    * round_ndigits
+            * Round identity to specified ndigits.
+    * See `self_ident_matrix` for other args.
+
+    # Returns
+    * Dataframe with columns `chrom`, `chrom_st`, `chrom_end`, and `ident`.
+    """
+    # 1D identity only uses cells within n_bins of the diagonal.
+    mtx = self_ident_matrix(
+        seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        ident_thr=ident_thr,
+        modimizer=modimizer,
+        max_band=n_bins,
+        threads=threads,
+        legacy_modimizers=legacy_modimizers,
+    )
+    idxs, ident = convert_2D_to_1D_ident(
+        mtx, ident_thr, n_bins, ignore_bands, banded=True
+    )
+    return ident_1D_frame(idxs, ident, window, name, round_ndigits=round_ndigits)
+
+
+def self_ident_2D(
+    seq: str | bytes | np.ndarray,
+    name: str,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    max_band: int | None = None,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
+    round_ndigits: int | None = None,
+) -> pl.DataFrame:
+    """
+    Calculate the 2D self-identity of a sequence as pairs of windows.
+
+    # Args
+    * name
+            * Sequence name.
+    * round_ndigits
+            * Round identity to specified ndigits.
+    * See `self_ident_matrix` for other args.
+
+    # Returns
+    * Dataframe with the columns of a 2D self-identity bedfile. Only the upper triangle is included.
+    """
+    mtx = self_ident_matrix(
+        seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        ident_thr=ident_thr,
+        modimizer=modimizer,
+        max_band=max_band,
+        threads=threads,
+        legacy_modimizers=legacy_modimizers,
+    )
+    return pl.concat(
+        iter_2D_ident_frames(
+            mtx,
+            window,
+            ident_thr,
+            name,
+            name,
+            banded=bool(max_band),
+            round_ndigits=round_ndigits,
+        )
+    )
+
+
+def pairwise_ident_matrix(
+    query_seq: str | bytes | np.ndarray,
+    reference_seq: str | bytes | np.ndarray,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
+    cache_dir: str | None = None,
+    cache_size: int = DEF_CACHE_SIZE_MB,
+) -> np.ndarray:
+    """
+    Calculate the identity matrix between the windows of two sequences.
+
+    # Args
+    * query_seq
+            * Query sequence as a string, bytes, or `uint8` array of ASCII bases.
+    * reference_seq
+            * Reference sequence as a string, bytes, or `uint8` array of ASCII bases.
+    * See `self_ident_matrix` for other args.
+
+    # Returns
+    * Identity matrix with shape `(n_query, n_reference)`.
+    """
+    query, reference = (
+        self_ident_sketches(
+            seq,
+            window=window,
+            delta=delta,
+            kmer_size=kmer_size,
+            modimizer=modimizer,
+            legacy_modimizers=legacy_modimizers,
+            cache_dir=cache_dir,
+            cache_size=cache_size,
+        )
+        for seq in (query_seq, reference_seq)
+    )
+    return pairwise_sketches_ident_matrix(
+        query, reference, kmer_size=kmer_size, ident_thr=ident_thr, threads=threads
+    )
+
+
+def pairwise_sketches_ident_matrix(
+    query: SelfSketches,
+    reference: SelfSketches,
+    *,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    threads: int = 1,
+) -> np.ndarray:
+    """
+    Calculate the identity matrix between the windows of two sequences from their sketches. See `pairwise_ident_matrix`.
+
+    # Args
+    * query
+            * Query sketches from `self_ident_sketches`.
+    * reference
+            * Reference sketches from `self_ident_sketches`.
+    """
+    with profiling.stage("containment") as stage:
+        stage.rows = len(query.sketches)
+        return pairwise_containment_matrix(
+            query, reference, kmer_size, ident_thr, threads=threads
+        )
+
+
+def pairwise_ident_2D(
+    query_seq: str | bytes | np.ndarray,
+    reference_seq: str | bytes | np.ndarray,
+    query_name: str,
+    reference_name: str,
+    *,
+    window: int = DEF_WINDOW,
+    delta: float = DEF_DELTA,
+    kmer_size: int = DEF_KMER_SIZE,
+    ident_thr: float = DEF_IDENT_THR,
+    modimizer: int = DEF_MODIMIZER,
+    threads: int = 1,
+    legacy_modimizers: bool = False,
+    round_ndigits: int | None = None,
+) -> pl.DataFrame:
+    """
+    Calculate the 2D identity between two sequences as pairs of windows.
+
+    # Args
+    * query_name
+            * Query sequence name.
+    * reference_name
+            * Reference sequence name.
+    * round_ndigits
+            * Round identity to specified ndigits.
+    * See `pairwise_ident_matrix` for other args.
+
+    # Returns
+    * Dataframe with the columns of a 2D identity bedfile.
+    """
+    mtx = pairwise_ident_matrix(
+        query_seq,
+        reference_seq,
+        window=window,
+        delta=delta,
+        kmer_size=kmer_size,
+        ident_thr=ident_thr,
+        modimizer=modimizer,
+        threads=threads,
+        legacy_modimizers=legacy_modimizers,
+    )
+    return pl.concat(
+        iter_2D_ident_frames(
+            mtx,
+            window,
+            ident_thr,
+            query_name,
+            reference_name,
+            self_identity=False,
+            round_ndigits=round_ndigits,
+        )
+    )
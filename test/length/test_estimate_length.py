@@ -0,0 +1,180 @@
+import polars as pl
+import pytest
+
+from censtats.length import hor_array_length
+from censtats.length.estimate_length import blocked_gaps
+from censtats.length.constants import DEF_INPUT_BED_COLS
+
+
+def hor_units(
+    chrom: str, st: int, n: int, strand: str, name: str = "S1C1H1L.1"
+) -> list[tuple[str, int, int, str, int, str]]:
+    return [
+        (chrom, st + i * 1000, st + (i + 1) * 1000, name, 0, strand) for i in range(n)
+    ]
+
+
+@pytest.fixture
+def df_stv() -> pl.DataFrame:
+    return pl.DataFrame(
+        hor_units("chr1", 0, 12, "+")
+        # Gap of GSAT isn't merged.
+        + hor_units("chr1", 17_000, 12, "-")
+        # Gap of mostly L1 is merged.
+        + hor_units("chr1", 30_000, 12, "-")
+        + hor_units("chr1", 42_500, 5, "-", name="S1C1H1d.1")
+        + hor_units("chr2", 0, 40, "+")
+        + hor_units("chr2", 40_100, 3, "-")
+        # Duplicate HOR unit.
+        + hor_units("chr2", 0, 1, "+"),
+        schema=DEF_INPUT_BED_COLS,
+        orient="row",
+    )
+
+
+@pytest.fixture
+def df_rm() -> pl.DataFrame:
+    return pl.DataFrame(
+        [
+            ("chr1", 12_000, 17_000, "GSAT"),
+            ("chr1", 29_000, 30_000, "L1"),
+            ("chr1", 29_500, 30_000, "HSATII"),
+        ],
+        schema=["contig", "start", "end", "type"],
+        orient="row",
+    )
+
+
+@pytest.mark.parametrize(
+    ["allow_nonlive", "expected_arrs", "expected_strand_arrs"],
+    [
+        (
+            False,
+            [
+                ("chr1", 0, 12000, 12000, 12, 1.0),
+                ("chr1", 17000, 42000, 25000, 24, 0.96),
+                ("chr2", 0, 43100, 43100, 43, 0.9976798143851509),
+            ],
+            [
+                ("chr1", 0, 12000, 12000, 12, 1.0, "+"),
+                ("chr1", 17000, 42000, 25000, 24, 0.96, "-"),
+                ("chr2", 0, 40000, 40000, 40, 1.0, "+"),
+            ],
+        ),
+        (
+            True,
+            [
+                ("chr1", 0, 12000, 12000, 12, 1.0),
+                ("chr1", 17000, 47500, 30500, 29, 0.9508196721311475),
+                ("chr2", 0, 43100, 43100, 43, 0.9976798143851509),
+            ],
+            [
+                ("chr1", 0, 12000, 12000, 12, 1.0, "+"),
+                ("chr1", 17000, 47500, 30500, 29, 0.9508196721311475, "-"),
+                ("chr2", 0, 40000, 40000, 40, 1.0, "+"),
+            ],
+        ),
+    ],
+)
+def test_hor_array_length(
+    df_stv: pl.DataFrame,
+    df_rm: pl.DataFrame,
+    allow_nonlive: bool,
+    expected_arrs: list[tuple],
+    expected_strand_arrs: list[tuple],
+):
+    df_arrs, df_strand_arrs = hor_array_length(
+        df_stv, df_rm, min_arr_len=10_000, allow_nonlive=allow_nonlive
+    )
+    assert df_arrs.rows() == expected_arrs
+    assert df_strand_arrs.rows() == expected_strand_arrs
+
+
+def test_hor_array_length_no_strand(df_stv: pl.DataFrame):
+    df_arrs, df_strand_arrs = hor_array_length(
+        df_stv, None, min_arr_len=10_000, min_arr_prop=0.8, output_strand=False
+    )
+    # Without repeats, gap of GSAT is merged.
+    assert df_arrs.rows() == [
+        ("chr1", 0, 42000, 42000, 36, 36000 / 42000),
+        ("chr2", 0, 43100, 43100, 43, 0.9976798143851509),
+    ]
+    assert df_strand_arrs.is_empty()
+
+
+def test_blocked_gaps():
+    df_gaps = pl.DataFrame(
+        [
+            ("chr1", 100, 200),
+            ("chr1", 300, 400),
+            ("chr1", 500, 600),
+            ("chr2", 100, 200),
+            ("chr3", 100, 200),
+        ],
+        schema=["chrom", "gap_st", "gap_end"],
+        orient="row",
+    )
+    df_rm = pl.DataFrame(
+        [
+            # Duplicate annotations only count once.
+            ("chr1", 50, 140, "GSAT"),
+            ("chr1", 50, 140, "GSAT"),
+            ("chr1", 150, 200, "L1"),
+            # Tie goes to repeat that starts first.
+            ("chr1", 350, 400, "L1"),
+            ("chr1", 300, 350, "HSATII"),
+            # Only touches gap.
+            ("chr1", 400, 500, "GSAT"),
+            ("chr2", 0, 1000, "BSR"),
+        ],
+        schema=["contig", "start", "end", "type"],
+        orient="row",
+    )
+    assert blocked_gaps(df_gaps, df_rm).get_column("blocked").to_list() == [
+        False,
+        True,
+        False,
+        True,
+        False,
+    ]
+
+
+@pytest.mark.parametrize(
+    ["first_repeat", "second_repeat", "expected_arrs"],
+    [
+        (
+            "GSAT",
+            "L1",
+            [
+                ("chr1", 0, 12000, 12000, 12, 1.0),
+                ("chr1", 14000, 26000, 12000, 12, 1.0),
+            ],
+        ),
+        (
+            "L1",
+            "GSAT",
+            [("chr1", 0, 26000, 26000, 24, 24000 / 26000)],
+        ),
+    ],
+)
+@pytest.mark.parametrize("reverse_rm", [False, True])
+def test_hor_array_length_repeat_tie(
+    first_repeat: str, second_repeat: str, expected_arrs: list[tuple], reverse_rm: bool
+):
+    df_stv = pl.DataFrame(
+        hor_units("chr1", 0, 12, "+") + hor_units("chr1", 14_000, 12, "+"),
+        schema=DEF_INPUT_BED_COLS,
+        orient="row",
+    )
+    # Both repeats cover half of the gap. The tie goes to the repeat that starts first regardless of row order.
+    rm_rows = [
+        ("chr1", 12_000, 13_000, first_repeat),
+        ("chr1", 13_000, 14_000, second_repeat),
+    ]
+    df_rm = pl.DataFrame(
+        rm_rows[::-1] if reverse_rm else rm_rows,
+        schema=["contig", "start", "end", "type"],
+        orient="row",
+    )
+    df_arrs, _ = hor_array_length(df_stv, df_rm, min_arr_len=10_000)
+    assert df_arrs.rows() == expected_arrs
@@ -0,0 +1,33 @@
+import gzip
+import pathlib
+
+import pytest
+
+from censtats.length.io import read_rm, read_stv
+
+RM_ROWS = [
+    "1000\t10.0\t0.5\t0.5\tchr1\t100\t200\t(0)\t+\tGSAT\tSatellite\t1\t2\t3\t1",
+    "1000\t10.0\t0.5\t0.5\tchr2:1000-2000\t100\t200\t(0)\t+\tL1\tLINE/L1\t1\t2\t3\t2\t*",
+    "1000\t10.0\t0.5\t0.5\tchr3\t100\t200\t(0)\t+\tAluY\tSINE/Alu\t1\t2\t3\t3",
+]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_rm(tmp_path: pathlib.Path, compress: bool):
+    data = "\n".join(RM_ROWS).encode() + b"\n"
+    path = tmp_path / ("rm.out.gz" if compress else "rm.out")
+    path.write_bytes(gzip.compress(data) if compress else data)
+
+    df_rm = read_rm(str(path), contigs=["chr1", "chr2:1000-2000"])
+    assert df_rm.select("contig", "start", "end", "type", "rClass").rows() == [
+        ("chr1", 100, 200, "GSAT", "Satellite"),
+        # Relative to contig coordinates.
+        ("chr2:1000-2000", 1100, 1200, "L1", "LINE/L1"),
+    ]
+    assert read_rm(str(path)).height == 3
+
+
+def test_read_stv(tmp_path: pathlib.Path):
+    path = tmp_path / "stv.bed"
+    path.write_text("chr1\t0\t1000\tS1C1H1L.1\t0\t+\textra\n")
+    assert read_stv(str(path)).rows() == [("chr1", 0, 1000, "S1C1H1L.1", 0, "+")]
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+
+from censtats.self_ident.cache import (
+    read_cached_sketches,
+    sketch_cache_key,
+    write_cached_sketches,
+)
+from censtats.self_ident.estimate_identity import create_self_sketches
+from censtats.self_ident.read_fasta import encode_seq, generate_kmer_hashes
+
+
+def test_sketch_cache(tmp_path):
+    rng = np.random.default_rng(0)
+    seq = encode_seq(bytes(rng.choice(list(b"ACGT"), 20_000).astype(np.uint8)))
+    sketches = create_self_sketches(
+        generate_kmer_hashes(seq, 21), 5000, 0.5, 21, False, 1000
+    )
+    key = sketch_cache_key(seq, 21, 5000, 0.5, 1000, False)
+    assert key != sketch_cache_key(seq, 21, 5000, 0.4, 1000, False)
+    assert key != sketch_cache_key(seq, 21, 5000, 0.5, 1000, False, True)
+    assert read_cached_sketches(str(tmp_path), key) is None
+
+    write_cached_sketches(str(tmp_path), key, sketches, max_size=10 * 1024 * 1024)
+    cached = read_cached_sketches(str(tmp_path), key)
+    assert cached is not None
+    for cached_arr, arr in zip(
+        (*cached.sketches, *cached.sketches_neighbors, cached.vocab),
+        (*sketches.sketches, *sketches.sketches_neighbors, sketches.vocab),
+    ):
+        assert np.array_equal(cached_arr, arr)
+
+    # Least recently used sketches are evicted.
+    size = os.path.getsize(tmp_path / f"{key}.npz")
+    os.utime(tmp_path / f"{key}.npz", (0, 0))
+    write_cached_sketches(str(tmp_path), "other", sketches, max_size=size)
+    assert read_cached_sketches(str(tmp_path), key) is None
+    assert read_cached_sketches(str(tmp_path), "other") is not None
+
+
+def test_sketch_cache_keeps_written(tmp_path):
+    rng = np.random.default_rng(0)
+    seq = encode_seq(bytes(rng.choice(list(b"ACGT"), 20_000).astype(np.uint8)))
+    sketches = create_self_sketches(
+        generate_kmer_hashes(seq, 21), 5000, 0.5, 21, False, 1000
+    )
+    write_cached_sketches(str(tmp_path), "old", sketches, max_size=10 * 1024 * 1024)
+    size = os.path.getsize(tmp_path / "old.npz")
+
+    # The sketches just written are kept even if they are the oldest.
+    os.utime(tmp_path / "old.npz", (2**31, 2**31))
+    write_cached_sketches(str(tmp_path), "new", sketches, max_size=size)
+    assert read_cached_sketches(str(tmp_path), "old") is None
+    assert read_cached_sketches(str(tmp_path), "new") is not None
+
+    # Sketches larger than the cache are not cached.
+    write_cached_sketches(str(tmp_path), "large", sketches, max_size=size - 1)
+    assert read_cached_sketches(str(tmp_path), "large") is None
+    assert read_cached_sketches(str(tmp_path), "new") is not None
+    assert sorted(os.listdir(tmp_path)) == ["new.npz"]
@@ -0,0 +1,146 @@
+import os
+import random
+from collections import defaultdict
+from statistics import mean
+
+import numpy as np
+import pytest
+
+from censtats.self_ident.cli import (
+    convert_2D_to_1D_ident,
+    export_self_seq_ident,
+    get_seq_regions,
+    get_single_self_seq_ident,
+    Dim,
+)
+
+
+def naive_convert_2D_to_1D_ident(
+    mtx: np.ndarray, ident_thr: float, n_bins: int, ignore_bands: int
+) -> tuple[list[int], list[float]]:
+    aln_mtx: defaultdict[int, dict[int, float]] = defaultdict(dict)
+    n = mtx.shape[0]
+    for x in range(n):
+        for y in range(x, n):
+            if mtx[x, y] >= ident_thr / 100:
+                aln_mtx[x][y] = float(mtx[x, y])
+
+    idxs, idents = [], []
+    for st_idx in list(aln_mtx.keys()):
+        band_end_idx = st_idx + n_bins
+        idxs.append(st_idx)
+        idents.append(
+            mean(
+                aln_mtx[x].get(y, 0.0)
+                for x in range(st_idx, band_end_idx)
+                for y in range(x + ignore_bands, band_end_idx)
+            )
+        )
+    return idxs, idents
+
+
+@pytest.mark.parametrize(
+    ["n_bins", "ignore_bands"], [(5, 2), (3, 0), (1, 0), (12, 4), (40, 1)]
+)
+def test_convert_2D_to_1D_ident(n_bins: int, ignore_bands: int):
+    rng = np.random.default_rng(n_bins)
+    n = 30
+    mtx = np.triu(rng.random((n, n)) * 100)
+    mtx = mtx + np.triu(mtx, 1).T
+    np.fill_diagonal(mtx, 100.0)
+    # Window without any identity.
+    mtx[7, :] = mtx[:, 7] = 0.0
+    expected_idxs, expected_ident = naive_convert_2D_to_1D_ident(
+        mtx, 50.0, n_bins, ignore_bands
+    )
+
+    idxs, ident = convert_2D_to_1D_ident(mtx, 50.0, n_bins, ignore_bands)
+    assert idxs.tolist() == expected_idxs
+    assert ident.tolist() == expected_ident
+
+    band = np.zeros((n, n_bins))
+    for x in range(n):
+        for d in range(min(n_bins, n - x)):
+            band[x, d] = mtx[x, x + d]
+    idxs, ident = convert_2D_to_1D_ident(band, 50.0, n_bins, ignore_bands, banded=True)
+    assert idxs.tolist() == expected_idxs
+    assert ident.tolist() == expected_ident
+
+
+def test_convert_2D_to_1D_ident_invalid_bins():
+    with pytest.raises(ValueError):
+        convert_2D_to_1D_ident(np.zeros((3, 3)), 0.86, 2, 2)
+
+
+def test_get_seq_regions_duplicate(tmp_path):
+    infile = os.path.join(tmp_path, "seq.fa")
+    with open(infile, "wt") as fh:
+        fh.write(">seq\nACGTACGTAC\n")
+    bedfile = os.path.join(tmp_path, "regions.bed")
+    with open(bedfile, "wt") as fh:
+        fh.write("seq\t0\t5\n")
+
+    assert list(get_seq_regions(infile, ["seq:0-5", "seq:5-10"])) == [
+        "seq:0-5",
+        "seq:5-10",
+    ]
+    with pytest.raises(ValueError, match="Duplicate region name seq:0-5."):
+        get_seq_regions(infile, ["seq:0-5", bedfile])
+
+
+@pytest.mark.parametrize("dim", [Dim.ONE, Dim.TWO])
+@pytest.mark.parametrize("max_band", [None, 8])
+def test_export_saved_matrix(tmp_path, dim: Dim, max_band: int | None):
+    rng = random.Random(0)
+    monomer = "".join(rng.choice("ACGT") for _ in range(171))
+    seq = "".join(
+        "".join(b if rng.random() > 0.02 else rng.choice("ACGT") for b in monomer)
+        for _ in range(40)
+    )
+    infile = os.path.join(tmp_path, "seq.fa")
+    with open(infile, "wt") as fh:
+        fh.write(f">seq\n{seq}\n")
+
+    saved_dir = tmp_path / "saved"
+    saved_dir.mkdir()
+    get_single_self_seq_ident(
+        "seq",
+        infile,
+        str(saved_dir),
+        200,
+        0.5,
+        21,
+        90.0,
+        100,
+        5,
+        2,
+        dim,
+        None,
+        max_band=max_band,
+        save_matrix=True,
+    )
+    for ident_thr in (90.0, 97.0):
+        expected_dir = tmp_path / f"expected_{ident_thr}"
+        expected_dir.mkdir()
+        get_single_self_seq_ident(
+            "seq",
+            infile,
+            str(expected_dir),
+            200,
+            0.5,
+            21,
+            ident_thr,
+            100,
+            5,
+            2,
+            dim,
+            None,
+            max_band=max_band,
+        )
+        export_dir = tmp_path / f"export_{ident_thr}"
+        export_self_seq_ident(
+            [str(saved_dir / "seq.npy")], str(export_dir), ident_thr, 5, 2, dim, None
+        )
+        assert (export_dir / "seq.bed").read_text() == (
+            expected_dir / "seq.bed"
+        ).read_text()
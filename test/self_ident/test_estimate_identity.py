@@ -0,0 +1,338 @@
+import random
+
+import numpy as np
+import pytest
+
+from censtats.self_ident.read_fasta import generate_kmer_hashes
+
+from censtats.self_ident.estimate_identity import (
+    convertToModimizers,
+    iter_partitions,
+    select_modimizers,
+    binomial_distance,
+    containment_neighbors,
+    finalize_containment_matrix,
+    pack_sketches,
+    passes_identity,
+    containment_threshold,
+    pairwise_containment_matrix,
+    populateModimizers,
+    partition_offsets,
+    selfContainmentMatrix,
+    sketch_containment_matrix,
+    SelfSketches,
+)
+
+
+def naive_self_containment_matrix(
+    mod_set: list[set[int]],
+    mod_set_neighbors: list[set[int]],
+    k: int,
+    identity: float,
+    ambiguous: bool,
+) -> np.ndarray:
+    n = len(mod_set)
+    mtx = np.empty((n, n))
+    for w in range(n):
+        mtx[w, w] = 100.0
+        if len(mod_set[w]) == 0 and not ambiguous:
+            mtx[w, w] = 0
+        for r in range(w + 1, n):
+            c_hat = binomial_distance(
+                containment_neighbors(
+                    mod_set[w],
+                    mod_set[r],
+                    mod_set_neighbors[w],
+                    mod_set_neighbors[r],
+                    identity,
+                    k,
+                ),
+                k,
+            )
+            mtx[r, w] = mtx[w, r] = c_hat * 100.0
+    return mtx
+
+
+def naive_partitions(
+    lst: list[int], win: int, delta: float, seq_len: int, k: int
+) -> list[list[int]]:
+    kmer_list = []
+    delta_offset = win * delta
+    kmer_list.append(lst[0 : int(round(win - k + 1 + delta_offset))])
+    counter = win - k + 1
+    while counter <= (seq_len - win):
+        delta_start_index = int(round(counter + 1 - delta_offset))
+        delta_end_index = min(int(round(win + counter + 1 + delta_offset)), seq_len)
+        kmer_list.append(lst[delta_start_index:delta_end_index])
+        counter += win
+    if counter <= seq_len - 2:
+        kmer_list.append(lst[int(round(counter + 1 - delta_offset)) : seq_len])
+    return kmer_list
+
+
+def random_sketches(
+    seed: int, n: int, n_hashes: int
+) -> tuple[list[set[int]], list[set[int]]]:
+    rng = random.Random(seed)
+    mod_set = []
+    mod_set_neighbors = []
+    for i in range(n):
+        # Leave some windows empty.
+        size = 0 if i % 7 == 3 else rng.randint(1, 50)
+        sketch = {rng.randrange(n_hashes) for _ in range(size)}
+        mod_set.append(sketch)
+        mod_set_neighbors.append(
+            sketch | {rng.randrange(n_hashes) for _ in range(size)}
+        )
+    return mod_set, mod_set_neighbors
+
+
+@pytest.mark.parametrize("identity", [0.86, 95.0])
+@pytest.mark.parametrize("ambiguous", [True, False])
+@pytest.mark.parametrize("block_size", [1, 8, 256])
+def test_self_containment_matrix(identity: float, ambiguous: bool, block_size: int):
+    mod_set, mod_set_neighbors = random_sketches(0, 30, 80)
+    expected = naive_self_containment_matrix(
+        mod_set, mod_set_neighbors, 21, identity, ambiguous
+    )
+    mtx = selfContainmentMatrix(
+        mod_set, mod_set_neighbors, 21, identity, ambiguous, block_size=block_size
+    )
+    assert np.array_equal(mtx, expected)
+
+
+@pytest.mark.parametrize("max_band", [1, 3, 30, 50])
+def test_self_containment_band(max_band: int):
+    mod_set, mod_set_neighbors = random_sketches(1, 30, 80)
+    mtx = selfContainmentMatrix(mod_set, mod_set_neighbors, 21, 0.86, False)
+    band = selfContainmentMatrix(
+        mod_set, mod_set_neighbors, 21, 0.86, False, max_band=max_band, block_size=4
+    )
+    assert band.shape == (30, max_band)
+    for x in range(30):
+        for d in range(max_band):
+            expected = mtx[x, x + d] if x + d < 30 else 0.0
+            assert band[x, d] == expected
+
+
+@pytest.mark.parametrize("max_band", [None, 5])
+def test_self_containment_matrix_threads(max_band: int | None):
+    mod_set, mod_set_neighbors = random_sketches(2, 40, 80)
+    expected = selfContainmentMatrix(
+        mod_set, mod_set_neighbors, 21, 0.86, False, max_band=max_band
+    )
+    mtx = selfContainmentMatrix(
+        mod_set, mod_set_neighbors, 21, 0.86, False, max_band=max_band, threads=3
+    )
+    assert np.array_equal(mtx, expected)
+
+
+@pytest.mark.parametrize("identity", [0.0, 0.86, 95.0])
+@pytest.mark.parametrize("ambiguous", [True, False])
+@pytest.mark.parametrize("max_band", [None, 1, 5, 50])
+@pytest.mark.parametrize("raw", [True, False])
+def test_self_containment_matrix_index(
+    identity: float, ambiguous: bool, max_band: int | None, raw: bool
+):
+    # Sparse so most windows share no hashes.
+    mod_set, mod_set_neighbors = random_sketches(4, 40, 400)
+    (sketches, sketches_neighbors), vocab = pack_sketches(mod_set, mod_set_neighbors)
+    self_sketches = SelfSketches(sketches, sketches_neighbors, vocab)
+    expected, mtx = (
+        sketch_containment_matrix(
+            self_sketches,
+            21,
+            identity,
+            ambiguous,
+            max_band=max_band,
+            block_size=7,
+            raw=raw,
+            use_index=use_index,
+        )
+        for use_index in (False, True)
+    )
+    assert np.array_equal(mtx, expected)
+    if not raw and not max_band:
+        assert np.array_equal(
+            mtx,
+            naive_self_containment_matrix(
+                mod_set, mod_set_neighbors, 21, identity, ambiguous
+            ),
+        )
+
+
+@pytest.mark.parametrize("identity", [0.86, 90.0, 97.0])
+@pytest.mark.parametrize("max_band", [None, 1, 5, 50])
+@pytest.mark.parametrize("threads", [1, 3])
+def test_finalize_raw_containment_matrix(
+    identity: float, max_band: int | None, threads: int
+):
+    mod_set, mod_set_neighbors = random_sketches(3, 40, 60)
+    (sketches, sketches_neighbors), vocab = pack_sketches(mod_set, mod_set_neighbors)
+    self_sketches = SelfSketches(sketches, sketches_neighbors, vocab)
+    expected = sketch_containment_matrix(
+        self_sketches, 21, identity, False, max_band=max_band
+    )
+    # Raw matrix is independent of identity threshold.
+    raw = sketch_containment_matrix(
+        self_sketches, 21, 0.0, False, max_band=max_band, threads=threads, raw=True
+    )
+    mtx = finalize_containment_matrix(raw, identity, block_size=7)
+    assert np.array_equal(mtx, expected)
+
+
+@pytest.mark.parametrize(
+    "identity", [-1.0, 0.0, 0.86, 50.0, 86.0, 90.0, 95.0, 97.0, 100.0]
+)
+@pytest.mark.parametrize("k", [11, 21])
+def test_passes_identity(identity: float, k: int):
+    # All containment values of sketches up to 300 modimizers.
+    containment = np.array(
+        [a / b for b in range(1, 301) for a in range(b + 1)], dtype=np.float64
+    )
+    # Values exactly at the threshold.
+    threshold = containment_threshold(identity, k)
+    containment = np.concatenate(
+        [
+            containment,
+            [threshold, np.nextafter(threshold, 0), np.nextafter(threshold, 1)],
+        ]
+    )
+    expected = [binomial_distance(c, k) >= identity / 100 for c in containment]
+    assert passes_identity(containment, identity, k, threshold).tolist() == expected
+
+
+@pytest.mark.parametrize("win", [50, 200, 5000])
+@pytest.mark.parametrize("delta", [0.0, 0.25, 0.33, 0.5, 1.0])
+@pytest.mark.parametrize("n_kmers", [1, 49, 180, 1001, 12345])
+def test_partition_offsets(win: int, delta: float, n_kmers: int):
+    kmers = list(range(n_kmers))
+    starts, ends = partition_offsets(win, delta, n_kmers, 21)
+    partitions = [kmers[st:end] for st, end in zip(starts, ends)]
+    assert partitions == naive_partitions(kmers, win, delta, n_kmers, 21)
+
+
+@pytest.mark.parametrize("sparsity", [1, 4, 16])
+@pytest.mark.parametrize("ambiguous", [True, False])
+@pytest.mark.parametrize("legacy", [True, False])
+def test_select_modimizers(sparsity: int, ambiguous: bool, legacy: bool):
+    rng = random.Random(sparsity)
+    # Ambiguous and low-complexity regions have too few modimizers.
+    seq = "".join(
+        [
+            "".join(rng.choice("ACGT") for _ in range(3000)),
+            "N" * 1000,
+            "AC" * 500,
+            "".join(rng.choice("ACGT") for _ in range(2000)),
+            "R" * 700,
+        ]
+    )
+    hashes = generate_kmer_hashes(seq, 11)
+    starts, ends = partition_offsets(300, 0.5, len(hashes), 11)
+    expectation = round(300 / sparsity)
+    expected = convertToModimizers(
+        iter_partitions(hashes, starts, ends),
+        sparsity,
+        ambiguous,
+        11,
+        expectation,
+        legacy,
+    )
+    modimizers, offsets = select_modimizers(
+        hashes, starts, ends, sparsity, ambiguous, 11, expectation, legacy
+    )
+    assert [
+        modimizers[offsets[i] : offsets[i + 1]].tolist() for i in range(len(starts))
+    ] == [sorted(mod_set) for mod_set in expected]
+
+
+@pytest.mark.parametrize("sparsity", [8, 64])
+@pytest.mark.parametrize("ambiguous", [True, False])
+def test_select_modimizers_n_run(sparsity: int, ambiguous: bool):
+    rng = random.Random(0)
+    # Partitions within the N run never reach the expectation so the last densify round selects nothing.
+    seq = "".join(
+        [
+            "".join(rng.choice("ACGT") for _ in range(3000)),
+            "N" * 5000,
+            "".join(rng.choice("ACGT") for _ in range(3000)),
+        ]
+    )
+    hashes = generate_kmer_hashes(seq, 11)
+    starts, ends = partition_offsets(300, 0.5, len(hashes), 11)
+    expectation = round(300 / sparsity)
+    expected = convertToModimizers(
+        iter_partitions(hashes, starts, ends), sparsity, ambiguous, 11, expectation
+    )
+    modimizers, offsets = select_modimizers(
+        hashes, starts, ends, sparsity, ambiguous, 11, expectation
+    )
+    assert [
+        modimizers[offsets[i] : offsets[i + 1]].tolist() for i in range(len(starts))
+    ] == [sorted(mod_set) for mod_set in expected]
+
+
+@pytest.mark.parametrize("legacy", [True, False])
+def test_select_modimizers_empty(legacy: bool):
+    # No modimizers left after removing ambiguous bases so every partition is sparse.
+    hashes = generate_kmer_hashes("N" * 2000, 11)
+    starts, ends = partition_offsets(300, 0.5, len(hashes), 11)
+    modimizers, offsets = select_modimizers(
+        hashes, starts, ends, 16, False, 11, 20, legacy
+    )
+    assert len(modimizers) == 0
+    assert np.array_equal(offsets, np.zeros(len(starts) + 1))
+
+
+def test_populate_modimizers_fallback():
+    rng = np.random.default_rng(0)
+    # Only one hash is divisible by 4 so the sketch is below expectation until a sparsity of 2.
+    partition = rng.integers(0, 2**20, 100, dtype=np.int64) * 8 + 1
+    partition[0] = 64
+    partition[1:50] += 1
+    legacy = populateModimizers(partition, 8, True, 20, 21, legacy=True)
+    densified = populateModimizers(partition, 8, True, 20, 21)
+    assert legacy == {64}
+    assert densified == set(partition[partition % 2 == 0].tolist())
+
+
+@pytest.mark.parametrize("identity", [0.86, 95.0])
+@pytest.mark.parametrize("block_size", [1, 256])
+@pytest.mark.parametrize("threads", [1, 3])
+def test_pairwise_containment_matrix(identity: float, block_size: int, threads: int):
+    query, query_neighbors = random_sketches(0, 20, 80)
+    reference, reference_neighbors = random_sketches(1, 30, 100)
+    expected = np.empty((20, 30))
+    for w in range(20):
+        for r in range(30):
+            expected[w, r] = (
+                binomial_distance(
+                    containment_neighbors(
+                        query[w],
+                        reference[r],
+                        query_neighbors[w],
+                        reference_neighbors[r],
+                        identity,
+                        21,
+                    ),
+                    21,
+                )
+                * 100.0
+            )
+
+    # Packed separately so vocabularies differ.
+    (query_sketches, query_sketches_neighbors), query_vocab = pack_sketches(
+        query, query_neighbors
+    )
+    (ref_sketches, ref_sketches_neighbors), ref_vocab = pack_sketches(
+        reference, reference_neighbors
+    )
+    mtx = pairwise_containment_matrix(
+        SelfSketches(query_sketches, query_sketches_neighbors, query_vocab),
+        SelfSketches(ref_sketches, ref_sketches_neighbors, ref_vocab),
+        21,
+        identity,
+        block_size=block_size,
+        threads=threads,
+    )
+    assert np.array_equal(mtx, expected)
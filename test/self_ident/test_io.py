@@ -0,0 +1,83 @@
+import io
+from typing import cast
+
+import numpy as np
+import pytest
+
+from censtats.self_ident.estimate_identity import convertMatrixToBed
+from censtats.self_ident.io import (
+    Region,
+    read_regions,
+    round_values,
+    write_2D_ident_bed,
+)
+
+
+def test_round_values():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.random(10_000) * 100, [2.675, 0.125, 100.0]])
+    for ndigits in (1, 2, 3):
+        assert round_values(values, ndigits).tolist() == [
+            round(v, ndigits) for v in values.tolist()
+        ]
+
+
+@pytest.mark.parametrize("self_identity", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1_000_000])
+@pytest.mark.parametrize("round_ndigits", [None, 3])
+def test_write_2D_ident_bed(
+    self_identity: bool, chunk_size: int, round_ndigits: int | None
+):
+    rng = np.random.default_rng(1)
+    mtx = rng.random((13, 13)) * 100
+    expected = [
+        "\t".join(
+            str(round(cast(float, v), round_ndigits) if round_ndigits else v)
+            if i == 6
+            else str(v)
+            for i, v in enumerate(row)
+        )
+        for row in convertMatrixToBed(mtx, 5000, 30.0, "x", "y", self_identity)
+    ]
+    fh = io.BytesIO()
+    n = write_2D_ident_bed(
+        fh,
+        mtx,
+        5000,
+        30.0,
+        "x",
+        "y",
+        self_identity=self_identity,
+        round_ndigits=round_ndigits,
+        chunk_size=chunk_size,
+    )
+    assert n == len(expected)
+    assert fh.getvalue().decode().splitlines() == expected
+
+
+def test_write_2D_ident_bed_banded():
+    rng = np.random.default_rng(2)
+    mtx = rng.random((9, 9)) * 100
+    band = np.zeros((9, 4))
+    for x in range(9):
+        for d in range(4):
+            band[x, d] = mtx[x, x + d] if x + d < 9 else 100.0
+    mtx[np.abs(np.subtract.outer(np.arange(9), np.arange(9))) >= 4] = 0.0
+
+    fh_mtx, fh_band = io.BytesIO(), io.BytesIO()
+    write_2D_ident_bed(fh_mtx, mtx, 10, 0.86, "x", "x")
+    write_2D_ident_bed(fh_band, band, 10, 0.86, "x", "x", banded=True, chunk_size=5)
+    assert fh_mtx.getvalue() == fh_band.getvalue()
+
+
+def test_read_regions(tmp_path):
+    bed = tmp_path / "regions.bed"
+    bed.write_text("# header\nchr1\t10\t200\tarr\t0\t+\n\nchr2\t0\t5\n")
+    assert read_regions([str(bed), "chr1:1,000-2000", "chr1:2:3-5"]) == [
+        Region("chr1", 10, 200, "chr1:10-200"),
+        Region("chr2", 0, 5, "chr2:0-5"),
+        Region("chr1", 1000, 2000, "chr1:1000-2000"),
+        Region("chr1:2", 3, 5, "chr1:2:3-5"),
+    ]
+    with pytest.raises(ValueError):
+        read_regions(["chr1"])
@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+from censtats.self_ident.read_fasta import (
+    fetch_seq,
+    generate_kmer_hashes,
+    generateKmersFromFasta,
+)
+
+
+@pytest.mark.parametrize("k", [1, 3, 4, 5, 8, 11, 21])
+@pytest.mark.parametrize("chunk_size", [1, 97, 1_000_000])
+def test_generate_kmer_hashes(k: int, chunk_size: int):
+    rng = random.Random(k)
+    # Include soft-masked and ambiguous bases.
+    seq = "".join(rng.choice("ACGTacgtNRY") for _ in range(1000))
+    hashes = generate_kmer_hashes(seq, k, chunk_size=chunk_size)
+    assert hashes.tolist() == list(generateKmersFromFasta(seq, k))
+
+
+def test_generate_kmer_hashes_short_seq():
+    assert len(generate_kmer_hashes("ACGT", 21)) == 0
+
+
+def test_fetch_seq(tmp_path):
+    infile = tmp_path / "seq.fa"
+    infile.write_text(">seq1\nACGTACGTAC\nGTAC\n>seq2\nTTTT\n")
+    assert fetch_seq(str(infile), "seq1") == "ACGTACGTACGTAC"
+    assert fetch_seq(str(infile), "seq1", 8, 12) == "ACGT"
+    assert fetch_seq(str(infile), "seq2", 1) == "TTT"
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import math
+import random
+import subprocess
+from statistics import mean
+
+import numpy as np
+import polars as pl
+import pytest
+
+from censtats.self_ident import (
+    pairwise_ident_2D,
+    pairwise_ident_matrix,
+    self_ident_1D,
+    self_ident_2D,
+    self_ident_matrix,
+)
+from censtats.self_ident.cli import (
+    Dim,
+    get_region_sketches,
+    get_single_pairwise_seq_ident,
+    get_single_self_seq_ident,
+)
+from censtats.self_ident.io import Region
+from censtats.self_ident.self_identity import exact_mean
+
+
+def hor_seq(seed: int, n_units: int) -> str:
+    rng = random.Random(seed)
+    monomer = "".join(rng.choice("ACGT") for _ in range(171))
+    return "".join(
+        "".join(b if rng.random() > 0.02 else rng.choice("ACGT") for b in monomer)
+        for _ in range(n_units)
+    )
+
+
+def test_self_ident_matrix_seq_types():
+    seq = hor_seq(0, 30)
+    params = dict(window=200, modimizer=100, ident_thr=90.0)
+    mtx = self_ident_matrix(seq, **params)
+    assert mtx.shape == (26, 26)
+    assert np.array_equal(mtx, self_ident_matrix(seq.encode(), **params))
+    assert np.array_equal(
+        mtx, self_ident_matrix(np.frombuffer(seq.encode(), dtype=np.uint8), **params)
+    )
+    band = self_ident_matrix(seq, max_band=4, **params)
+    assert band.shape == (26, 4)
+    for d in range(4):
+        assert np.array_equal(band[: 26 - d, d], mtx.diagonal(d))
+
+
+@pytest.mark.parametrize("dim", [Dim.ONE, Dim.TWO])
+def test_self_ident_matches_cli(tmp_path, dim: Dim):
+    seq = hor_seq(1, 40)
+    infile = os.path.join(tmp_path, "seq.fa")
+    with open(infile, "wt") as fh:
+        fh.write(f">seq\n{seq}\n")
+
+    get_single_self_seq_ident(
+        "seq", infile, str(tmp_path), 200, 0.5, 21, 90.0, 100, 5, 2, dim, 3
+    )
+    expected = pl.read_csv(
+        os.path.join(tmp_path, "seq.bed"), separator="\t", has_header=False
+    )
+    if dim == Dim.ONE:
+        df = self_ident_1D(
+            seq, "seq", window=200, modimizer=100, ident_thr=90.0, round_ndigits=3
+        )
+    else:
+        df = self_ident_2D(
+            seq, "seq", window=200, modimizer=100, ident_thr=90.0, round_ndigits=3
+        )
+    assert df.rows() == expected.rows()
+
+
+def test_pairwise_ident_matrix_self():
+    seq = hor_seq(2, 30)
+    params = dict(window=200, modimizer=100, ident_thr=90.0)
+    mtx = pairwise_ident_matrix(seq, seq, **params)
+    expected = self_ident_matrix(seq, **params)
+    # Self-identity is symmetric and sets empty windows on the diagonal to 100.
+    assert np.array_equal(np.triu(mtx, 1), np.triu(expected, 1))
+
+
+def test_pairwise_ident_matches_cli(tmp_path):
+    query, reference = hor_seq(3, 30), hor_seq(3, 40)[500:]
+    query_file = os.path.join(tmp_path, "query.fa")
+    reference_file = os.path.join(tmp_path, "reference.fa")
+    for infile, name, seq in (
+        (query_file, "query", query),
+        (reference_file, "reference", reference),
+    ):
+        with open(infile, "wt") as fh:
+            fh.write(f">{name}\n{seq}\n")
+
+    outfile = os.path.join(tmp_path, "query_reference.bed")
+    get_single_pairwise_seq_ident(
+        "query",
+        "reference:100",
+        get_region_sketches(
+            Region("query", 0, len(query), "query"), query_file, 200, 0.5, 21, 100
+        ),
+        get_region_sketches(
+            Region("reference", 100, len(reference), "reference:100"),
+            reference_file,
+            200,
+            0.5,
+            21,
+            100,
+        ),
+        outfile,
+        200,
+        21,
+        90.0,
+        3,
+    )
+    expected = pl.read_csv(outfile, separator="\t", has_header=False)
+    df = pairwise_ident_2D(
+        query,
+        reference[100:],
+        "query",
+        "reference:100",
+        window=200,
+        modimizer=100,
+        ident_thr=90.0,
+        round_ndigits=3,
+    )
+    assert df.height > 0
+    assert df.rows() == expected.rows()
+
+
+def test_pairwise_seq_ident_sketches_once(tmp_path):
+    query_file = os.path.join(tmp_path, "query.fa")
+    reference_file = os.path.join(tmp_path, "reference.fa")
+    with open(query_file, "wt") as fh:
+        fh.write(f">q1\n{hor_seq(4, 20)}\n>q2\n{hor_seq(5, 20)}\n")
+    with open(reference_file, "wt") as fh:
+        fh.write(f">r1\n{hor_seq(6, 20)}\n>r2\n{hor_seq(7, 20)}\n")
+
+    outdir = os.path.join(tmp_path, "out")
+    stats_json = os.path.join(tmp_path, "stats.json")
+    # New interpreter as forking after polars has started threads can deadlock.
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "censtats.main",
+            "--stats_json",
+            stats_json,
+            "pairwise-ident",
+            "-q",
+            query_file,
+            "-r",
+            reference_file,
+            "-o",
+            outdir,
+            "-w",
+            "200",
+            "-m",
+            "100",
+            "-p",
+            "2",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    assert sorted(os.listdir(outdir)) == [
+        "q1_r1.bed",
+        "q1_r2.bed",
+        "q2_r1.bed",
+        "q2_r2.bed",
+    ]
+    with open(stats_json) as fh:
+        profile = json.load(fh)
+    # Each of the four sequences is sketched once rather than once per pair.
+    assert profile["by_stage"]["modimizers"]["n"] == 4
+    assert profile["by_stage"]["containment"]["n"] == 4
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_exact_mean(seed: int):
+    rng = random.Random(seed)
+    for _ in range(200):
+        values = [
+            rng.random() * rng.choice([1e-12, 1.0, 100.0, 1e12])
+            for _ in range(rng.randint(1, 50))
+        ]
+        assert exact_mean(values) == mean(values)
+    # Rounding the correctly rounded sum again when dividing differs from statistics.mean.
+    values = [
+        87.88666603380416,
+        9.745430973087721,
+        13.59688602006689,
+        21.698694123313732,
+        96.5480138898203,
+        43.616186662742926,
+        62.6648290866804,
+        30.10261984255054,
+        50.72429838290595,
+    ]
+    assert math.fsum(values) / len(values) != mean(values)
+    assert exact_mean(values) == mean(values)
@@ -0,0 +1,137 @@
+import random
+from collections import deque
+from typing import Callable
+
+import numpy as np
+import pytest
+from intervaltree import Interval, IntervalTree
+
+from censtats.common import merge_intervals, merge_segment_ids, overlapping_pairs
+
+
+def naive_merge_itvs(
+    itvs: list[Interval],
+    dst: int,
+    fn_cmp: Callable[[Interval, Interval], bool],
+    fn_merge_itv: Callable[[Interval, Interval], Interval],
+) -> list[Interval]:
+    # Merge sorted intervals pairwise like the previous merge_itvs.
+    final_itvs = []
+    sorted_itvs = deque(sorted(itvs))
+    while sorted_itvs:
+        itv_1 = sorted_itvs.popleft()
+        if not sorted_itvs:
+            final_itvs.append(itv_1)
+            break
+        itv_2 = sorted_itvs.popleft()
+        if itv_2.begin - itv_1.end <= dst and fn_cmp(itv_1, itv_2):
+            sorted_itvs.appendleft(fn_merge_itv(itv_1, itv_2))
+        else:
+            final_itvs.append(itv_1)
+            sorted_itvs.appendleft(itv_2)
+    return final_itvs
+
+
+def random_itvs(seed: int, n: int) -> list[Interval]:
+    rng = random.Random(seed)
+    itvs = set()
+    pos = 0
+    for _ in range(n):
+        pos += rng.randrange(-50, 100)
+        st = max(pos, 0)
+        # Include nested and overlapping intervals.
+        itvs.add(Interval(st, st + rng.randrange(1, 150), rng.randrange(3)))
+    return sorted(itvs)
+
+
+def as_arrays(itvs: list[Interval]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        np.array([itv.begin for itv in itvs], dtype=np.int64),
+        np.array([itv.end for itv in itvs], dtype=np.int64),
+        np.array([itv.data for itv in itvs], dtype=np.int64),
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("dst", [-10, 1, 25])
+def test_merge_intervals_matches_naive(seed: int, dst: int):
+    itvs = random_itvs(seed, 500)
+    starts, ends, values = as_arrays(itvs)
+    rng = random.Random(seed)
+    blocked = np.array([rng.random() < 0.2 for _ in range(len(itvs) - 1)])
+    blocked_pairs = {
+        (itvs[i].end, itvs[i + 1].begin) for i in np.flatnonzero(blocked).tolist()
+    }
+
+    # Count and summed length of merged intervals.
+    def merge_with_counts(itv_1: Interval, itv_2: Interval) -> Interval:
+        return Interval(
+            itv_1.begin,
+            itv_2.end,
+            (itv_1.data[0], itv_1.data[1] + 1, itv_1.data[2] + itv_2.length()),
+        )
+
+    counted_itvs = [
+        Interval(itv.begin, itv.end, (itv.data, 1, itv.length())) for itv in itvs
+    ]
+    cases = [
+        (None, None, lambda x, y: True),
+        (values, None, lambda x, y: x.data[0] == y.data[0]),
+        (None, blocked, lambda x, y: (x.end, y.begin) not in blocked_pairs),
+    ]
+    for case_values, case_blocked, fn_cmp in cases:
+        expected = naive_merge_itvs(counted_itvs, dst, fn_cmp, merge_with_counts)
+        merged = merge_intervals(
+            starts, ends, dst, values=case_values, blocked=case_blocked
+        )
+        assert merged.starts.tolist() == [itv.begin for itv in expected]
+        assert merged.ends.tolist() == [itv.end for itv in expected]
+        assert merged.counts.tolist() == [itv.data[1] for itv in expected]
+        assert merged.lengths.tolist() == [itv.data[2] for itv in expected]
+        assert values[merged.firsts].tolist() == [itv.data[0] for itv in expected]
+
+
+def test_merge_intervals_cummax_end():
+    starts = np.array([0, 10, 110])
+    ends = np.array([100, 20, 120])
+    # Nested interval ends before next starts.
+    assert merge_intervals(starts, ends, 15).ends.tolist() == [20, 120]
+    merged = merge_intervals(starts, ends, 15, cummax_end=True)
+    assert merged.starts.tolist() == [0]
+    assert merged.ends.tolist() == [120]
+    assert merged.counts.tolist() == [3]
+    assert merged.lengths.tolist() == [120]
+
+
+def test_merge_intervals_empty():
+    empty = np.zeros(0, dtype=np.int64)
+    assert merge_segment_ids(empty, empty).tolist() == []
+    merged = merge_intervals(empty, empty)
+    assert all(len(arr) == 0 for arr in merged)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_overlapping_pairs_matches_intervaltree(seed: int):
+    itvs = random_itvs(seed, 300)
+    other_itvs = random_itvs(seed + 100, 300)
+    starts, ends, _ = as_arrays(itvs)
+    other_starts, other_ends, _ = as_arrays(other_itvs)
+    tree = IntervalTree(
+        Interval(itv.begin, itv.end, i) for i, itv in enumerate(other_itvs)
+    )
+
+    idxs, other_idxs = overlapping_pairs(starts, ends, other_starts, other_ends)
+    assert sorted(zip(idxs.tolist(), other_idxs.tolist())) == sorted(
+        (i, ovl.data)
+        for i, itv in enumerate(itvs)
+        for ovl in tree.overlap(itv.begin, itv.end)
+    )
+
+
+def test_overlapping_pairs_adjacent():
+    # Half-open intervals that only touch don't overlap.
+    idxs, other_idxs = overlapping_pairs(
+        np.array([10]), np.array([20]), np.array([0, 20]), np.array([10, 30])
+    )
+    assert idxs.tolist() == []
+    assert other_idxs.tolist() == []
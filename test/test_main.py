@@ -0,0 +1,45 @@
+import sys
+import json
+import subprocess
+
+import pytest
+
+import censtats
+
+HEAVY_MODULES = ("numpy", "polars", "matplotlib", "pyfaidx", "mmh3")
+
+
+def loaded_modules(code: str) -> set[str]:
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, json; {code}; print(json.dumps(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return set(json.loads(proc.stdout))
+
+
+def test_main_import_is_light():
+    modules = loaded_modules("import censtats.main")
+    assert [module for module in HEAVY_MODULES if module in modules] == []
+
+
+def test_lazy_attrs():
+    modules = loaded_modules(
+        "import censtats; censtats.self_ident.self_ident_matrix; censtats.length.read_stv"
+    )
+    assert "censtats.self_ident.self_identity" in modules
+    assert "censtats.length.io" in modules
+    assert "matplotlib" not in modules
+
+    missing_attr = "missing_attr"
+    with pytest.raises(AttributeError):
+        getattr(censtats.self_ident, missing_attr)
+    assert all(
+        hasattr(censtats.self_ident, name) for name in censtats.self_ident.__all__
+    )
+    assert all(hasattr(censtats.length, name) for name in censtats.length.__all__)
@@ -0,0 +1,64 @@
+import pytest
+
+from censtats import profiling
+
+
+@pytest.fixture(autouse=True)
+def reset_records(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(profiling, "_RECORDS", None)
+
+
+def test_stage_disabled():
+    with profiling.stage("read") as stage:
+        stage.rows = 10
+    assert not profiling.is_enabled()
+    assert profiling.records() == []
+
+
+def test_iter_stage_records_contigs():
+    profiling.enable()
+    items = [("ctgA", 3), ("ctgB", 5)]
+    seen = []
+    for item in profiling.iter_stage(
+        "length", items, contig_of=lambda itm: itm[0], rows_of=lambda itm: itm[1]
+    ):
+        with profiling.stage("write") as stage:
+            stage.rows = 1
+        seen.append(item)
+
+    assert seen == items
+    assert [(r["stage"], r["contig"], r["rows"]) for r in profiling.records()] == [
+        ("write", "ctgA", 1),
+        ("length", "ctgA", 3),
+        ("write", "ctgB", 1),
+        ("length", "ctgB", 5),
+    ]
+
+    profile = profiling.report("length", [], 1.0, 0)
+    assert profile["by_stage"]["length"]["n"] == 2
+    assert profile["by_stage"]["length"]["rows"] == 8
+    assert profile["by_stage"]["write"]["rows"] == 2
+    assert set(profile["by_contig"]) == {"ctgA", "ctgB"}
+    # Nested stages aren't counted twice.
+    for contig in ("ctgA", "ctgB"):
+        (length_record,) = (
+            r
+            for r in profile["stages"]
+            if r["contig"] == contig and r["stage"] == "length"
+        )
+        assert profile["by_contig"][contig]["seconds"] == pytest.approx(
+            length_record["seconds"], abs=1e-3
+        )
+
+
+def test_run_profiled_returns_records():
+    def work(n: int) -> int:
+        with profiling.stage("containment") as stage:
+            stage.rows = n
+        return n * 2
+
+    result, worker_records = profiling.run_profiled(work, "ctgA", 4)
+    assert result == 8
+    assert [(r["stage"], r["contig"], r["rows"]) for r in worker_records] == [
+        ("containment", "ctgA", 4)
+    ]